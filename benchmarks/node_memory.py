@@ -0,0 +1,56 @@
+"""
+Compares the memory used per CFG node by CFGNode and CompactCFGNode.
+
+Builds the CFG of every Python file in a zip archive once with each node
+class, runs the reaching-definitions analysis, and reports the traced heap
+bytes per node.
+
+To run - from the toplevel directory:  python benchmarks/node_memory.py tests/tainttest.zip
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cfgbuilder import GlobalRegistry, MultiModuleCFGBuilder
+from scan import parse_all_python_files
+
+
+def measure(parsed_files, compact_nodes, bitvectors):
+    """
+    Returns (node count, traced bytes) for building and solving all CFGs.
+    """
+    gc.collect()
+    tracemalloc.start()
+    builders = []
+    for file_name, ast_tree in parsed_files.items():
+        builder = MultiModuleCFGBuilder(GlobalRegistry(), compact_nodes=compact_nodes)
+        builder.visit(ast_tree)
+        builder.dataflow_analysis(bitvectors=bitvectors)
+        builders.append(builder)
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sum(len(builder.node_list) for builder in builders), used
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bytes per CFG node for each node class.")
+    parser.add_argument("filename", help="The zip archive of Python sources to build CFGs for")
+    args = parser.parse_args()
+
+    parsed_files = parse_all_python_files(args.filename)
+    print(f"{'node class':<16}{'solver':<12}{'nodes':>10}{'bytes':>14}{'bytes/node':>12}")
+    for compact_nodes in (False, True):
+        for bitvectors in (False, True):
+            nodes, used = measure(parsed_files, compact_nodes, bitvectors)
+            print(f"{'CompactCFGNode' if compact_nodes else 'CFGNode':<16}"
+                  f"{'bitvectors' if bitvectors else 'sets':<12}"
+                  f"{nodes:>10}{used:>14}{used / max(nodes, 1):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+# Bump whenever a change to the analyzers alters their per-file results, so
+# entries written by an older version are never reused.
+ANALYZER_VERSION = "11"
+
+
+class AnalysisCache:
+    """
+    Persistent, content-addressed cache of per-file analysis summaries.
+
+    Entries are keyed by a zip member's CRC32 and size (both already stored in
+    its ZipInfo) plus ANALYZER_VERSION, so an unchanged member can skip parsing
+    and analysis entirely. Summaries also depend on where the member sits
+    (its module name, relative imports) and on which modules the archive
+    defines, so the member path and the ModuleIndex fingerprint are part of
+    the key too: identical files in two packages get an entry each, and
+    adding or removing a module invalidates the archive's entries. Each entry
+    is one pickle file in cache_dir; its modification time doubles as the
+    last-use time for LRU eviction once the total size exceeds max_bytes.
+    variant is added to every key for settings that change the results, such
+    as the fingerprint of the taint rule packs.
+    """
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024, variant=""):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.variant = variant
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        # {entry file name: size in bytes}, least recently used first, so
+        # eviction never has to rescan, re-stat or sort the directory
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        found = []
+        for entry in os.scandir(cache_dir):
+            if entry.is_file() and entry.name.endswith(".pickle"):
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(found):
+            self.entries[name] = size
+            self.total_bytes += size
+
+    def _key(self, zip_info, module_index=None):
+        version = f"{ANALYZER_VERSION}-{self.variant}" if self.variant else ANALYZER_VERSION
+        fingerprint = module_index.fingerprint if module_index is not None else ""
+        location = hashlib.sha256(f"{zip_info.filename}\0{fingerprint}".encode("utf-8")).hexdigest()[:16]
+        return f"{version}-{location}-{zip_info.CRC:08x}-{zip_info.file_size}.pickle"
+
+    def get(self, zip_info, module_index=None):
+        """
+        Returns the cached summary for the zip member, or None on a miss.
+        module_index is the ModuleIndex of the member's archive.
+        """
+        key = self._key(zip_info, module_index)
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        path = os.path.join(self.cache_dir, key)
+        try:
+            with open(path, "rb") as f:
+                summary = pickle.load(f)
+            os.utime(path)  # Mark as most recently used, for later processes
+            self.entries.move_to_end(key)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self._remove(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return summary
+
+    def put(self, zip_info, summary, module_index=None):
+        """
+        Stores the summary for the zip member and evicts least recently used
+        entries if the cache has grown past its size cap.
+        """
+        key = self._key(zip_info, module_index)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(summary, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, os.path.join(self.cache_dir, key))
+
+        self.total_bytes -= self.entries.get(key, 0)
+        self.entries[key] = os.path.getsize(os.path.join(self.cache_dir, key))
+        self.entries.move_to_end(key)
+        self.total_bytes += self.entries[key]
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits in max_bytes.
+        """
+        while self.entries and self.total_bytes > self.max_bytes:
+            key, size = self.entries.popitem(last=False)
+            self._remove(key, size)
+
+    def _remove(self, key, size=None):
+        try:
+            os.remove(os.path.join(self.cache_dir, key))
+        except OSError:
+            pass
+        if size is None:
+            size = self.entries.pop(key, 0)
+        self.total_bytes -= size
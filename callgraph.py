@@ -1,68 +1,472 @@
 import ast
-from graphviz import Digraph
+from dotwriter import DotWriter, select_nodes, render
+from qualnames import QualifiedNames, qualified_names
+
+
+def module_name_for(file_name, module_index=None):
+    """Returns the dotted module name of an archive member ("" if unknown)."""
+    if module_index is not None:
+        return module_index.module_of(file_name) or ""
+    if file_name:
+        return file_name[:-len(".py")].replace("/", ".")
+    return ""
+
+
+class CalleeResolver:
+    """
+    Resolves the callees of one module to qualified names.
+
+    Import aliases, classes and module-level functions are collected in one
+    pass over the module, so later lookups are dict probes; resolved names are
+    memoized per (dotted callee, enclosing class, enclosing function). Imports
+    and nested function definitions bind in the scope they appear in, as in
+    Python: a binding inside a function is seen by that function and the
+    functions nested in it, and within one scope the last binding of a name
+    wins. Receivers that cannot be
+    resolved (e.g. local objects) keep their dotted spelling, so obj.get() and
+    resp.get() stay distinct instead of collapsing into "get".
+    """
+    def __init__(self, tree, module_name="", module_index=None, file_name=None):
+        self.module_name = module_name
+        self.module_index = module_index
+        # {scope: {local name: qualified target}}; scope is the __qualname__ of
+        # the binding function or class, "" for the module. Nested functions
+        # are bound to their __qualname__, as CallGraphBuilder names them
+        self.aliases = {}
+        self.classes = {}  # {class name: qualified class name}
+        self.functions = set()  # Module-level function names
+        self.cache = {}
+        # Dotted spellings shared with the other analyses of the tree
+        self.names = qualified_names(tree) if tree is not None else QualifiedNames()
+        for stmt in getattr(tree, "body", ()):
+            if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self.functions.add(stmt.name)
+        self._collect(tree, [], module_index, file_name)
+
+    def _qualify(self, name):
+        return f"{self.module_name}.{name}" if self.module_name else name
+
+    def _bind(self, scope_path, name, target):
+        # Assignment rather than setdefault: a later import rebinds the name
+        self.aliases.setdefault(".".join(scope_path), {})[name] = target
+
+    def _collect(self, node, scope_path, module_index, file_name):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.Import):
+                for alias in child.names:
+                    if alias.asname:
+                        target = alias.name
+                        if module_index is not None:
+                            target = module_index.canonical(target)
+                        self._bind(scope_path, alias.asname, target)
+                    else:
+                        # "import a.b" binds "a"; _resolve_parts canonicalizes a.b.f()
+                        top = alias.name.split(".")[0]
+                        self._bind(scope_path, top, top)
+            elif isinstance(child, ast.ImportFrom):
+                if module_index is not None:
+                    module = module_index.canonical(
+                        module_index.absolute_module(file_name, child.module, child.level))
+                else:
+                    module = "." * child.level + (child.module or "")
+                for alias in child.names:
+                    target = f"{module}.{alias.name}" if module and not module.endswith(".") else module + alias.name
+                    self._bind(scope_path, alias.asname or alias.name, target)
+            elif isinstance(child, ast.ClassDef):
+                path = scope_path + [child.name]
+                self.classes.setdefault(child.name, self._qualify(".".join(path)))
+                self._collect(child, path, module_index, file_name)
+                continue
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                if scope_path and scope_path[-1] == "<locals>":
+                    self._bind(scope_path, child.name, self._qualify(".".join(scope_path + [child.name])))
+                # Classes defined inside functions get __qualname__-style names
+                self._collect(child, scope_path + [child.name, "<locals>"], module_index, file_name)
+                continue
+            self._collect(child, scope_path, module_index, file_name)
+
+    def _lookup(self, name, function):
+        """
+        Returns the import or nested function bound to name as seen from the
+        function with __qualname__ function (None for module-level code), or None.
+        """
+        # Functions see their own bindings, then those of the enclosing
+        # functions, then the module's; class bodies are skipped, as in Python
+        while function:
+            aliases = self.aliases.get(f"{function}.<locals>")
+            if aliases is not None and name in aliases:
+                return aliases[name]
+            function, separator, _ = function.rpartition(".<locals>.")
+            if not separator:
+                break
+        return self.aliases.get("", {}).get(name)
+
+    def resolve(self, func, class_name=None, function=None):
+        """
+        Returns the qualified name of the callee expression func, or None if
+        it is neither a name nor an attribute. function is the __qualname__ of
+        the function containing the call (None for module-level code).
+        """
+        parts = self.names.dotted(func)
+        if parts is None:
+            # Calls on call results or subscripts keep the bare attribute
+            return func.attr if isinstance(func, ast.Attribute) else None
+        key = (self.names.name(func), class_name, function)
+        qualified = self.cache.get(key)
+        if qualified is None:
+            qualified = self.cache[key] = self._resolve_parts(parts, class_name, function)
+        return qualified
+
+    def _resolve_parts(self, parts, class_name, function):
+        base, rest = parts[0], parts[1:]
+        imported = self._lookup(base, function)
+        if base in ("self", "cls") and class_name and rest:
+            target = self.classes.get(class_name, self._qualify(class_name))
+        elif imported is not None:
+            if self.module_index is not None:
+                # The longest prefix naming an archive module gets its crawled
+                # name, e.g. a.b.f() after "import a.b"
+                for end in range(len(rest), -1, -1):
+                    module = ".".join([imported, *rest[:end]])
+                    if self.module_index.resolve(module) is not None:
+                        return ".".join([self.module_index.canonical(module), *rest[end:]])
+            target = imported
+        elif base in self.classes:
+            target = self.classes[base]
+        elif base in self.functions:
+            target = self._qualify(base)
+        else:
+            # Builtins and local objects keep their spelling
+            return ".".join(parts)
+        return ".".join([target, *rest])
+
 
 class CallGraphBuilder(ast.NodeVisitor):
     """
     Builds a call graph by traversing the AST of Python source code.
     """
-    def __init__(self):
+    def __init__(self, module_index=None, file_name=None):
         # key - function, value - set of functions it calls
         self.call_graph = {}  # Adjacency list representing function calls
         self.current_function = None
+        self.module_index = module_index
+        self.file_name = file_name
+        self.resolver = None  # CalleeResolver of the module being visited
+        self.class_stack = []
+        # Qualified names of the enclosing classes and functions, innermost last,
+        # paired with whether each one is a function
+        self.definition_stack = []
+
+    def visit_Module(self, node):
+        self.enter_Module(node)
+        self.generic_visit(node)
+
+    def enter_Module(self, node):
+        module_name = module_name_for(self.file_name, self.module_index)
+        self.resolver = CalleeResolver(node, module_name, self.module_index, self.file_name)
+
+    @property
+    def module_name(self):
+        return self.resolver.module_name if self.resolver is not None else ""
+
+    def visit_ClassDef(self, node):
+        self.enter_ClassDef(node)
+        self.generic_visit(node)
+        self.leave_ClassDef(node)
+
+    def enter_ClassDef(self, node):
+        self.class_stack.append(node.name)
+        self.definition_stack.append((self._qualname(node.name), False))
+
+    def leave_ClassDef(self, node):
+        self.class_stack.pop()
+        self.definition_stack.pop()
+
+    def _qualname(self, name):
+        """Returns the __qualname__-style name of a definition in the current scope."""
+        if not self.definition_stack:
+            return name
+        parent, parent_is_function = self.definition_stack[-1]
+        return f"{parent}.<locals>.{name}" if parent_is_function else f"{parent}.{name}"
+
+    def _innermost_function(self):
+        for qualname, is_function in reversed(self.definition_stack):
+            if is_function:
+                return qualname
+        return None
 
     def visit_FunctionDef(self, node):
         """
         Visits a function definition, setting it as the current function
         and tracking its calls.
         """
-        self.current_function = node.name
+        self.enter_FunctionDef(node)
+        self.generic_visit(node)
+        self.leave_FunctionDef(node)
+
+    def enter_FunctionDef(self, node):
+        # Keyed by qualified name, so same-named methods and nested functions stay apart
+        self.current_function = self._qualname(node.name)
+        self.definition_stack.append((self.current_function, True))
         if self.current_function not in self.call_graph:
             self.call_graph[self.current_function] = set()
-        self.generic_visit(node)
-        self.current_function = None  # Reset after processing the function
+
+    def leave_FunctionDef(self, node):
+        self.definition_stack.pop()
+        # Calls after a nested def still belong to the enclosing function
+        self.current_function = self._innermost_function()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+    enter_AsyncFunctionDef = enter_FunctionDef
+    leave_AsyncFunctionDef = leave_FunctionDef
 
     def visit_Call(self, node):
         """
         Visits a function call and adds it to the graph if it occurs
         within a function.
         """
-        if self.current_function:
-            # Handle direct function calls (e.g., foo())
-            if isinstance(node.func, ast.Name):
-                self.call_graph[self.current_function].add(node.func.id)
-            # Handle method calls or attribute calls (e.g., obj.method())
-            # Todo fully qualified name
-            elif isinstance(node.func, ast.Attribute):
-                self.call_graph[self.current_function].add(node.func.attr)
+        self.enter_Call(node)
         self.generic_visit(node)
 
+    def enter_Call(self, node):
+        if self.current_function:
+            if self.resolver is None:
+                # Visited without a module (e.g. a single function's AST)
+                self.resolver = CalleeResolver(None)
+            # Direct calls (foo()), and method or attribute calls (obj.method())
+            class_name = self.class_stack[-1] if self.class_stack else None
+            callee = self.resolver.resolve(node.func, class_name, self.current_function)
+            if callee is not None:
+                self.call_graph[self.current_function].add(callee)
+
+
+class ReachabilityIndex:
+    """
+    Reachability over a directed graph given as {node: iterable of successors}.
+
+    Nodes are interned to ints and collapsed into strongly connected components
+    with an iterative Tarjan pass. Every node of an SCC reaches the same set of
+    nodes, so descendants are stored once per SCC, as an int bitset over SCC ids.
+    Tarjan emits SCCs sinks first, so a component's bitset is its own bit OR'ed
+    with its successors' already computed bitsets. Bitsets are built on first
+    use and memoized, so a query is a dict probe and a bit test once warm.
+    Reachability is reflexive: every node reaches itself.
+    """
+    def __init__(self, graph):
+        self.ids = {}  # {node: node id}
+        self.nodes = []  # Node id -> node
+        successors = []
+        for node, targets in graph.items():
+            source = self._intern(node, successors)
+            for target in targets:
+                successors[source].append(self._intern(target, successors))
+        self.component = self._tarjan(successors)  # Node id -> SCC id
+        self.members = [[] for _ in range(self.component_count)]  # SCC id -> node ids
+        for node_id, component in enumerate(self.component):
+            self.members[component].append(node_id)
+        # Condensation: deduplicated SCC successor lists, without self-loops
+        edges = [set() for _ in range(self.component_count)]
+        for source, targets in enumerate(successors):
+            for target in targets:
+                if self.component[source] != self.component[target]:
+                    edges[self.component[source]].add(self.component[target])
+        self.condensed = [sorted(targets) for targets in edges]
+        self.descendants = [None] * self.component_count  # Memoized per-SCC bitsets
+
+    def _intern(self, node, successors):
+        node_id = self.ids.get(node)
+        if node_id is None:
+            node_id = self.ids[node] = len(self.nodes)
+            self.nodes.append(node)
+            successors.append([])
+        return node_id
+
+    def _tarjan(self, successors):
+        """Iterative Tarjan; SCC ids are assigned in reverse topological order."""
+        count = len(successors)
+        index = [-1] * count
+        lowlink = [0] * count
+        on_stack = [False] * count
+        component = [-1] * count
+        stack = []
+        next_index = 0
+        self.component_count = 0
+        for root in range(count):
+            if index[root] != -1:
+                continue
+            work = [(root, iter(successors[root]))]
+            index[root] = lowlink[root] = next_index
+            next_index += 1
+            stack.append(root)
+            on_stack[root] = True
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if index[child] == -1:
+                        index[child] = lowlink[child] = next_index
+                        next_index += 1
+                        stack.append(child)
+                        on_stack[child] = True
+                        work.append((child, iter(successors[child])))
+                        break
+                    if on_stack[child]:
+                        lowlink[node] = min(lowlink[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = False
+                            component[member] = self.component_count
+                            if member == node:
+                                break
+                        self.component_count += 1
+        return component
+
+    def _descendants(self, component):
+        """Returns the memoized bitset of SCCs reachable from component."""
+        bits = self.descendants[component]
+        if bits is not None:
+            return bits
+        # Post-order over the condensation; successors are finished first
+        work = [(component, iter(self.condensed[component]))]
+        while work:
+            current, children = work[-1]
+            for child in children:
+                if self.descendants[child] is None:
+                    work.append((child, iter(self.condensed[child])))
+                    break
+            else:
+                work.pop()
+                bits = 1 << current
+                for child in self.condensed[current]:
+                    bits |= self.descendants[child]
+                self.descendants[current] = bits
+        return self.descendants[component]
+
+    def can_reach(self, source, target):
+        """True if target is reachable from source; unknown nodes reach only themselves."""
+        if source == target:
+            return True
+        source_id = self.ids.get(source)
+        target_id = self.ids.get(target)
+        if source_id is None or target_id is None:
+            return False
+        return bool(self._descendants(self.component[source_id]) >> self.component[target_id] & 1)
+
+    def reachable_pairs(self, sources, sinks):
+        """
+        Returns every (source, sink) pair where sink is reachable from source.
+
+        The sinks are folded into one SCC mask, so each source costs a single
+        AND with its descendants bitset regardless of the number of sinks.
+        """
+        sink_components = {}
+        for sink in sinks:
+            sink_id = self.ids.get(sink)
+            if sink_id is not None:
+                sink_components.setdefault(self.component[sink_id], []).append(sink)
+        sink_mask = 0
+        for component in sink_components:
+            sink_mask |= 1 << component
+        pairs = []
+        for source in sources:
+            source_id = self.ids.get(source)
+            if source_id is None:
+                continue
+            hits = self._descendants(self.component[source_id]) & sink_mask
+            while hits:
+                lowest = hits & -hits
+                pairs.extend((source, sink) for sink in sink_components[lowest.bit_length() - 1])
+                hits ^= lowest
+        return pairs
+
 
 class MultiFileCallGraphBuilder:
     def __init__(self):
         self.global_call_graph = {}  # Unified call graph across all files
+        self.file_modules = {}  # {file_name: module name} for qualifying callers
+        self._reachability = None
 
-    def build_call_graph(self, python_files_ast):
+    def build_call_graph(self, python_files_ast, module_index=None):
         for file_name, ast_tree in python_files_ast.items():
-            builder = CallGraphBuilder()
+            builder = CallGraphBuilder(module_index, file_name)
             builder.visit(ast_tree)
+            self.add_file_call_graph(file_name, builder.call_graph, builder.module_name)
 
-            # Merge the call graph of the current file into the global call graph
-            for function, calls in builder.call_graph.items():
-                if file_name not in self.global_call_graph:
-                    self.global_call_graph[file_name] = {}
-                self.global_call_graph[file_name][function] = calls
+    def add_file_call_graph(self, file_name, call_graph, module_name=None):
+        """
+        Merges the call graph of a single file into the global call graph.
+        """
+        for function, calls in call_graph.items():
+            if file_name not in self.global_call_graph:
+                self.global_call_graph[file_name] = {}
+            self.global_call_graph[file_name][function] = calls
+        self.file_modules[file_name] = module_name if module_name is not None else module_name_for(file_name)
+        self._reachability = None
 
-    def visualize_global_call_graph(self, output_filename="multi_file_call_graph"):
-        dot = Digraph(comment="Multi-File Call Graph")
+    def qualified_call_graph(self):
+        """
+        Returns the call graph as {module-qualified function: callees}, the
+        naming used for callees, so edges connect across files.
+        """
+        graph = {}
         for file_name, call_graph in self.global_call_graph.items():
-            # Create nodes for the file and its functions
-            dot.node(file_name, file_name, shape="box", style="filled", color="lightblue")
+            module_name = self.file_modules.get(file_name) or module_name_for(file_name)
             for function, calls in call_graph.items():
-                dot.node(function, function, shape="ellipse", style="filled", color="yellow")
-                dot.edge(file_name, function, label="defined in")
+                caller = f"{module_name}.{function}" if module_name else function
+                graph.setdefault(caller, set()).update(calls)
+        return graph
+
+    def reachability_index(self):
+        """Returns the ReachabilityIndex of the current graph, rebuilt only after changes."""
+        if self._reachability is None:
+            self._reachability = ReachabilityIndex(self.qualified_call_graph())
+        return self._reachability
+
+    def can_reach(self, source, target):
+        """True if the qualified function source can (transitively) call target."""
+        return self.reachability_index().can_reach(source, target)
+
+    def reachable_pairs(self, sources, sinks):
+        """Returns all (source, sink) pairs with a call path from source to sink."""
+        return self.reachability_index().reachable_pairs(sources, sinks)
+
+    def visualize_global_call_graph(self, output_filename="multi_file_call_graph", top_n=None, min_degree=0):
+        """
+        Writes the global call graph to <output_filename>.dot with one cluster
+        per file, and renders it if Graphviz's dot program is installed.
+
+        Functions are identified by their module-qualified names, so calls
+        into other files connect to the callee's own node. Each node is
+        declared once; top_n/min_degree keep only the best connected nodes so
+        large graphs stay renderable.
+        """
+        graph = self.qualified_call_graph()
+        keep = select_nodes(((function, call) for function, calls in graph.items() for call in calls),
+                            top_n, min_degree, nodes=graph)
+        with DotWriter(f"{output_filename}.dot", "Multi-File Call Graph") as dot:
+            # Functions are declared in their file's cluster before any callee
+            for file_name, call_graph in self.global_call_graph.items():
+                module_name = self.file_modules.get(file_name) or module_name_for(file_name)
+                functions = [(f"{module_name}.{function}" if module_name else function, function)
+                             for function in call_graph]
+                functions = [(node, label) for node, label in functions if node in keep]
+                if not functions:
+                    continue
+                dot.begin_cluster(file_name)
+                for node, label in functions:
+                    dot.node(node, label, shape="ellipse", style="filled", color="yellow")
+                dot.end_cluster()
+            for function, calls in graph.items():
+                if function not in keep:
+                    continue
                 for call in calls:
-                    dot.node(call, call, shape="ellipse", style="filled", color="green")
-                    dot.edge(function, call, label="calls")
+                    if call in keep:
+                        dot.node(call, shape="ellipse", style="filled", color="green")
+                        dot.edge(function, call, label="calls")
 
-        dot.render(output_filename, format="png", cleanup=True)
-        print(f"Global call graph visualization saved to {output_filename}.png")
+        print(f"Global call graph visualization saved to {render(dot.path) or dot.path}")
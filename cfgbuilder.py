@@ -1,6 +1,12 @@
 import ast
 import argparse
+import heapq
+from array import array
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from types import MappingProxyType
+from qualnames import QualifiedNames, qualified_names
+from traversal import SKIP_CHILDREN
 
 class GlobalRegistry:
     """Tracks variables, lambdas, calls, and expressions across modules."""
@@ -15,10 +21,68 @@ class GlobalRegistry:
     def get_definition(self, module_name, symbol_name):
         return self.registry.get(module_name, {}).get(symbol_name, None)
 
+    def begin_member(self, file_name):
+        """Called before an archive member registers its definitions; persistent registries track members."""
+
+    def reuse_member(self, file_name):
+        """Called instead of begin_member for a member whose stored definitions are reused."""
+
+    def merge(self, registry):
+        """Merges another {module_name: {symbol_name: {context}}} mapping into this one."""
+        for module_name, symbols in registry.items():
+            if module_name not in self.registry:
+                self.registry[module_name] = {}
+            self.registry[module_name].update(symbols)
+
+    def merge_shards(self, shards):
+        """
+        Merges registry shards in the given order.
+
+        Each shard is a list of (file_name, registry) pairs, one per archive
+        member; registry is None for a member whose stored definitions are
+        reused. Later members win for a symbol defined in several members, and
+        symbols keep the position of their first definition, exactly as if the
+        files had registered into this registry one after another.
+        """
+        for shard in shards:
+            for file_name, registry in shard:
+                if registry is None:
+                    self.reuse_member(file_name)
+                    continue
+                self.begin_member(file_name)
+                self.merge(registry)
+
+class DefinitionDomain:
+    """Interns the definitions of one CFG to bit positions for bit-vector sets."""
+    def __init__(self):
+        self.bits = {}  # {definition: bit position}
+        self.definitions = []  # Bit position -> definition
+
+    def encode(self, definitions):
+        """Returns the int bit-vector of the given definitions, interning new ones."""
+        vector = 0
+        for definition in definitions:
+            bit = self.bits.get(definition)
+            if bit is None:
+                bit = self.bits[definition] = len(self.definitions)
+                self.definitions.append(definition)
+            vector |= 1 << bit
+        return vector
+
+    def decode(self, vector):
+        """Returns the set of definitions whose bits are set in the vector."""
+        definitions = set()
+        while vector:
+            lowest = vector & -vector
+            definitions.add(self.definitions[lowest.bit_length() - 1])
+            vector ^= lowest
+        return definitions
+
 class CFGNode:
     """Represents a basic block in the control flow graph."""
-    def __init__(self, name, node_type,scope):
+    def __init__(self, name, node_type,scope, node_id=None):
         self.name = name
+        self.node_id = node_id  # Dense integer id assigned by the builder
         self.node_type = node_type  # Type of AST node (e.g., Assign, If, Try)
         self.statements = []
         self.scope = scope  # Scope the node belongs to
@@ -28,6 +92,32 @@ class CFGNode:
         self.in_set = set()  # Definitions available at the entry
         self.out_set = set()  # Definitions available at the exit
         self.use_map = defaultdict(set)  # Tracks uses for each definition
+        # Bit-vector form of in_set/out_set, used when domain is set
+        self.domain = None
+        self.in_bits = 0
+        self.out_bits = 0
+
+    @property
+    def in_set(self):
+        """Definitions available at the entry, decoded if stored as a bit-vector."""
+        if self.domain is not None:
+            return self.domain.decode(self.in_bits)
+        return self._in_set
+
+    @in_set.setter
+    def in_set(self, value):
+        self._in_set = value
+
+    @property
+    def out_set(self):
+        """Definitions available at the exit, decoded if stored as a bit-vector."""
+        if self.domain is not None:
+            return self.domain.decode(self.out_bits)
+        return self._out_set
+
+    @out_set.setter
+    def out_set(self, value):
+        self._out_set = value
 
     def add_statement(self, statement):
         self.statements.append(statement)
@@ -35,6 +125,15 @@ class CFGNode:
     def add_successor(self, successor):
         self.successors.append(successor)
 
+    def add_gen(self, definition):
+        self.gen.add(definition)
+
+    def add_kill(self, definition):
+        self.kill.add(definition)
+
+    def add_use(self, scope, var_name):
+        self.use_map[scope].add(var_name)
+
     def __repr__(self):
         #return f"CFGNode({self.name}, type={self.node_type}, successors={[s.name for s in self.successors]})"
         #return f"CFGNode({self.name}, type={self.node_type}, gen={self.gen}, kill={self.kill}, in_set={self.in_set}, out_set={self.out_set})"
@@ -42,38 +141,484 @@ class CFGNode:
                 #f"gen={self.gen}, kill={self.kill}, in_set={self.in_set}, out_set={self.out_set}, "
                 f"use_map={dict(self.use_map)})")
 
+class BasicBlock(CFGNode):
+    """
+    A CFG node holding a run of consecutive straight-line statements.
+
+    gen/kill describe the whole block; each statement's own gen/kill is kept
+    alongside it so per-statement facts can be recovered with statement_facts().
+    """
+    def __init__(self, name, scope, node_id=None):
+        super().__init__(name, "Block", scope, node_id)
+        self.statement_gen = []
+        self.statement_kill = []
+        self.closed = False  # Ended by a return or raise; later statements start a new block
+
+    def add_statement(self, statement):
+        super().add_statement(statement)
+        self.statement_gen.append(set())
+        self.statement_kill.append(set())
+
+    def add_gen(self, definition):
+        if not self.statements:
+            self.add_statement(None)  # Expression outside any statement
+        self.statement_gen[-1].add(definition)
+        self.gen.add(definition)
+
+    def add_kill(self, definition):
+        if not self.statements:
+            self.add_statement(None)
+        self.statement_kill[-1].add(definition)
+        self.kill.add(definition)
+        # Block Gen = Gen_n ∪ (Gen_(n-1) - Kill_n) ∪ ...
+        if definition not in self.statement_gen[-1]:
+            self.gen.discard(definition)
+
+    def statement_facts(self):
+        """Returns (statement, in_set, out_set) for each statement of the block."""
+        facts = []
+        in_set = set(self.in_set)
+        for statement, gen, kill in zip(self.statements, self.statement_gen, self.statement_kill):
+            out_set = gen | (in_set - kill)
+            facts.append((statement, in_set, out_set))
+            in_set = out_set
+        return facts
+
+# CFG node types that do not branch or open a scope; merged in basic-block mode
+STRAIGHT_LINE_TYPES = frozenset({
+    "Assign", "AnnAssign", "AugAssign", "Expr", "Import", "ImportFrom", "Global", "Nonlocal",
+    "Return", "Raise", "Call", "Attribute", "Name", "BinOp", "UnaryOp", "Subscript",
+    "Yield", "ListComp", "DictComp", "GeneratorExp",
+})
+
+# Straight-line node types that node mode attaches beside the current path
+# instead of appending to it; a block opened for one is attached the same way
+SIDE_NODE_TYPES = frozenset({
+    "Return", "Raise", "Name", "BinOp", "UnaryOp", "Subscript",
+    "Yield", "ListComp", "DictComp", "GeneratorExp",
+})
+
+# Node types that end their basic block: nothing after them runs in sequence
+BLOCK_END_TYPES = frozenset({"Return", "Raise"})
+
+_EMPTY_SET = frozenset()
+_EMPTY_MAP = MappingProxyType({})
+
+class CompactCFGNode:
+    """
+    Memory-compact drop-in for CFGNode.
+
+    Uses __slots__ and allocates each container only on its first write through
+    add_statement/add_successor/add_gen/add_kill/add_use; until then the
+    attributes read as shared empty, read-only containers. Empty in/out sets
+    are stored as None.
+    """
+    __slots__ = ("name", "node_id", "node_type", "scope", "_statements", "_successors", "_gen", "_kill",
+                 "_in_set", "_out_set", "_use_map", "domain", "in_bits", "out_bits")
+
+    def __init__(self, name, node_type, scope, node_id=None):
+        self.name = name
+        self.node_id = node_id
+        self.node_type = node_type
+        self.scope = scope
+        self._statements = None
+        self._successors = None
+        self._gen = None
+        self._kill = None
+        self._in_set = None
+        self._out_set = None
+        self._use_map = None
+        self.domain = None
+        self.in_bits = 0
+        self.out_bits = 0
+
+    @property
+    def statements(self):
+        return self._statements or ()
+
+    @property
+    def successors(self):
+        return self._successors or ()
+
+    @property
+    def gen(self):
+        return self._gen or _EMPTY_SET
+
+    @property
+    def kill(self):
+        return self._kill or _EMPTY_SET
+
+    @property
+    def use_map(self):
+        return self._use_map or _EMPTY_MAP
+
+    @property
+    def in_set(self):
+        if self.domain is not None:
+            return self.domain.decode(self.in_bits)
+        return self._in_set or _EMPTY_SET
+
+    @in_set.setter
+    def in_set(self, value):
+        self._in_set = value or None
+
+    @property
+    def out_set(self):
+        if self.domain is not None:
+            return self.domain.decode(self.out_bits)
+        return self._out_set or _EMPTY_SET
+
+    @out_set.setter
+    def out_set(self, value):
+        self._out_set = value or None
+
+    def add_statement(self, statement):
+        if self._statements is None:
+            self._statements = []
+        self._statements.append(statement)
+
+    def add_successor(self, successor):
+        if self._successors is None:
+            self._successors = []
+        self._successors.append(successor)
+
+    def add_gen(self, definition):
+        if self._gen is None:
+            self._gen = set()
+        self._gen.add(definition)
+
+    def add_kill(self, definition):
+        if self._kill is None:
+            self._kill = set()
+        self._kill.add(definition)
+
+    def add_use(self, scope, var_name):
+        if self._use_map is None:
+            self._use_map = {}
+        uses = self._use_map.get(scope)
+        if uses is None:
+            uses = self._use_map[scope] = set()
+        uses.add(var_name)
+
+    __repr__ = CFGNode.__repr__
+
+_COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+class _SymbolScope:
+    """Names bound, declared and referenced in one module, class, function or comprehension scope."""
+    def __init__(self, node, parent):
+        self.node = node
+        self.parent = parent
+        self.is_class = isinstance(node, ast.ClassDef)
+        self.is_module = parent is None
+        self.bound = set()
+        self.referenced = set()
+        self.global_names = set()
+        self.nonlocal_names = set()
+
+class _SymbolCollector(ast.NodeVisitor):
+    """AST pre-pass recording, per scope, which names it binds, declares and uses."""
+    def __init__(self):
+        self.scopes = []
+        self.current = None
+
+    def _push(self, node):
+        scope = _SymbolScope(node, self.current)
+        self.scopes.append(scope)
+        self.current = scope
+        return scope
+
+    def _pop(self):
+        self.current = self.current.parent
+
+    def _bind(self, name):
+        self.current.bound.add(name)
+
+    def _visit_all(self, nodes):
+        for node in nodes:
+            if node is not None:
+                self.visit(node)
+
+    def visit_Module(self, node):
+        self._push(node)
+        self._visit_all(node.body)
+        self._pop()
+
+    def _visit_arguments(self, args):
+        # Defaults and annotations are evaluated in the enclosing scope
+        self._visit_all(args.defaults)
+        self._visit_all(args.kw_defaults)
+        for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+            if arg is not None and arg.annotation is not None:
+                self.visit(arg.annotation)
+
+    def _bind_arguments(self, args):
+        for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+            if arg is not None:
+                self._bind(arg.arg)
+
+    def visit_FunctionDef(self, node):
+        self._bind(node.name)
+        self._visit_all(node.decorator_list)
+        self._visit_arguments(node.args)
+        if node.returns is not None:
+            self.visit(node.returns)
+        self._push(node)
+        self._bind_arguments(node.args)
+        self._visit_all(node.body)
+        self._pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        self._visit_arguments(node.args)
+        self._push(node)
+        self._bind_arguments(node.args)
+        self.visit(node.body)
+        self._pop()
+
+    def visit_ClassDef(self, node):
+        self._bind(node.name)
+        self._visit_all(node.decorator_list)
+        self._visit_all(node.bases)
+        self._visit_all(node.keywords)
+        self._push(node)
+        self._visit_all(node.body)
+        self._pop()
+
+    def _visit_comprehension(self, node, elements):
+        # The first iterable is evaluated in the enclosing scope
+        self.visit(node.generators[0].iter)
+        self._push(node)
+        for index, generator in enumerate(node.generators):
+            self.visit(generator.target)
+            if index:
+                self.visit(generator.iter)
+            self._visit_all(generator.ifs)
+        self._visit_all(elements)
+        self._pop()
+
+    def visit_ListComp(self, node):
+        self._visit_comprehension(node, [node.elt])
+
+    visit_SetComp = visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node):
+        self._visit_comprehension(node, [node.key, node.value])
+
+    def visit_NamedExpr(self, node):
+        # Walrus targets bind in the nearest enclosing non-comprehension scope
+        scope = self.current
+        while isinstance(scope.node, _COMPREHENSIONS):
+            scope = scope.parent
+        scope.bound.add(node.target.id)
+        self.visit(node.value)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.current.referenced.add(node.id)
+        else:
+            self._bind(node.id)
+
+    def visit_Global(self, node):
+        self.current.global_names.update(node.names)
+
+    def visit_Nonlocal(self, node):
+        self.current.nonlocal_names.update(node.names)
+
+    def visit_alias(self, node):
+        # "import a.b" binds "a"; "import a.b as c" binds "c"
+        if node.name == "*":
+            return
+        self._bind(node.asname or node.name.split(".")[0])
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self._bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchAs(self, node):
+        if node.name:
+            self._bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchStar(self, node):
+        if node.name:
+            self._bind(node.name)
+
+    def visit_MatchMapping(self, node):
+        if node.rest:
+            self._bind(node.rest)
+        self.generic_visit(node)
+
+class SymbolTableResolver:
+    """
+    Classifies every name of every scope in a module once, up front.
+
+    Each scope gets a table {name: "global" | "nonlocal" | owning scope node},
+    following Python's rules: a name bound anywhere in a function is local to
+    the whole function (so forward references resolve correctly), class bodies
+    are skipped when resolving free variables, and comprehensions have their
+    own scope except for their first iterable and walrus targets.
+    """
+    def __init__(self, tree):
+        collector = _SymbolCollector()
+        collector.visit(tree)
+        self.tables = {id(scope.node): self._classify(scope) for scope in collector.scopes}
+
+    @staticmethod
+    def _classify(scope):
+        table = {}
+        for name in scope.bound | scope.referenced | scope.global_names | scope.nonlocal_names:
+            if name in scope.global_names:
+                table[name] = "global"
+            elif name in scope.nonlocal_names:
+                table[name] = "nonlocal"
+            elif name in scope.bound:
+                table[name] = "global" if scope.is_module else scope.node
+            else:
+                table[name] = SymbolTableResolver._resolve_free(scope.parent, name)
+        return table
+
+    @staticmethod
+    def _resolve_free(scope, name):
+        while scope is not None and not scope.is_module:
+            if not scope.is_class:
+                if name in scope.global_names:
+                    return "global"
+                if name in scope.bound and name not in scope.nonlocal_names:
+                    return scope.node
+            scope = scope.parent
+        return "global"
+
+    def scope_symbols(self, node, labels):
+        """
+        Returns {name: resolved scope name} for the scope opened by node.
+
+        labels maps id(scope node) to the name the scope was entered under; an
+        owner that is not active (e.g. a comprehension) falls back to its own name.
+        """
+        symbols = {}
+        for name, owner in self.tables.get(id(node), {}).items():
+            if not isinstance(owner, str):
+                owner = labels.get(id(owner)) or getattr(owner, "name", type(owner).__name__)
+            symbols[name] = owner
+        return symbols
+
+class ContextRegistry:
+    """
+    Variable contexts keyed by (scope id, symbol id).
+
+    Every entered scope gets its own id and a {symbol id: context} table, and
+    symbol names are interned once, so the same name in two scopes no longer
+    shares one slot. A context is allocated once per scope and symbol and then
+    updated in place. Scope id 0 holds names registered outside any scope.
+    """
+    def __init__(self):
+        self.symbol_ids = {}  # Name -> symbol id
+        self.symbol_names = []  # Symbol id -> name
+        self.scope_names = ["global"]  # Scope id -> scope name
+        self.tables = [{}]  # Scope id -> {symbol id: context}
+
+    def new_scope(self, scope_name):
+        self.scope_names.append(scope_name)
+        self.tables.append({})
+        return len(self.tables) - 1
+
+    def symbol_id(self, name):
+        symbol = self.symbol_ids.get(name)
+        if symbol is None:
+            symbol = self.symbol_ids[name] = len(self.symbol_names)
+            self.symbol_names.append(name)
+        return symbol
+
+    def define(self, scope_id, name, scope):
+        """Records that name belongs to scope ("global", "nonlocal" or a scope name)."""
+        table = self.tables[scope_id]
+        symbol = self.symbol_id(name)
+        context = table.get(symbol)
+        if context is None:
+            table[symbol] = {"scope": scope, "usages": set()}
+        else:
+            context["scope"] = scope
+        return table[symbol]
+
+    def set_context(self, scope_id, name, context):
+        self.tables[scope_id][self.symbol_id(name)] = context
+
+    def get(self, scope_id, name):
+        symbol = self.symbol_ids.get(name)
+        if symbol is None:
+            return None
+        return self.tables[scope_id].get(symbol)
+
+    def items(self):
+        """Yields ((scope name, name), context) for every registered symbol."""
+        for scope_id, table in enumerate(self.tables):
+            for symbol, context in table.items():
+                yield (self.scope_names[scope_id], self.symbol_names[symbol]), context
+
+    def __len__(self):
+        return sum(len(table) for table in self.tables)
+
 class ScopeManager:
     """Manages scope resolution."""
-    def __init__(self):
+    def __init__(self, resolver=None):
         self.scopes = []  # Stack of active scopes
         self.global_vars = set()  # Track globally declared variables
         self.nonlocal_vars = set()  # Track nonlocally declared variables
-        self.context_registry = {}  # Track variables and their context across scopes
-
-    def enter_scope(self, scope_name):
-        self.scopes.append({"name": scope_name, "local_vars": set()})
+        self.context_registry = ContextRegistry()  # Track variables and their context across scopes
+        # Optional SymbolTableResolver; scopes entered with their AST node then
+        # answer resolve_scope from a precomputed table
+        self.resolver = resolver
+        self.symbols = None  # Symbol table of the innermost scope, if any
+        self.labels = {}  # id(scope AST node) -> name of the active scope
+
+    def enter_scope(self, scope_name, node=None):
+        scope = {"name": scope_name, "local_vars": set(), "symbols": None,
+                 "id": self.context_registry.new_scope(scope_name)}
+        if self.resolver is not None and node is not None:
+            self.labels[id(node)] = scope_name
+            scope["symbols"] = self.resolver.scope_symbols(node, self.labels)
+        self.scopes.append(scope)
+        self.symbols = scope["symbols"]
 
     def exit_scope(self):
         self.scopes.pop()
+        self.symbols = self.scopes[-1]["symbols"] if self.scopes else None
 
     def current_scope(self):
         return self.scopes[-1]["name"] if self.scopes else "global"
 
+    def current_scope_id(self):
+        return self.scopes[-1]["id"] if self.scopes else 0
+
     def add_local_var(self, var_name):
         if self.scopes:
             current_scope = self.scopes[-1]["name"]
             self.scopes[-1]["local_vars"].add(var_name)
-            self.context_registry[var_name] = {"scope": current_scope, "usages": set()}
+            self.context_registry.define(self.scopes[-1]["id"], var_name, current_scope)
 
     def add_global_var(self, var_name):
         self.global_vars.add(var_name)
-        self.context_registry[var_name] = {"scope": "global", "usages": set()}
+        self.context_registry.define(self.current_scope_id(), var_name, "global")
 
     def add_nonlocal_var(self, var_name):
         self.nonlocal_vars.add(var_name)
-        self.context_registry[var_name] = {"scope": "nonlocal", "usages": set()}
+        self.context_registry.define(self.current_scope_id(), var_name, "nonlocal")
+
+    def lookup_context(self, var_name):
+        """Returns the context of var_name in the innermost active scope that registered it."""
+        for scope in reversed(self.scopes):
+            context = self.context_registry.get(scope["id"], var_name)
+            if context is not None:
+                return context
+        return self.context_registry.get(0, var_name)
 
     def resolve_scope(self, var_name):
+        if self.symbols is not None:
+            # Names missing from the table are builtins or undefined
+            return self.symbols.get(var_name, "global")
         # Check if the variable is global
         if var_name in self.global_vars:
             return "global"
@@ -89,98 +634,342 @@ class ScopeManager:
         return "global"
 
     def register_usage(self, var_name, usage_scope):
-        if var_name in self.context_registry:
-            self.context_registry[var_name]["usages"].add(usage_scope)
+        context = self.lookup_context(var_name)
+        if context is not None:
+            context["usages"].add(usage_scope)
+
+def reverse_postorder(successors, entry=0):
+    """
+    Orders graph nodes (given as successor index lists) in reverse postorder
+    from the entry node. Nodes unreachable from the entry follow in index order.
+    """
+    count = len(successors)
+    visited = [False] * count
+    postorder = []
+    if count:
+        visited[entry] = True
+        stack = [(entry, iter(successors[entry]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if not visited[child]:
+                    visited[child] = True
+                    stack.append((child, iter(successors[child])))
+                    break
+            else:
+                stack.pop()
+                postorder.append(node)
+    order = postorder[::-1]
+    order.extend(i for i in range(count) if not visited[i])
+    return order
+
+def solve_forward_dataflow(successors, transfer, empty, entry=0):
+    """
+    Solves a forward "may" dataflow problem with a worklist.
+
+    Predecessor lists are built once, and nodes are processed in reverse
+    postorder; only the successors of a node whose Out value changed are
+    revisited. Values only need to support `|` and `!=`, so both sets and
+    int bit-vectors work.
+
+    Args:
+        successors (list): Successor index lists, one per node.
+        transfer (callable): transfer(i, in_value) -> out_value for node i.
+        empty (callable): Returns a fresh bottom value (e.g. set or int).
+        entry (int): Index of the entry node.
+
+    Returns:
+        tuple: (in_values, out_values) lists indexed like successors.
+    """
+    count = len(successors)
+    predecessors = [[] for _ in range(count)]
+    for i, succs in enumerate(successors):
+        for succ in succs:
+            predecessors[succ].append(i)
+
+    order = reverse_postorder(successors, entry)
+    position = [0] * count
+    for pos, i in enumerate(order):
+        position[i] = pos
+
+    in_values = [None] * count
+    out_values = [transfer(i, empty()) for i in range(count)]  # Out = Gen initially
+    # Every node is processed at least once, in reverse postorder
+    worklist = list(range(count))
+    on_worklist = [True] * count
+    while worklist:
+        i = order[heapq.heappop(worklist)]
+        on_worklist[i] = False
+        # Compute In value as union of Out values of predecessors
+        in_value = empty()
+        for pred in predecessors[i]:
+            in_value = in_value | out_values[pred]
+        in_values[i] = in_value
+        out_value = transfer(i, in_value)
+        if out_value != out_values[i]:
+            out_values[i] = out_value
+            for succ in successors[i]:
+                if not on_worklist[succ]:
+                    on_worklist[succ] = True
+                    heapq.heappush(worklist, position[succ])
+    return in_values, out_values
+
+class FunctionCFG:
+    """
+    The CFG of one function, lambda or module-level body.
+
+    Reaching definitions never cross these boundaries, so each FunctionCFG is
+    solved on its own, and a changed function only needs its own CFG rebuilt
+    (e.g. by visiting its FunctionDef with a fresh per-function builder).
+    """
+    def __init__(self, name):
+        self.name = name  # Qualified name, e.g. "Handler.get" or "<module>"
+        self.entry = None
+        self.nodes = []  # Every node of the graph in creation order; names may repeat
+        self.domain = None  # DefinitionDomain when solved as bit-vectors
+
+    def __repr__(self):
+        return f"FunctionCFG({self.name}, nodes={len(self.nodes)})"
 
 class CFGBuilder(ast.NodeVisitor):
     """Builds a control flow graph from Python source code."""
-    def __init__(self):
+    def __init__(self, compact_nodes=False, basic_blocks=False, per_function=False,
+                 symbol_tables=False):
+        # CompactCFGNode trades attribute access speed for much smaller nodes
+        self.node_class = CompactCFGNode if compact_nodes else CFGNode
+        # Coalesce consecutive straight-line statements into BasicBlock nodes
+        self.basic_blocks = basic_blocks
+        # Build one FunctionCFG per function/lambda/module body instead of one graph
+        self.per_function = per_function
+        # Resolve names from a per-module SymbolTableResolver instead of the scope stack
+        self.symbol_tables = symbol_tables
+        # Optional ModuleIndex of the archive and the member being built
+        self.module_index = None
+        self.file_name = None
+        self.cfgs = []
+        self.current_cfg = None
+        self._cfg_stack = []
         self.nodes = {}
+        self.node_list = []  # Every node created, indexed by node_id
         self.current_node = None
         self.counter = 0
         self.scope_manager = ScopeManager()
-
-    def _create_node(self, name, node_type):
-        node = CFGNode(name, node_type,self.scope_manager.current_scope())
+        # Definition index: {scope id: {variable: [CFG nodes defining it]}}, in
+        # build order. Keyed per scope, so functions (and their FunctionCFGs in
+        # per_function mode) never see each other's definitions
+        self.definitions = defaultdict(dict)
+        # Dotted spellings of expressions, shared with the other analyses of the tree
+        self.qualified_names = QualifiedNames()
+        # {node_id: compound statement (If, For, While, With and their async forms)
+        # whose header the node evaluates}
+        self.headers = {}
+
+    def _create_node(self, name, node_type, ast_node=None):
+        if self.basic_blocks and node_type in STRAIGHT_LINE_TYPES:
+            block = self._current_block(move=node_type not in SIDE_NODE_TYPES)
+            if isinstance(ast_node, ast.stmt):
+                block.add_statement(ast_node)
+            if node_type in BLOCK_END_TYPES:
+                block.closed = True
+            return block
+        node = self.node_class(name, node_type,self.scope_manager.current_scope(), len(self.node_list))
+        self.node_list.append(node)
         self.nodes[name] = node
+        if self.current_cfg is not None:
+            self.current_cfg.nodes.append(node)
         return node
 
+    def _current_block(self, move=True):
+        """
+        Returns the open basic block, starting a new one after a branch, a
+        return or raise, or a scope change. A new block is appended to the
+        current path; with move=False it is left for the caller to attach, and
+        the current node stays where it is, as for side nodes in node mode.
+        """
+        scope = self.scope_manager.current_scope()
+        block = self.current_node
+        if not isinstance(block, BasicBlock) or block.scope != scope or block.closed:
+            block = BasicBlock(f"block_{self.counter}", scope, len(self.node_list))
+            self.node_list.append(block)
+            self.counter += 1
+            self.nodes[block.name] = block
+            if self.current_cfg is not None:
+                self.current_cfg.nodes.append(block)
+            if move:
+                if self.current_node is not None:
+                    self.current_node.add_successor(block)
+                self.current_node = block
+        return block
+
+    def _add_definition(self, var_name, cfg_node):
+        """Adds a definition to the node's gen set and to the current scope's definition index."""
+        cfg_node.add_gen(var_name)
+        scope_definitions = self.definitions[self.scope_manager.current_scope_id()]
+        defining_nodes = scope_definitions.setdefault(var_name, [])
+        if not defining_nodes or defining_nodes[-1] is not cfg_node:
+            defining_nodes.append(cfg_node)
+
+    def _redefine(self, var_name, cfg_node):
+        """
+        Adds a definition that invalidates the earlier definitions of var_name
+        in the current scope: the name is killed if the index lists any.
+        """
+        if self.definitions_of(var_name):
+            cfg_node.add_kill(var_name)
+        self._add_definition(var_name, cfg_node)
+
+    def definitions_of(self, var_name, scope_id=None):
+        """
+        Returns the CFG nodes defining var_name in the scope with the given
+        ContextRegistry id (the current scope by default), in build order.
+        """
+        if scope_id is None:
+            scope_id = self.scope_manager.current_scope_id()
+        return self.definitions.get(scope_id, {}).get(var_name, [])
+
+    def _enter_cfg(self, name):
+        """Starts a separate FunctionCFG; its first node becomes the entry."""
+        self._cfg_stack.append((self.current_cfg, self.current_node))
+        self.current_cfg = FunctionCFG(name)
+        self.cfgs.append(self.current_cfg)
+        self.current_node = None
+
+    def _start_cfg(self, entry_node):
+        self.current_cfg.entry = entry_node
+        self.current_node = entry_node
+
+    def _exit_cfg(self):
+        """Returns to the enclosing CFG where its construction left off."""
+        self.current_cfg, self.current_node = self._cfg_stack.pop()
+
+    def _qualified_scope(self, name):
+        return ".".join([scope["name"] for scope in self.scope_manager.scopes[1:]] + [name])
+
+    def _link(self, cfg_node):
+        """Appends a node to the current path and makes it the current node."""
+        if cfg_node is self.current_node:
+            return  # Merged into the current basic block
+        self.current_node.add_successor(cfg_node)
+        self.current_node = cfg_node
+
+    def _attach(self, cfg_node):
+        """Adds a node as a successor of the current node without moving along."""
+        if cfg_node is not self.current_node:
+            self.current_node.add_successor(cfg_node)
+
     def visit_Module(self, node):
-        self.scope_manager.enter_scope("global")  # Enter global scope
-        start_node = self._create_node("start", "Module")
-        self.current_node = start_node
+        self._begin_module(node)
         for stmt in node.body:
             self.visit(stmt)
+        self._end_module()
+
+    def _begin_module(self, node):
+        self.qualified_names = qualified_names(node)
+        if self.symbol_tables:
+            self.scope_manager.resolver = SymbolTableResolver(node)
+            self.scope_manager.labels = {}
+        self.scope_manager.enter_scope("global", node)  # Enter global scope
+        if self.per_function:
+            self._enter_cfg("<module>")
+        start_node = self._create_node("start", "Module")
+        self.current_node = start_node
+        if self.per_function:
+            self._start_cfg(start_node)
+
+    def _end_module(self):
         self.scope_manager.exit_scope()  # Exit global scope
+        if self.per_function:
+            self._exit_cfg()
 
     def visit_Import(self, node):
-        import_node = self._create_node(f"import_{self.counter}", "Import")
+        import_node = self._create_node(f"import_{self.counter}", "Import", node)
         self.counter += 1
         # Add imported module names to the gen set
         for alias in node.names:
-            import_node.gen.add(alias.name)
+            self._add_definition(alias.name, import_node)
             # Register the imported symbol in the global registry
-            self.global_registry.register_definition(self.scope_manager.current_scope(), alias.name, {
+            context = {
                 "type": "module",
                 "imported_as": alias.asname or alias.name
-            })
-        self.current_node.add_successor(import_node)
-        self.current_node = import_node
+            }
+            if self.module_index is not None:
+                # Archive member defining the module, None if it is external
+                context["defined_in"] = self.module_index.resolve(alias.name)
+            self.global_registry.register_definition(self.scope_manager.current_scope(), alias.name, context)
+        self._link(import_node)
 
     def visit_ImportFrom(self, node):
-        importfrom_node = self._create_node(f"importfrom_{self.counter}", "ImportFrom")
+        importfrom_node = self._create_node(f"importfrom_{self.counter}", "ImportFrom", node)
         self.counter += 1
         module_name = node.module or "global"
         # Add imported names to the gen set with module context
         for alias in node.names:
             name = f"{node.module}.{alias.name}" if node.module else alias.name
-            importfrom_node.gen.add(name)
+            self._add_definition(name, importfrom_node)
             # Register the imported symbol in the global registry
-            self.global_registry.register_definition(self.scope_manager.current_scope(), alias.name, {
+            context = {
                 "type": "module",
                 "imported_from": module_name,
                 "imported_as": alias.asname or alias.name
-            })
-        self.current_node.add_successor(importfrom_node)
-        self.current_node = importfrom_node
+            }
+            if self.module_index is not None:
+                # Relative imports become absolute; defined_in is the archive member
+                absolute, context["defined_in"] = self.module_index.resolve_import(
+                    self.file_name, node.module, alias.name, node.level)
+                context["imported_from"] = absolute or "global"
+            self.global_registry.register_definition(self.scope_manager.current_scope(), alias.name, context)
+        self._link(importfrom_node)
 
     def visit_ClassDef(self, node):
-        self.scope_manager.enter_scope(node.name)  # Enter class scope
-        class_node = self._create_node(node.name, "ClassDef")
-        self.current_node.add_successor(class_node)
-        self.current_node = class_node
+        self._begin_class(node)
         for stmt in node.body:
             self.visit(stmt)
         self.scope_manager.exit_scope()  # Exit class scope
 
+    def _begin_class(self, node):
+        self.scope_manager.enter_scope(node.name, node)  # Enter class scope
+        class_node = self._create_node(node.name, "ClassDef")
+        self._link(class_node)
+
     def visit_FunctionDef(self, node):
-        self.scope_manager.enter_scope(node.name)  # Enter function scope
-        func_node = self._create_node(node.name, "FunctionDef")
-        self.current_node.add_successor(func_node)
-        self.current_node = func_node
-        # Add arguments to the gen set
-        for arg in node.args.args:
-            self.scope_manager.add_local_var(arg.arg)
-            func_node.gen.add(arg.arg)
+        if self.per_function:
+            # Decorators run before the function exists, in the enclosing CFG
+            for decorator in node.decorator_list:
+                self.visit(decorator)
+        self._begin_function(node)
         for stmt in node.body:
             self.visit(stmt)
-        # Handle decorators
-        for decorator in node.decorator_list:
-            self.visit(decorator)
-        self.scope_manager.exit_scope()  # Exit function scope
+        if not self.per_function:
+            # Handle decorators
+            for decorator in node.decorator_list:
+                self.visit(decorator)
+        self._end_function()
 
     def visit_AsyncFunctionDef(self, node):
-        self.scope_manager.enter_scope(node.name)  # Enter function scope
-        async_func_node = self._create_node(node.name, "AsyncFunctionDef")
-        self.current_node.add_successor(async_func_node)
-        self.current_node = async_func_node
+        self._begin_function(node)
+        for stmt in node.body:
+            self.visit(stmt)
+        self._end_function()
+
+    def _begin_function(self, node):
+        if self.per_function:
+            self._enter_cfg(self._qualified_scope(node.name))
+        self.scope_manager.enter_scope(node.name, node)  # Enter function scope
+        func_node = self._create_node(node.name, type(node).__name__)
+        if self.per_function:
+            # The function's own CFG starts at its definition node
+            self._start_cfg(func_node)
+        else:
+            self._link(func_node)
         # Add arguments to the gen set
         for arg in node.args.args:
             self.scope_manager.add_local_var(arg.arg)
-            async_func_node.gen.add(arg.arg)
-        for stmt in node.body:
-            self.visit(stmt)
+            self._add_definition(arg.arg, func_node)
+
+    def _end_function(self):
         self.scope_manager.exit_scope()  # Exit function scope
+        if self.per_function:
+            self._exit_cfg()
 
     def visit_Global(self, node):
         for name in node.names:
@@ -197,46 +986,51 @@ class CFGBuilder(ast.NodeVisitor):
         # Track variables used as arguments
         for arg in node.args:
             if isinstance(arg, ast.Name):
-                arg_scope = self.scope_manager.resolve_scope(arg.id)
-                # Check if the argument is defined in another module
-                global_definition = self.global_registry.get_definition(arg_scope, arg.id)
-                if global_definition:
-                    call_node.gen.add(arg.id)
-                    call_node.use_map[global_definition["type"]].add(arg.id)
-                else:
-                    call_node.gen.add(arg.id)
-                    call_node.use_map[arg_scope].add(arg.id)
+                self._track_call_argument(arg, call_node)
 
             elif isinstance(arg, ast.Lambda):
                 # Handle lambda passed as an argument
                 lambda_id = self._handle_lambda_as_argument(arg)
-                call_node.gen.add(lambda_id)
+                call_node.add_gen(lambda_id)
 
         # Track the function being called (if it's an attribute)
         # Track the callable itself
         # Resolve the callable source (e.g., function, method, or dynamic callable)
+        self._track_callable(node, call_node)
+        if isinstance(node.func, ast.Call):
+            # Handle nested calls dynamically
+            self.visit(node.func)
+        elif isinstance(node.func, ast.Lambda):
+            # Handle inline lambda calls
+            self.visit_Lambda(node.func)
+
+        self._link(call_node)
+
+    def _track_call_argument(self, arg, call_node):
+        arg_scope = self.scope_manager.resolve_scope(arg.id)
+        # Check if the argument is defined in another module
+        global_definition = self.global_registry.get_definition(arg_scope, arg.id)
+        if global_definition:
+            call_node.add_gen(arg.id)
+            call_node.add_use(global_definition["type"], arg.id)
+        else:
+            call_node.add_gen(arg.id)
+            call_node.add_use(arg_scope, arg.id)
+
+    def _track_callable(self, node, call_node):
         if isinstance(node.func, ast.Name):
             func_scope = self.scope_manager.resolve_scope(node.func.id)
             global_definition = self.global_registry.get_definition(func_scope, node.func.id)
             if global_definition:
-                call_node.gen.add(node.func.id)
-                call_node.use_map[global_definition["type"]].add(node.func.id)
+                call_node.add_gen(node.func.id)
+                call_node.add_use(global_definition["type"], node.func.id)
             else:
-                call_node.gen.add(node.func.id)
-                call_node.use_map[func_scope].add(node.func.id)
+                call_node.add_gen(node.func.id)
+                call_node.add_use(func_scope, node.func.id)
 
         elif isinstance(node.func, ast.Attribute):
             # Handle attributes (e.g. obj.method)
             self._process_attribute(node.func, call_node)  # Callable via chained attributes
-        elif isinstance(node.func, ast.Call):
-            # Handle nested calls dynamically
-            self.visit(node.func)
-        elif isinstance(node.func, ast.Lambda):
-            # Handle inline lambda calls
-            self.visit_Lambda(node.func)
-
-        self.current_node.add_successor(call_node)
-        self.current_node = call_node
 
     def _handle_lambda_as_argument(self, lambda_node):
         """Handle lambdas passed as arguments."""
@@ -247,16 +1041,41 @@ class CFGBuilder(ast.NodeVisitor):
         return f"lambda_{self.counter - 1}"
 
     def visit_Lambda(self, node):
+        lambda_node = self._begin_lambda(node)
+
+        # Visit the body of the lambda expression
+        if isinstance(node.body, ast.BinOp):
+            # Handle binary operations in the lambda body
+            self.visit_BinOp(node.body)
+        elif isinstance(node.body, ast.Call):
+            # Handle function or method calls in the lambda body
+            self.visit_Call(node.body)
+        elif isinstance(node.body, ast.Attribute):
+            # Handle attributes in the lambda body
+            self.visit_Attribute(node.body)
+        elif isinstance(node.body, ast.Lambda):
+            # Handle nested lambdas
+            self.visit_Lambda(node.body)
+        elif not isinstance(node.body, ast.Name):
+            self.visit(node.body)
+
+        self._end_lambda(node, lambda_node)
+
+    def _begin_lambda(self, node):
         lambda_id = f"lambda_{self.counter}"
+        if self.per_function:
+            self._enter_cfg(self._qualified_scope(lambda_id))
         lambda_node = self._create_node(lambda_id, "Lambda")
         self.counter += 1
+        if self.per_function:
+            self._start_cfg(lambda_node)
 
         # Enter a new scope for the lambda
-        self.scope_manager.enter_scope(f"lambda_{self.counter}")
+        self.scope_manager.enter_scope(f"lambda_{self.counter}", node)
 
         # Add lambda arguments to gen and register as local variables
         for arg in node.args.args:
-            lambda_node.gen.add(arg.arg)
+            self._add_definition(arg.arg, lambda_node)
             self.scope_manager.add_local_var(arg.arg)
 
         # Process the body and propagate free variables
@@ -272,30 +1091,19 @@ class CFGBuilder(ast.NodeVisitor):
             "free_vars": free_vars
         })
 
-        # Visit the body of the lambda expression
         if isinstance(node.body, ast.Name):
             # Handle variable usage in the lambda body
             var_scope = self.scope_manager.resolve_scope(node.body.id)
             self.scope_manager.register_usage(node.body.id, lambda_id)
-            lambda_node.gen.add(node.body.id)
-            lambda_node.use_map[var_scope].add(node.body.id)
-        elif isinstance(node.body, ast.BinOp):
-            # Handle binary operations in the lambda body
-            self.visit_BinOp(node.body)
-        elif isinstance(node.body, ast.Call):
-            # Handle function or method calls in the lambda body
-            self.visit_Call(node.body)
-        elif isinstance(node.body, ast.Attribute):
-            # Handle attributes in the lambda body
-            self.visit_Attribute(node.body)
-        elif isinstance(node.body, ast.Lambda):
-            # Handle nested lambdas
-            self.visit_Lambda(node.body)
-        else:
-            self.visit(node.body)
+            lambda_node.add_gen(node.body.id)
+            lambda_node.add_use(var_scope, node.body.id)
+        return lambda_node
 
+    def _end_lambda(self, node, lambda_node):
+        lambda_id = lambda_node.name
         # Link the lambda node to the current CFG
-        self.current_node.add_successor(lambda_node)
+        if not self.per_function:
+            self.current_node.add_successor(lambda_node)
 
         # Register the lambda definition in the global lambda registry
         '''
@@ -308,14 +1116,17 @@ class CFGBuilder(ast.NodeVisitor):
         }
         '''
         # Register the lambda definition in the global context
-        self.scope_manager.context_registry[lambda_id] = {
+        self.scope_manager.context_registry.set_context(self.scope_manager.current_scope_id(), lambda_id, {
             "scope": self.scope_manager.current_scope(),
             "free_vars": self._extract_free_vars(node)
-        }
+        })
         # Exit the lambda's scope
         self.scope_manager.exit_scope()
-        self.current_node.add_successor(lambda_node)
-        self.current_node = lambda_node
+        if self.per_function:
+            self._exit_cfg()
+        else:
+            self.current_node.add_successor(lambda_node)
+            self.current_node = lambda_node
 
     def _extract_free_vars(self, node):
         """Extract free variables used in the lambda body."""
@@ -344,66 +1155,65 @@ class CFGBuilder(ast.NodeVisitor):
         self.counter += 1
         # Recursively handle deeply nested attributes
         self._process_attribute(node, attr_node)
-        self.current_node.add_successor(attr_node)
-        self.current_node = attr_node
+        self._link(attr_node)
 
     def _process_attribute(self, node, attr_node):
-        # Resolve the base object (value) of the attribute
-        if isinstance(node.value, ast.Name):
-            base_scope = self.scope_manager.resolve_scope(node.value.id)
-            attr_node.gen.add(node.value.id)  # Add base object to gen
-            attr_node.use_map[base_scope].add(node.value.id)
-
-        # Handle chained attributes recursively (e.g., obj.attr.subattr)
-        elif isinstance(node.value, ast.Attribute):
-            self._process_attribute(node.value, attr_node)  # Recurse for ch
-
-        # Add the attribute itself for tracking (as it might be a method or property)
-        if hasattr(node, "attr") and isinstance(node.attr, str):
-            attr_node.gen.add(node.attr)  # Track the attribute being accessed
+        parts = self.qualified_names.parts(node)
+        # Attributes after the last call or subscript of the chain (a().b.c -> b, c)
+        start = len(parts)
+        while start > 1 and parts[start - 1].isidentifier():
+            start -= 1
+        if start == 1 and parts[0].isidentifier():
+            # Resolve the base object (value) of the attribute
+            base_scope = self.scope_manager.resolve_scope(parts[0])
+            attr_node.add_gen(parts[0])  # Add base object to gen
+            attr_node.add_use(base_scope, parts[0])
+
+        # Add the attributes themselves for tracking (as they might be methods or properties)
+        for attr in parts[start:]:
+            attr_node.add_gen(attr)  # Track the attribute being accessed
+
+    def _begin_block(self, prefix, node_type, header=None):
+        """Creates a node for a compound statement or branch and links it in."""
+        block_node = self._create_node(f"{prefix}_{self.counter}", node_type)
+        self.counter += 1
+        if header is not None:
+            self.headers[block_node.node_id] = header
+        self._link(block_node)
+        return block_node
 
     def visit_If(self, node):
-        condition_node = self._create_node(f"if_condition_{self.counter}", "If")
-        self.counter += 1
-        self.current_node.add_successor(condition_node)
-        self.current_node = condition_node
-        # Visit the then branch
-        then_node = self._create_node(f"if_then_{self.counter}", "IfThen")
-        self.counter += 1
-        self.current_node.add_successor(then_node)
-        self.current_node = then_node
+        self._begin_if(node)
         for stmt in node.body:
             self.visit(stmt)
         # Visit the else branch (if exists)
         if node.orelse:
-            else_node = self._create_node(f"if_else_{self.counter}", "IfElse")
-            self.counter += 1
-            self.current_node.add_successor(else_node)
-            self.current_node = else_node
+            self._begin_block("if_else", "IfElse")
             for stmt in node.orelse:
                 self.visit(stmt)
 
+    def _begin_if(self, node=None):
+        if not self.basic_blocks:
+            # Basic blocks evaluate the condition at the end of the current block
+            self._begin_block("if_condition", "If", node)
+            node = None
+        # Visit the then branch
+        self._begin_block("if_then", "IfThen", node)
+
     def visit_For(self, node):
-        for_node = self._create_node(f"for_loop_{self.counter}", "For")
-        self.counter += 1
-        self.current_node.add_successor(for_node)
-        self.current_node = for_node
+        self._begin_block("for_loop", "For", node)
         for stmt in node.body:
             self.visit(stmt)
 
+    visit_AsyncFor = visit_For
+
     def visit_While(self, node):
-        while_node = self._create_node(f"while_loop_{self.counter}", "While")
-        self.counter += 1
-        self.current_node.add_successor(while_node)
-        self.current_node = while_node
+        self._begin_block("while_loop", "While", node)
         for stmt in node.body:
             self.visit(stmt)
 
     def visit_Try(self, node):
-        try_node = self._create_node(f"try_block_{self.counter}", "Try")
-        self.counter += 1
-        self.current_node.add_successor(try_node)
-        self.current_node = try_node
+        self._begin_block("try_block", "Try")
         # Visit the try block
         for stmt in node.body:
             self.visit(stmt)
@@ -412,132 +1222,111 @@ class CFGBuilder(ast.NodeVisitor):
             self.visit(handler)
         # Visit the finally block
         if node.finalbody:
-            finally_node = self._create_node(f"finally_block_{self.counter}", "Finally")
-            self.counter += 1
-            self.current_node.add_successor(finally_node)
+            self._begin_finally()
             for stmt in node.finalbody:
                 self.visit(stmt)
 
+    def _begin_finally(self):
+        finally_node = self._create_node(f"finally_block_{self.counter}", "Finally")
+        self.counter += 1
+        self.current_node.add_successor(finally_node)
+
     def visit_Raise(self, node):
-        raise_node = self._create_node(f"raise_{self.counter}", "Raise")
+        raise_node = self._create_node(f"raise_{self.counter}", "Raise", node)
         self.counter += 1
-        self.current_node.add_successor(raise_node)
+        self._attach(raise_node)
 
     def visit_ExceptHandler(self, node):
+        self._begin_except(node)
+        for stmt in node.body:
+            self.visit(stmt)
+
+    def _begin_except(self, node):
         except_node = self._create_node(f"except_{self.counter}", "ExceptHandler")
         self.counter += 1
         if node.name:  # Variable defined in `except Exception as name:`
-            except_node.gen.add(node.name)
-        self.current_node.add_successor(except_node)
-        self.current_node = except_node
-        for stmt in node.body:
-            self.visit(stmt)
+            self._add_definition(node.name, except_node)
+        self._link(except_node)
 
     def visit_Global(self, node):
-        global_node = self._create_node(f"global_{self.counter}", "Global")
+        global_node = self._create_node(f"global_{self.counter}", "Global", node)
         self.counter += 1
         # Global variables are not new definitions, so they are not added to `gen`.
-        self.current_node.add_successor(global_node)
-        self.current_node = global_node
+        self._link(global_node)
 
     def visit_Nonlocal(self, node):
-        nonlocal_node = self._create_node(f"nonlocal_{self.counter}", "Nonlocal")
+        nonlocal_node = self._create_node(f"nonlocal_{self.counter}", "Nonlocal", node)
         self.counter += 1
         # Nonlocal variables are not new definitions, so they are not added to `gen`.
-        self.current_node.add_successor(nonlocal_node)
-        self.current_node = nonlocal_node
+        self._link(nonlocal_node)
 
     def visit_With(self, node):
-        with_node = self._create_node(f"with_{self.counter}", "With")
-        self.counter += 1
-        self.current_node.add_successor(with_node)
-        self.current_node = with_node
+        self._begin_block("with", "With", node)
         for stmt in node.body:
             self.visit(stmt)
 
+    visit_AsyncWith = visit_With
+
     def visit_Yield(self, node):
         yield_node = self._create_node(f"yield_{self.counter}", "Yield")
         self.counter += 1
-        self.current_node.add_successor(yield_node)
+        self._attach(yield_node)
 
     def visit_ListComp(self, node):
         list_comp_node = self._create_node(f"list_comp_{self.counter}", "ListComp")
         self.counter += 1
-        self.current_node.add_successor(list_comp_node)
+        self._attach(list_comp_node)
 
     def visit_DictComp(self, node):
         dict_comp_node = self._create_node(f"dict_comp_{self.counter}", "DictComp")
         self.counter += 1
-        self.current_node.add_successor(dict_comp_node)
+        self._attach(dict_comp_node)
 
     def visit_GeneratorExp(self, node):
         generator_exp_node = self._create_node(f"generator_exp_{self.counter}", "GeneratorExp")
         self.counter += 1
-        self.current_node.add_successor(generator_exp_node)
+        self._attach(generator_exp_node)
 
     def visit_Assign(self, node):
-        assign_node = self._create_node(f"assign_{self.counter}", "Assign")
+        assign_node = self._create_node(f"assign_{self.counter}", "Assign", node)
         self.counter += 1
         # Add definitions to the Gen set
         for target in node.targets:
             if isinstance(target, ast.Name):
                 self.scope_manager.add_local_var(target.id)
-                assign_node.gen.add(target.id) # Treat as definition
-                # Invalidate previous definitions in Kill set
-                for cfg_node in self.nodes.values():
-                    if target.id in cfg_node.gen:
-                        assign_node.kill.add(target.id)
+                # Treat as definition, invalidating the scope's previous ones
+                self._redefine(target.id, assign_node)
 
-        self.current_node.add_successor(assign_node)
-        self.current_node = assign_node
+        self._link(assign_node)
 
     def visit_AnnAssign(self, node):
-        annassign_node = self._create_node(f"annassign_{self.counter}", "AnnAssign")
+        annassign_node = self._create_node(f"annassign_{self.counter}", "AnnAssign", node)
         self.counter += 1
         if isinstance(node.target, ast.Name):
             self.scope_manager.add_local_var(node.target.id)
-            annassign_node.gen.add(node.target.id)
-            for cfg_node in self.nodes.values():
-                if node.target.id in cfg_node.gen:
-                    annassign_node.kill.add(node.target.id)
-        self.current_node.add_successor(annassign_node)
-        self.current_node = annassign_node
+            self._redefine(node.target.id, annassign_node)
+        self._link(annassign_node)
 
     def visit_AugAssign(self, node):
-        augassign_node = self._create_node(f"augassign_{self.counter}", "AugAssign")
+        augassign_node = self._create_node(f"augassign_{self.counter}", "AugAssign", node)
         self.counter += 1
         if isinstance(node.target, ast.Name):
             self.scope_manager.add_local_var(node.target.id)
-            augassign_node.gen.add(node.target.id)  # Treat as use (read)
-            augassign_node.kill.add(node.target.id)  # Treat as redefinition (write)
-        self.current_node.add_successor(augassign_node)
-        self.current_node = augassign_node
+            self._redefine(node.target.id, augassign_node)  # Treat as redefinition (write)
+        self._link(augassign_node)
 
     def visit_Subscript(self, node):
         subscript_node = self._create_node(f"subscript_{self.counter}", "Subscript")
         self.counter += 1
         if isinstance(node.value, ast.Name):
-            subscript_node.gen.add(node.value.id)  # Treat as a use of the variable
-        self.current_node.add_successor(subscript_node)
+            subscript_node.add_gen(node.value.id)  # Treat as a use of the variable
+        self._attach(subscript_node)
 
     def visit_Expr(self, node):
-        expr_node = self._create_node(f"expr_{self.counter}", "Expr")
-        self.counter += 1
+        expr_node = self._begin_expr(node)
 
         # Analyze the expression's value (e.g., a function call, variable, or attribute)
-        if isinstance(node.value, ast.Name):
-            # Handle variable references
-            var_scope = self.scope_manager.resolve_scope(node.value.id)
-            # Check if the variable is defined in another module
-            global_definition = self.global_registry.get_definition(var_scope, node.value.id)
-            if global_definition:
-                expr_node.gen.add(node.value.id)
-                expr_node.use_map[global_definition["type"]].add(node.value.id)
-            else:
-                expr_node.gen.add(node.value.id)
-                expr_node.use_map[var_scope].add(node.value.id)
-
-        elif isinstance(node.value, ast.Attribute):
+        if isinstance(node.value, ast.Attribute):
             # Handle attributes (e.g., obj.method)
             self.visit_Attribute(node.value)
 
@@ -553,26 +1342,42 @@ class CFGBuilder(ast.NodeVisitor):
             self.visit_UnaryOp(node.value)
 
         # Link the expression node to the current CFG
-        self.current_node.add_successor(expr_node)
-        self.current_node = expr_node
+        self._link(expr_node)
+
+    def _begin_expr(self, node):
+        expr_node = self._create_node(f"expr_{self.counter}", "Expr", node)
+        self.counter += 1
+
+        if isinstance(node.value, ast.Name):
+            # Handle variable references
+            var_scope = self.scope_manager.resolve_scope(node.value.id)
+            # Check if the variable is defined in another module
+            global_definition = self.global_registry.get_definition(var_scope, node.value.id)
+            if global_definition:
+                expr_node.add_gen(node.value.id)
+                expr_node.add_use(global_definition["type"], node.value.id)
+            else:
+                expr_node.add_gen(node.value.id)
+                expr_node.add_use(var_scope, node.value.id)
+        return expr_node
 
     def visit_BinOp(self, node):
         binop_node = self._create_node(f"binop_{self.counter}", "BinOp")
         self.counter += 1
         # Add variables used in the binary operation to the `gen` set.
         if isinstance(node.left, ast.Name):
-            binop_node.gen.add(node.left.id)
+            binop_node.add_gen(node.left.id)
         if isinstance(node.right, ast.Name):
-            binop_node.gen.add(node.right.id)
-        self.current_node.add_successor(binop_node)
+            binop_node.add_gen(node.right.id)
+        self._attach(binop_node)
 
     def visit_UnaryOp(self, node):
         unaryop_node = self._create_node(f"unaryop_{self.counter}", "UnaryOp")
         self.counter += 1
         # Add the variable used in the unary operation to the `gen` set.
         if isinstance(node.operand, ast.Name):
-            unaryop_node.gen.add(node.operand.id)
-        self.current_node.add_successor(unaryop_node)
+            unaryop_node.add_gen(node.operand.id)
+        self._attach(unaryop_node)
 
     def visit_Name(self, node):
         name_node = self._create_node(f"name_{self.counter}", "Name")
@@ -583,47 +1388,317 @@ class CFGBuilder(ast.NodeVisitor):
             # Check if the variable is defined in another module
             global_definition = self.global_registry.get_definition(var_scope, node.id)
             if global_definition:
-                self.current_node.use_map[global_definition["type"]].add(node.id)
+                self.current_node.add_use(global_definition["type"], node.id)
             else:
-                self.current_node.use_map[var_scope].add(node.id)
+                self.current_node.add_use(var_scope, node.id)
             ''''
             self.scope_manager.register_usage(node.id, self.scope_manager.current_scope())
             self.current_node.use_map[var_scope].add(node.id)
             '''
-        self.current_node.add_successor(name_node)
+        self._attach(name_node)
 
     def visit_Return(self, node):
-        return_node = self._create_node(f"return_{self.counter}", "Return")
+        return_node = self._create_node(f"return_{self.counter}", "Return", node)
         self.counter += 1
-        self.current_node.add_successor(return_node)
-
-    def dataflow_analysis(self):
-        """Performs dataflow analysis to compute reaching definitions."""
-        # Initialize In and Out sets
-        for node in self.nodes.values():
-            node.in_set = set()
-            node.out_set = node.gen.copy()
-
-        # Iterate until fixpoint
-        changed = True
-        while changed:
-            changed = False
-            for node in self.nodes.values():
-                # Compute In set as union of Out sets of predecessors
-                in_set_new = set()
-                for pred in self.nodes.values():
-                    if node in pred.successors:
-                        in_set_new |= pred.out_set
-                # Compute Out set: Gen ∪ (In - Kill)
-                out_set_new = node.gen | (in_set_new - node.kill)
-                if node.in_set != in_set_new or node.out_set != out_set_new:
-                    node.in_set = in_set_new
-                    node.out_set = out_set_new
-                    changed = True
+        self._attach(return_node)
+
+    def successor_csr(self):
+        """
+        Exports successor edges in CSR form as (offsets, targets) array('i') pairs.
+
+        The successors of the node with id i are targets[offsets[i]:offsets[i + 1]].
+        Node ids index node_list, so every node is present even if a later node
+        reused its name in self.nodes.
+        """
+        offsets = array("i", [0])
+        targets = array("i")
+        for node in self.node_list:
+            targets.extend(succ.node_id for succ in node.successors)
+            offsets.append(len(targets))
+        return offsets, targets
+
+    def predecessor_csr(self):
+        """Exports predecessor edges in CSR form, laid out like successor_csr()."""
+        counts = [0] * (len(self.node_list) + 1)
+        for node in self.node_list:
+            for succ in node.successors:
+                counts[succ.node_id + 1] += 1
+        offsets = array("i", counts)
+        for i in range(1, len(offsets)):
+            offsets[i] += offsets[i - 1]
+        # Scatter each edge into its target's slot, keeping node_id order
+        fill = array("i", offsets[:-1])
+        sources = array("i", [0]) * offsets[-1]
+        for node in self.node_list:
+            for succ in node.successors:
+                sources[fill[succ.node_id]] = node.node_id
+                fill[succ.node_id] += 1
+        return offsets, sources
+
+    def dataflow_analysis(self, bitvectors=False, workers=1, executor=None):
+        """
+        Performs dataflow analysis to compute reaching definitions.
+
+        With bitvectors=True, definitions are interned per CFG and gen/kill/in/out
+        are solved as int bit-vectors, so union, difference and comparison run
+        word-at-a-time. Nodes then keep in_bits/out_bits, and in_set/out_set
+        decode them on access.
+
+        In per_function mode every FunctionCFG is solved independently. Nodes
+        are taken from node_list and FunctionCFG.nodes, so nodes whose names
+        repeat across (or within) functions are all solved. With workers > 1
+        the FunctionCFGs are solved as bit-vector problems on a process pool;
+        with bitvectors=False the solutions are decoded back into sets, so the
+        results match the serial solver either way. executor is an existing
+        ProcessPoolExecutor to use instead of starting one per call, e.g. one
+        shared by all the files of a scan.
+        """
+        if self.per_function:
+            graphs = [(cfg, cfg.nodes) for cfg in self.cfgs]
+        else:
+            graphs = [(self, self.node_list)]
+
+        if workers > 1 and len(graphs) > 1:
+            problems = []
+            for owner, nodes in graphs:
+                owner.domain = DefinitionDomain()
+                problems.append(_bit_problem(nodes, owner.domain))
+            # Large chunks keep the per-task pickling overhead down for small CFGs
+            chunksize = max(1, len(problems) // (workers * 4))
+            if executor is None:
+                with ProcessPoolExecutor(max_workers=workers) as own_executor:
+                    solutions = list(own_executor.map(_solve_bit_problem, problems, chunksize=chunksize))
+            else:
+                solutions = executor.map(_solve_bit_problem, problems, chunksize=chunksize)
+            for (owner, nodes), (in_bits, out_bits) in zip(graphs, solutions):
+                _apply_bits(nodes, owner.domain, in_bits, out_bits, bitvectors)
+                if not bitvectors:
+                    owner.domain = None
+            return
+
+        for owner, nodes in graphs:
+            if bitvectors:
+                owner.domain = DefinitionDomain()
+                in_bits, out_bits = _solve_bit_problem(_bit_problem(nodes, owner.domain))
+                _apply_bits(nodes, owner.domain, in_bits, out_bits, True)
+            else:
+                owner.domain = None
+                _solve_set_problem(nodes)
+
+
+def _successor_lists(nodes):
+    """Returns successor index lists, ignoring edges that leave the node list."""
+    index = {id(node): i for i, node in enumerate(nodes)}
+    return [[index[id(succ)] for succ in node.successors if id(succ) in index]
+            for node in nodes]
+
+def _bit_problem(nodes, domain):
+    """Encodes a node list as a picklable (successors, gen, keep) bit-vector problem."""
+    gen = [domain.encode(node.gen) for node in nodes]
+    # Complement once so the transfer function is a single AND
+    keep = [~domain.encode(node.kill) for node in nodes]
+    return _successor_lists(nodes), gen, keep
+
+def _solve_bit_problem(problem):
+    successors, gen, keep = problem
+
+    def transfer(i, in_bits):
+        # Compute Out set: Gen ∪ (In - Kill)
+        return gen[i] | (in_bits & keep[i])
+
+    return solve_forward_dataflow(successors, transfer, int)
+
+def _apply_bits(nodes, domain, in_bits, out_bits, bitvectors):
+    for node, node_in, node_out in zip(nodes, in_bits, out_bits):
+        if bitvectors:
+            node.domain = domain
+            node.in_bits = node_in
+            node.out_bits = node_out
+        else:
+            node.domain = None
+            node.in_set = domain.decode(node_in)
+            node.out_set = domain.decode(node_out)
+
+def _solve_set_problem(nodes):
+    def transfer(i, in_set):
+        # Compute Out set: Gen ∪ (In - Kill)
+        node = nodes[i]
+        return (in_set - node.kill) | node.gen
+
+    in_sets, out_sets = solve_forward_dataflow(_successor_lists(nodes), transfer, set)
+    for node, in_set, out_set in zip(nodes, in_sets, out_sets):
+        node.domain = None
+        node.in_set = in_set
+        node.out_set = out_set
 
 
 class MultiModuleCFGBuilder(CFGBuilder):
-    def __init__(self, global_registry):
-        super().__init__()
+    def __init__(self, global_registry, compact_nodes=False, basic_blocks=False, per_function=False,
+                 symbol_tables=False, module_index=None, file_name=None):
+        super().__init__(compact_nodes, basic_blocks, per_function, symbol_tables)
+        # Resolves the targets of this file's imports to archive members
+        self.module_index = module_index
+        self.file_name = file_name
         self.global_registry = global_registry  # Reference to the global registry
 
+
+
+class CFGBuildPass:
+    """
+    Drives a CFGBuilder from FusedTraversal events instead of its own recursion.
+
+    The builder only receives the children its visit_* methods would visit, in
+    the same order, so the graph and registry entries match builder.visit(tree).
+    Visitors that do not recurse are called as-is. A call that passes lambdas as
+    arguments is the one case where the builder's order (arguments before a
+    called Call/Lambda) differs from the AST field order; such a call is built
+    by the builder's own recursion.
+    """
+    _EXPR_VALUES = (ast.Attribute, ast.Call, ast.BinOp, ast.UnaryOp)
+
+    def __init__(self, builder):
+        self.builder = builder
+        self._children = {}  # {id(node): ids of the children the builder visits}
+        self._before = {}  # {id(child): callback run before the child is entered}
+        self._pending = {}  # {id(node): CFG node created on enter and linked on leave}
+
+    def enter(self, node):
+        parent = getattr(node, "parent", None)
+        wanted = self._children.get(id(parent)) if parent is not None else None
+        if wanted is not None and id(node) not in wanted:
+            return SKIP_CHILDREN
+        before = self._before.pop(id(node), None)
+        if before is not None:
+            before()
+
+        node_type = type(node).__name__
+        handler = getattr(self, "_enter_" + node_type, None)
+        if handler is not None:
+            return handler(node)
+        visitor = getattr(self.builder, "visit_" + node_type, None)
+        if visitor is not None:
+            visitor(node)
+            return SKIP_CHILDREN
+        # No visitor: the builder walks straight through the node
+        return None
+
+    def leave(self, node):
+        self._children.pop(id(node), None)
+        handler = getattr(self, "_leave_" + type(node).__name__, None)
+        if handler is not None:
+            handler(node)
+
+    def _descend(self, node, children):
+        if children:
+            self._children[id(node)] = {id(child) for child in children}
+            return None
+        self.leave(node)
+        return SKIP_CHILDREN
+
+    def _exit_scope(self, node):
+        self.builder.scope_manager.exit_scope()
+
+    def _link_pending(self, node):
+        self.builder._link(self._pending.pop(id(node)))
+
+    def _enter_Module(self, node):
+        self.builder._begin_module(node)
+        return self._descend(node, node.body)
+
+    def _leave_Module(self, node):
+        self.builder._end_module()
+
+    def _enter_ClassDef(self, node):
+        self.builder._begin_class(node)
+        return self._descend(node, node.body)
+
+    _leave_ClassDef = _exit_scope
+
+    def _enter_FunctionDef(self, node):
+        builder = self.builder
+        if builder.per_function:
+            # Decorators belong to the enclosing CFG; they come after the body in
+            # the AST field order, so they are built by the builder's own recursion
+            for decorator in node.decorator_list:
+                builder.visit(decorator)
+            builder._begin_function(node)
+            return self._descend(node, node.body)
+        builder._begin_function(node)
+        return self._descend(node, node.body + node.decorator_list)
+
+    def _leave_FunctionDef(self, node):
+        self.builder._end_function()
+
+    def _enter_AsyncFunctionDef(self, node):
+        self.builder._begin_function(node)
+        return self._descend(node, node.body)
+
+    _leave_AsyncFunctionDef = _leave_FunctionDef
+
+    def _enter_Call(self, node):
+        builder = self.builder
+        if any(isinstance(arg, ast.Lambda) for arg in node.args):
+            builder.visit_Call(node)
+            return SKIP_CHILDREN
+        call_node = builder._create_node(f"call_{builder.counter}", "Call")
+        builder.counter += 1
+        for arg in node.args:
+            if isinstance(arg, ast.Name):
+                builder._track_call_argument(arg, call_node)
+        builder._track_callable(node, call_node)
+        self._pending[id(node)] = call_node
+        if isinstance(node.func, (ast.Call, ast.Lambda)):
+            return self._descend(node, [node.func])
+        return self._descend(node, [])
+
+    _leave_Call = _link_pending
+
+    def _enter_Lambda(self, node):
+        self._pending[id(node)] = self.builder._begin_lambda(node)
+        if isinstance(node.body, ast.Name):
+            return self._descend(node, [])
+        return self._descend(node, [node.body])
+
+    def _leave_Lambda(self, node):
+        self.builder._end_lambda(node, self._pending.pop(id(node)))
+
+    def _enter_Expr(self, node):
+        self._pending[id(node)] = self.builder._begin_expr(node)
+        if isinstance(node.value, self._EXPR_VALUES):
+            return self._descend(node, [node.value])
+        return self._descend(node, [])
+
+    _leave_Expr = _link_pending
+
+    def _enter_If(self, node):
+        builder = self.builder
+        builder._begin_if(node)
+        if node.orelse:
+            self._before[id(node.orelse[0])] = lambda: builder._begin_block("if_else", "IfElse")
+        return self._descend(node, node.body + node.orelse)
+
+    def _enter_For(self, node):
+        self.builder._begin_block("for_loop", "For", node)
+        return self._descend(node, node.body)
+
+    _enter_AsyncFor = _enter_For
+
+    def _enter_While(self, node):
+        self.builder._begin_block("while_loop", "While", node)
+        return self._descend(node, node.body)
+
+    def _enter_With(self, node):
+        self.builder._begin_block("with", "With", node)
+        return self._descend(node, node.body)
+
+    _enter_AsyncWith = _enter_With
+
+    def _enter_Try(self, node):
+        self.builder._begin_block("try_block", "Try")
+        if node.finalbody:
+            self._before[id(node.finalbody[0])] = self.builder._begin_finally
+        return self._descend(node, node.body + node.handlers + node.finalbody)
+
+    def _enter_ExceptHandler(self, node):
+        self.builder._begin_except(node)
+        return self._descend(node, node.body)
@@ -0,0 +1,103 @@
+import shutil
+import subprocess
+
+
+def _quote(value):
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+def _attributes(attrs):
+    if not attrs:
+        return ""
+    return " [" + ", ".join(f"{key}={_quote(value)}" for key, value in attrs.items()) + "]"
+
+
+class DotWriter:
+    """
+    Streams a Graphviz DOT digraph straight to a file.
+
+    Each node is declared once; later declarations of the same id are ignored,
+    so callers should declare a node with its preferred attributes first.
+    Duplicate edges (same endpoints and attributes) are written once. Nodes
+    declared between begin_cluster() and end_cluster() are drawn in that
+    cluster; callers skip clusters they would leave empty. Nothing but
+    the sets of seen ids is kept in memory, and the graphviz Python package is
+    not needed.
+    """
+    def __init__(self, path, name="G", **graph_attrs):
+        self.path = path
+        self.file = open(path, "w", encoding="utf-8")
+        self.nodes = set()
+        self.edges = set()
+        self.clusters = 0
+        self.file.write(f"digraph {_quote(name)} {{\n")
+        for key, value in graph_attrs.items():
+            self.file.write(f"  {key}={_quote(value)};\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def node(self, node_id, label=None, **attrs):
+        if node_id in self.nodes:
+            return
+        self.nodes.add(node_id)
+        if label is not None and label != node_id:
+            attrs = dict(attrs, label=label)
+        self.file.write(f"  {_quote(node_id)}{_attributes(attrs)};\n")
+
+    def edge(self, source, target, **attrs):
+        key = (source, target, tuple(sorted(attrs.items())))
+        if key in self.edges:
+            return
+        self.edges.add(key)
+        self.file.write(f"  {_quote(source)} -> {_quote(target)}{_attributes(attrs)};\n")
+
+    def begin_cluster(self, label):
+        self.file.write(f"  subgraph cluster_{self.clusters} {{\n  label={_quote(label)};\n")
+        self.clusters += 1
+
+    def end_cluster(self):
+        self.file.write("  }\n")
+
+    def close(self):
+        if not self.file.closed:
+            self.file.write("}\n")
+            self.file.close()
+
+
+def select_nodes(edges, top_n=None, min_degree=0, nodes=()):
+    """
+    Picks the nodes worth drawing from an iterable of (source, target) edges.
+
+    nodes lists further nodes to consider even if they have no edges, such as
+    functions that neither call nor are called. Nodes with fewer than
+    min_degree edges are dropped, and of the rest only the top_n with the
+    highest degree are kept (all if top_n is None). Ties keep the order in
+    which the nodes first appeared. Returns a set of nodes.
+    """
+    degree = {}
+    for source, target in edges:
+        degree[source] = degree.get(source, 0) + 1
+        degree[target] = degree.get(target, 0) + 1
+    for node in nodes:
+        degree.setdefault(node, 0)
+    kept = [node for node, count in degree.items() if count >= min_degree]
+    if top_n is not None and len(kept) > top_n:
+        kept = sorted(kept, key=lambda node: -degree[node])[:top_n]
+    return set(kept)
+
+
+def render(dot_path, output_format="png"):
+    """
+    Renders a DOT file with Graphviz's dot program, if it is installed.
+
+    Returns the rendered file's path, or None if dot is not available.
+    """
+    dot = shutil.which("dot")
+    if dot is None:
+        return None
+    output_path = f"{dot_path.rsplit('.', 1)[0]}.{output_format}"
+    subprocess.run([dot, f"-T{output_format}", dot_path, "-o", output_path], check=True)
+    return output_path
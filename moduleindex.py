@@ -0,0 +1,106 @@
+import hashlib
+import posixpath
+import zipfile
+
+
+class ModuleIndex:
+    """
+    Maps dotted module names to the archive members that define them.
+
+    Built once per archive from namelist(). A member's module name is its path
+    below the nearest directory that is not a package (has no __init__.py),
+    so top-level project folders and src/ layouts need no configuration;
+    pkg/__init__.py names the package itself. Every module is also reachable
+    by its full path from the archive root and from below a src/ directory,
+    for namespace packages without __init__.py. fingerprint changes whenever
+    a Python member is added, removed or renamed.
+    """
+    def __init__(self, file_names):
+        self.modules = {}  # {module name: member}
+        self.files = {}  # {member: module name}
+        file_names = [name for name in file_names if name.endswith(".py")]
+        # Identifies the set of modules, for caches of results that depend on it
+        self.fingerprint = hashlib.sha256("\0".join(sorted(file_names)).encode("utf-8")).hexdigest()
+        package_dirs = {posixpath.dirname(name) for name in file_names
+                        if posixpath.basename(name) == "__init__.py"}
+        for file_name in file_names:
+            module_name = self._crawl(file_name, package_dirs)
+            self.files[file_name] = module_name
+            self.modules.setdefault(module_name, file_name)
+        # Fallback spellings never shadow a name found by the package crawl
+        for file_name in file_names:
+            parts = self._parts(file_name)
+            self.modules.setdefault(".".join(parts), file_name)
+            if "src" in parts[:-1]:
+                below_src = parts[len(parts) - parts[::-1].index("src"):]
+                if below_src:
+                    self.modules.setdefault(".".join(below_src), file_name)
+
+    @classmethod
+    def from_archive(cls, zip_file_path):
+        with zipfile.ZipFile(zip_file_path, "r") as zip_file:
+            return cls(zip_file.namelist())
+
+    @staticmethod
+    def _parts(file_name):
+        parts = file_name[:-len(".py")].split("/")
+        if parts[-1] == "__init__":
+            parts.pop()
+        return parts
+
+    @staticmethod
+    def _crawl(file_name, package_dirs):
+        directory = posixpath.dirname(file_name)
+        parts = [] if posixpath.basename(file_name) == "__init__.py" else [posixpath.basename(file_name)[:-3]]
+        # Climb while the directory is a package; the archive root (a root-level
+        # __init__.py) adds no name, and dirname("") is "" again
+        while directory in package_dirs:
+            parent = posixpath.dirname(directory)
+            if not directory or parent == directory:
+                break
+            parts.append(posixpath.basename(directory))
+            directory = parent
+        return ".".join(reversed(parts))
+
+    def resolve(self, module_name):
+        """Returns the member defining module_name, or None for modules outside the archive."""
+        return self.modules.get(module_name)
+
+    def module_of(self, file_name):
+        return self.files.get(file_name)
+
+    def canonical(self, module_name):
+        """Returns the crawled name of an archive module (whatever spelling was used), else module_name."""
+        member = self.modules.get(module_name)
+        return self.files[member] if member is not None else module_name
+
+    def absolute_module(self, file_name, module, level=0):
+        """
+        Returns the absolute name of the module in "from <module> import ..."
+        written in file_name; level is ImportFrom.level (number of leading dots).
+        """
+        if not level:
+            return module
+        package = self.files.get(file_name, "").split(".")
+        if not file_name.endswith("__init__.py"):
+            package = package[:-1]  # A plain module's package is its parent
+        # Each extra dot climbs one package up
+        package = package[:max(0, len(package) - (level - 1))]
+        if module:
+            package.append(module)
+        return ".".join(part for part in package if part)
+
+    def resolve_import(self, file_name, module, name, level=0):
+        """
+        Resolves "from <module> import <name>" in file_name.
+
+        Returns (absolute module, member): the member of the submodule if
+        <name> is one, otherwise of the module defining <name>, or None if the
+        target is outside the archive.
+        """
+        absolute = self.absolute_module(file_name, module, level)
+        submodule = f"{absolute}.{name}" if absolute else name
+        member = self.modules.get(submodule)
+        if member is not None:
+            return absolute, member
+        return absolute, self.modules.get(absolute)
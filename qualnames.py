@@ -0,0 +1,64 @@
+import ast
+
+UNKNOWN = "?"  # Segment standing for a base expression that has no name (literals, lambdas, ...)
+
+
+class QualifiedNames:
+    """
+    Dotted spellings of the expressions of one AST, memoized by node identity.
+
+    a.b.c is spelled ("a", "b", "c"); a call or subscript in the chain keeps
+    its place as a segment ending in "()" or "[]", so a.b().c is
+    ("a", "b()", "c") and x[0].f is ("x[]", "f"). A chain starting at an
+    expression without a name starts with UNKNOWN ("".join is ("?", "join")).
+    Every node is spelled once, reusing the spelling of the expression it
+    extends, and all analyzers of a tree share one instance through
+    qualified_names(tree).
+    """
+    def __init__(self):
+        self._parts = {}  # {id(node): (node, parts)}; the node is kept so its id stays unique
+        self._names = {}  # {id(node): dotted name}
+
+    def __getstate__(self):
+        # Node ids mean nothing in another process; start over there
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def parts(self, node):
+        """Returns the segments of the expression's dotted spelling as a tuple."""
+        entry = self._parts.get(id(node))
+        if entry is not None:
+            return entry[1]
+        if isinstance(node, ast.Name):
+            parts = (node.id,)
+        elif isinstance(node, ast.Attribute):
+            parts = self.parts(node.value) + (node.attr,)
+        elif isinstance(node, (ast.Call, ast.Subscript)):
+            inner = self.parts(node.func if isinstance(node, ast.Call) else node.value)
+            parts = inner[:-1] + (inner[-1] + ("()" if isinstance(node, ast.Call) else "[]"),)
+        else:
+            parts = (UNKNOWN,)
+        self._parts[id(node)] = (node, parts)
+        return parts
+
+    def name(self, node):
+        """Returns the dotted spelling of the expression, e.g. "a.b().c"."""
+        name = self._names.get(id(node))
+        if name is None:
+            name = self._names[id(node)] = ".".join(self.parts(node))
+        return name
+
+    def dotted(self, node):
+        """Returns the parts of a plain name or attribute chain (a.b.c), or None for anything else."""
+        parts = self.parts(node)
+        return parts if all(part.isidentifier() for part in parts) else None
+
+
+def qualified_names(tree):
+    """Returns the QualifiedNames shared by every analysis of the tree, creating it on first use."""
+    names = getattr(tree, "qualified_names", None)
+    if names is None:
+        names = tree.qualified_names = QualifiedNames()
+    return names
@@ -0,0 +1,190 @@
+import pickle
+import sqlite3
+from collections import OrderedDict
+from cfgbuilder import GlobalRegistry
+
+# Marks a definition known to be absent, so repeated misses skip the database
+_MISSING = object()
+
+# Bump whenever the table layout changes; older databases are rebuilt
+SCHEMA_VERSION = 2
+
+
+class SQLiteGlobalRegistry(GlobalRegistry):
+    """
+    GlobalRegistry stored in a local SQLite file, so definitions survive across
+    scans and can be shared by several processes.
+
+    Definitions live in one table keyed by (member, module, symbol), where
+    member is the archive member that registered them, with further indexes
+    on (module, symbol) and imported_from. Each scan only sees the members it
+    analyzes (begin_member, which first drops the member's old rows) or
+    reuses unchanged (reuse_member), in that order, so definitions of other
+    archives and of earlier versions of a member never leak into the results.
+    register_definition queues writes and commits them in batches of
+    batch_size per transaction; get_definition reads through an in-process
+    LRU of lru_size entries (misses included). Archive members that were
+    analyzed are recorded by name, CRC32 and size, so a later scan can skip
+    building the CFGs of vendored code whose definitions are already stored.
+    """
+    def __init__(self, path, batch_size=1000, lru_size=65536):
+        self.path = path
+        self.batch_size = batch_size
+        self.lru_size = lru_size
+        self.member = None  # Member whose definitions are being registered
+        self.positions = {}  # {member: position in this scan}
+        self.analyzed = set()  # Members analyzed (not reused) in this scan
+        self.pending = {}  # {(member, module_name, symbol_name): context} not yet committed
+        self.pending_latest = {}  # {(module_name, symbol_name): context} of the pending rows
+        self.lru = OrderedDict()  # {(module_name, symbol_name): context or _MISSING}
+        self.connection = sqlite3.connect(path)
+        # WAL lets readers in other processes proceed while a batch is written
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                # Rows of the old layout cannot be attributed to members
+                self.connection.execute("DROP TABLE IF EXISTS definitions")
+                self.connection.execute("DROP TABLE IF EXISTS analyzed_files")
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS definitions ("
+                " member TEXT NOT NULL, module TEXT NOT NULL, symbol TEXT NOT NULL, imported_from TEXT,"
+                " context BLOB NOT NULL, PRIMARY KEY (member, module, symbol))")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS definitions_symbol ON definitions (module, symbol)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS definitions_imported_from ON definitions (imported_from)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS analyzed_files ("
+                " file_name TEXT PRIMARY KEY, crc INTEGER NOT NULL, size INTEGER NOT NULL)")
+        # Members of this scan in order; joined against so queries never see other scans' rows
+        self.connection.execute(
+            "CREATE TEMP TABLE scan_members (member TEXT PRIMARY KEY, position INTEGER NOT NULL)")
+
+    def _add_to_scan(self, member):
+        if member not in self.positions:
+            self.positions[member] = len(self.positions)
+            with self.connection:
+                self.connection.execute("INSERT INTO scan_members (member, position) VALUES (?, ?)",
+                                        (member, self.positions[member]))
+
+    def begin_member(self, file_name):
+        """
+        Starts registering the definitions of an archive member, replacing the
+        ones stored by an earlier scan.
+        """
+        if file_name in self.positions:
+            self.flush()  # Begun before in this scan; its queued rows are replaced too
+        self.member = file_name
+        self.analyzed.add(file_name)
+        with self.connection:
+            self.connection.execute("DELETE FROM definitions WHERE member = ?", (file_name,))
+            # Not reusable until mark_analyzed records the new definitions as complete
+            self.connection.execute("DELETE FROM analyzed_files WHERE file_name = ?", (file_name,))
+        self._add_to_scan(file_name)
+
+    def reuse_member(self, file_name):
+        """Adds the stored definitions of an unchanged archive member to this scan."""
+        self.flush()  # Queued rows of earlier members must not shadow its rows
+        self._add_to_scan(file_name)
+        # Its rows may now shadow (or fill) remembered lookups
+        self.lru.clear()
+
+    def register_definition(self, module_name, symbol_name, context):
+        if self.member is None:
+            # Used without members: behaves like a registry of a single anonymous member
+            self.begin_member("")
+        key = (module_name, symbol_name)
+        self.pending[(self.member, module_name, symbol_name)] = context
+        self.pending_latest[key] = context
+        self._remember(key, context)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def get_definition(self, module_name, symbol_name):
+        key = (module_name, symbol_name)
+        context = self.lru.get(key)
+        if context is not None:
+            self.lru.move_to_end(key)
+            return None if context is _MISSING else context
+        if key in self.pending_latest:
+            return self.pending_latest[key]
+        # The member registered last in this scan wins, as in the in-memory registry
+        row = self.connection.execute(
+            "SELECT context FROM definitions JOIN scan_members USING (member)"
+            " WHERE module = ? AND symbol = ? ORDER BY position DESC, definitions.rowid DESC LIMIT 1",
+            key).fetchone()
+        context = pickle.loads(row[0]) if row else None
+        self._remember(key, _MISSING if context is None else context)
+        return context
+
+    def _remember(self, key, context):
+        self.lru[key] = context
+        self.lru.move_to_end(key)
+        if len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    def merge(self, registry):
+        """Merges another {module_name: {symbol_name: {context}}} mapping into this one."""
+        for module_name, symbols in registry.items():
+            for symbol_name, context in symbols.items():
+                self.register_definition(module_name, symbol_name, context)
+
+    def flush(self):
+        """Writes all queued definitions in a single transaction."""
+        if not self.pending:
+            return
+        rows = [(member, module_name, symbol_name, context.get("imported_from"),
+                 pickle.dumps(context, protocol=pickle.HIGHEST_PROTOCOL))
+                for (member, module_name, symbol_name), context in self.pending.items()]
+        with self.connection:
+            # Upsert keeps the original rowid, so first-registration order is preserved
+            self.connection.executemany(
+                "INSERT INTO definitions (member, module, symbol, imported_from, context) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (member, module, symbol) DO UPDATE SET"
+                " imported_from = excluded.imported_from, context = excluded.context", rows)
+        self.pending.clear()
+        self.pending_latest.clear()
+
+    @property
+    def registry(self):
+        """The definitions of this scan's members as a {module_name: {symbol_name: {context}}} mapping."""
+        self.flush()
+        registry = {}
+        # Members in scan order: later members win, symbols keep their first position
+        for module_name, symbol_name, context in self.connection.execute(
+                "SELECT module, symbol, context FROM definitions JOIN scan_members USING (member)"
+                " ORDER BY position, definitions.rowid"):
+            registry.setdefault(module_name, {})[symbol_name] = pickle.loads(context)
+        return registry
+
+    def importers_of(self, module_name):
+        """Returns (module, symbol) pairs for every symbol of this scan imported from module_name."""
+        self.flush()
+        return self.connection.execute(
+            "SELECT DISTINCT module, symbol FROM definitions JOIN scan_members USING (member)"
+            " WHERE imported_from = ?", (module_name,)).fetchall()
+
+    def is_analyzed(self, zip_info):
+        """True if this exact archive member (same name, CRC32 and size) was already analyzed."""
+        row = self.connection.execute(
+            "SELECT crc, size FROM analyzed_files WHERE file_name = ?", (zip_info.filename,)).fetchone()
+        return row == (zip_info.CRC, zip_info.file_size)
+
+    def mark_analyzed(self, zip_infos):
+        """
+        Records the members as analyzed. Only members whose definitions were
+        registered in this scan are recorded, so one that failed to parse is
+        analyzed again next time.
+        """
+        self.flush()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO analyzed_files (file_name, crc, size) VALUES (?, ?, ?)",
+                [(zip_info.filename, zip_info.CRC, zip_info.file_size) for zip_info in zip_infos
+                 if zip_info.filename in self.analyzed])
+
+    def close(self):
+        self.flush()
+        self.connection.close()
@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+try:
+    import tomllib
+except ImportError:  # Python < 3.11 reads JSON packs only
+    tomllib = None
+
+# Bump whenever the compiled form changes, so cached compilations are rebuilt
+RULES_VERSION = "1"
+
+DEFAULT_PACK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules", "default.json")
+
+WILDCARD = "*"  # Matches any single segment of a dotted name
+_RULE = ""  # Trie key of the rule ending at a node; never a name segment
+
+
+class Rule:
+    """
+    One source, sink or sanitizer of a rule pack.
+
+    args and keywords restrict a sink to the given argument positions and
+    keyword names (e.g. only the query of cursor.execute(query, params));
+    if both are None every argument is checked.
+    """
+    __slots__ = ("kind", "pattern", "args", "keywords", "pack")
+
+    def __init__(self, kind, pattern, args=None, keywords=None, pack=None):
+        self.kind = kind
+        self.pattern = pattern
+        self.args = frozenset(args) if args is not None else None
+        self.keywords = frozenset(keywords) if keywords is not None else None
+        self.pack = pack
+
+    def accepts(self, position=None, keyword=None):
+        """Returns True if the argument at position (or passed as keyword) is checked."""
+        if self.args is None and self.keywords is None:
+            return True
+        if keyword is not None:
+            return self.keywords is not None and keyword in self.keywords
+        return self.args is not None and position in self.args
+
+    def arguments(self, call):
+        """Returns the argument expressions of an ast.Call checked by this rule."""
+        arguments = [arg for position, arg in enumerate(call.args) if self.accepts(position)]
+        arguments.extend(keyword.value for keyword in call.keywords
+                         if keyword.arg is not None and self.accepts(keyword=keyword.arg))
+        return arguments
+
+    def __repr__(self):
+        return f"Rule({self.kind}, {self.pattern}, pack={self.pack})"
+
+
+class _TrieState:
+    """
+    A set of trie nodes reached by a name prefix, in the order a depth-first
+    search trying exact segments before the wildcard would visit them.
+    found is the rule of a prefix match that ranks after all of those nodes.
+    """
+    __slots__ = ("nodes", "found", "keys", "transitions")
+
+    def __init__(self, nodes, found):
+        self.nodes = nodes
+        self.found = found
+        self.keys = frozenset(key for node in nodes for key in node if key not in (_RULE, WILDCARD))
+        self.transitions = {}  # {segment, or None for any segment no node has: next state}
+
+
+class RuleTrie:
+    """
+    Dotted-name rules compiled into a trie of name segments.
+
+    Wildcards let several trie paths match one name, so a lookup runs the
+    trie as an automaton over the set of nodes reached so far instead of
+    backtracking. The sets are built lazily and each transition is memoized
+    (segments no rule spells share one transition), so a lookup costs
+    O(name length) however many rules and wildcards are loaded. Exact
+    segments rank before the wildcard, so the most specific rule wins.
+    """
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+        self._states = {}  # {(prefix, node ids, found rule id): _TrieState}
+
+    def __getstate__(self):
+        # The automaton is rebuilt on demand
+        return {"root": self.root, "size": self.size}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._states = {}
+
+    def add(self, rule):
+        node = self.root
+        for segment in rule.pattern.split("."):
+            node = node.setdefault(segment, {})
+        if _RULE not in node:
+            self.size += 1
+        node[_RULE] = rule
+        self._states = {}
+
+    def match(self, name, prefix=False):
+        """
+        Returns the rule matching a dotted name (str or list of segments), or None.
+
+        With prefix=True a rule also matches every name it is a prefix of, so a
+        source "flask.request.args" covers "flask.request.args.get".
+        """
+        if not name:
+            return None
+        parts = name.split(".") if isinstance(name, str) else name
+        state = self._state((self.root,), None, prefix)
+        for segment in parts:
+            if not state.nodes:
+                break
+            state = self._step(state, segment, prefix)
+        if prefix:
+            return state.found
+        for node in state.nodes:
+            if _RULE in node:
+                return node[_RULE]
+        return None
+
+    def _state(self, nodes, found, prefix):
+        key = (prefix, tuple(id(node) for node in nodes), id(found))
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _TrieState(nodes, found)
+        return state
+
+    def _step(self, state, segment, prefix):
+        key = segment if segment in state.keys else None
+        following = state.transitions.get(key)
+        if following is not None:
+            return following
+        nodes = []
+        found = None
+        for node in state.nodes:
+            for child in (node.get(segment) if key is not None else None, node.get(WILDCARD)):
+                if child is None:
+                    continue
+                if prefix and _RULE in child:
+                    # A prefix match outranks everything the search would visit after it
+                    found = child[_RULE]
+                    break
+                nodes.append(child)
+            if found is not None:
+                break
+        following = state.transitions[key] = self._state(tuple(nodes), found or state.found, prefix)
+        return following
+
+    def __len__(self):
+        return self.size
+
+
+class RuleSet:
+    """
+    Sources, sinks and sanitizers of one or more rule packs.
+
+    A pack is a JSON or TOML document with "sources", "sinks" and
+    "sanitizers" lists. Each entry is a dotted name, where "*" stands for any
+    single segment, or a table with "name" and optionally "args" (argument
+    positions) and "keywords" (keyword argument names), e.g.
+
+        {"name": "myapp", "sources": ["flask.request.args"],
+         "sinks": [{"name": "*.execute", "args": [0], "keywords": ["sql"]}],
+         "sanitizers": ["shlex.quote"]}
+    """
+    KINDS = ("sources", "sinks", "sanitizers")
+
+    def __init__(self):
+        self.tries = {kind: RuleTrie() for kind in self.KINDS}
+        self.packs = []
+        self.fingerprint = ""  # Hash of the compiled packs' contents
+
+    def add_pack(self, pack, pack_name=None):
+        pack_name = pack.get("name", pack_name)
+        self.packs.append(pack_name)
+        for kind in self.KINDS:
+            for entry in pack.get(kind, []):
+                if isinstance(entry, str):
+                    entry = {"name": entry}
+                self.tries[kind].add(Rule(kind, entry["name"], entry.get("args"), entry.get("keywords"),
+                                          pack_name))
+
+    def source(self, name):
+        # Anything read through a source (request.args.get, os.environ[...]) is tainted
+        return self.tries["sources"].match(name, prefix=True)
+
+    def sink(self, name):
+        return self.tries["sinks"].match(name)
+
+    def sanitizer(self, name):
+        return self.tries["sanitizers"].match(name)
+
+    def __repr__(self):
+        sizes = ", ".join(f"{kind}={len(trie)}" for kind, trie in self.tries.items())
+        return f"RuleSet(packs={self.packs}, {sizes})"
+
+
+def load_pack(path):
+    """Reads a rule pack from a .json or .toml file."""
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise ValueError(f"Reading {path} needs tomllib (Python 3.11+)")
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def compile_rules(paths=None, cache_dir=None):
+    """
+    Compiles rule packs (the default pack if paths is None) into a RuleSet.
+
+    With cache_dir the compiled RuleSet is pickled there under a hash of the
+    packs' contents, and later calls with unchanged packs load it instead of
+    compiling again.
+    """
+    paths = list(paths) if paths else [DEFAULT_PACK]
+    digest = hashlib.sha256(RULES_VERSION.encode("utf-8"))
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(os.path.basename(path).encode("utf-8") + b"\0" + f.read() + b"\0")
+    fingerprint = digest.hexdigest()
+
+    cache_path = os.path.join(cache_dir, f"rules-{fingerprint}.rules") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+    rules = RuleSet()
+    for path in paths:
+        rules.add_pack(load_pack(path), os.path.splitext(os.path.basename(path))[0])
+    rules.fingerprint = fingerprint
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(rules, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    return rules
+
+_default_rules = None
+
+def default_rules():
+    """Returns the RuleSet of the default pack, compiled once per process."""
+    global _default_rules
+    if _default_rules is None:
+        _default_rules = compile_rules()
+    return _default_rules
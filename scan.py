@@ -1,32 +1,38 @@
 import ast
 import argparse
-import graphviz
 #import networkx
-from graphviz import Digraph
 import zipfile
 import os
 from io import TextIOWrapper
-from cfgbuilder import CFGBuilder, MultiModuleCFGBuilder, GlobalRegistry
-from callgraph import MultiFileCallGraphBuilder
-from taintanalysis import (MultiFileTaintAnalyzer)
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from cfgbuilder import CFGBuilder, MultiModuleCFGBuilder, GlobalRegistry, CFGBuildPass
+from callgraph import CallGraphBuilder, MultiFileCallGraphBuilder, module_name_for
+from taintanalysis import (TaintAnalyzer, MultiFileTaintAnalyzer)
+from taintsummary import SummaryCache
+from rulepack import compile_rules
+from traversal import FusedTraversal
+from cache import AnalysisCache
+from registry_store import SQLiteGlobalRegistry
+from moduleindex import ModuleIndex
+from dotwriter import DotWriter, select_nodes, render
 
-def parse_all_python_files(zip_file_path):
+def iter_python_files(zip_file_path):
     """
-    Reads a zip file and parses all Python files (*.py) within it, including directories.
+    Reads a zip file and yields the parsed AST of each Python file (*.py) in it,
+    one at a time, so callers can drop each tree before the next is parsed.
 
     Args:
         zip_file_path (str): The path to the zip file.
 
-    Returns:
-        dict: A dictionary where keys are file paths in the zip, and values are their ASTs.
+    Yields:
+        tuple: (file_name, ast) for each member that parses.
     """
-    # Dictionary to store the parsed AST for each Python file
-    python_files_ast = {}
-
     # Open the zip file
     with zipfile.ZipFile(zip_file_path, 'r') as zip_file:
         # List all files in the archive
-        for file_name in zip_file.namelist():
+        for zip_info in zip_file.infolist():
+            file_name = zip_info.filename
             # Check if the file is a Python file
             if file_name.endswith('.py'):
                 # Read the content of the Python file
@@ -35,63 +41,216 @@ def parse_all_python_files(zip_file_path):
                         # Parse the Python file content into an AST
                         file_content = TextIOWrapper(file, encoding='utf-8').read()
                         python_ast = ast.parse(file_content, filename=file_name)
-                        # Store the parsed AST in the dictionary
-                        python_files_ast[file_name] = python_ast
                     except Exception as e:
                         print(f"Error parsing {file_name}: {e}")
+                        continue
+                yield file_name, python_ast
+                # Drop this generator's references before the next member is
+                # parsed, so a caller that released the tree holds only one at a time
+                del python_ast, file_content
 
-    return python_files_ast
+def parse_all_python_files(zip_file_path):
+    """
+    Reads a zip file and parses all Python files (*.py) within it, including directories.
+
+    Args:
+        zip_file_path (str): The path to the zip file.
 
-def visualize_call_graph(call_graph, output_filename="call_graph"):
+    Returns:
+        dict: A dictionary where keys are file paths in the zip, and values are their ASTs.
     """
-    Visualizes a call graph using graphviz.
+    # Dictionary to store the parsed AST for each Python file
+    return dict(iter_python_files(zip_file_path))
+
+def _parse_archive_slice(zip_file_path, file_names):
     """
-    dot = Digraph(comment="Call Graph")
-    for function, calls in call_graph.items():
-        dot.node(function, function)
-        for call in calls:
-            dot.node(call, call)
-            dot.edge(function, call)
-    dot.render(output_filename, format="png", cleanup=True)
-    print(f"Call graph saved to {output_filename}.png")
+    Worker for the parallel parse mode: opens the archive itself and parses
+    its own slice of members.
 
-def visualize_global_registry(global_registry):
-    # Create a directed graph
-    dot = Digraph(comment="Inter-Module Visualization")
+    Returns:
+        list: (file_name, ast) pairs, in the order of file_names.
+    """
+    parsed = []
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_file:
+        for file_name in file_names:
+            with zip_file.open(file_name) as file:
+                try:
+                    file_content = TextIOWrapper(file, encoding='utf-8').read()
+                    parsed.append((file_name, ast.parse(file_content, filename=file_name)))
+                except Exception as e:
+                    print(f"Error parsing {file_name}: {e}")
+    return parsed
 
-    # Add module nodes and their symbols
-    for module_name, symbols in global_registry.registry.items():
-        dot.node(module_name, module_name, shape="box", style="filled", color="lightblue")
+def parse_all_python_files_parallel(zip_file_path, workers):
+    """
+    Parses all Python files in the zip archive using a pool of worker processes.
 
-        for symbol, details in symbols.items():
-            symbol_label = f"{symbol} ({details['type']})"
-            dot.node(symbol, symbol_label, shape="ellipse", style="filled", color="yellow")
-            dot.edge(module_name, symbol)
+    Each worker opens the archive and parses an interleaved slice of the
+    members, so large and small files are spread evenly across the pool.
 
-            # Handle connections for imported symbols
-            if "imported_from" in details:
-                imported_module = details["imported_from"]
-                dot.edge(imported_module, symbol, label="imported")
+    Args:
+        zip_file_path (str): The path to the zip file.
+        workers (int): Number of worker processes.
+
+    Returns:
+        dict: The same {file_name: ast} mapping as parse_all_python_files.
+    """
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_file:
+        file_names = [name for name in zip_file.namelist() if name.endswith('.py')]
+    if workers <= 1 or len(file_names) <= 1:
+        return dict(_parse_archive_slice(zip_file_path, file_names))
 
-            # Handle lambda free variables
+    slices = [file_names[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_parse_archive_slice, [zip_file_path] * workers, slices))
+
+    # Rebuild the mapping in archive order
+    parsed = {}
+    for pairs in results:
+        parsed.update(pairs)
+    return {name: parsed[name] for name in file_names if name in parsed}
+
+def visualize_call_graph(call_graph, output_filename="call_graph", top_n=None, min_degree=0):
+    """
+    Writes a call graph to <output_filename>.dot and renders it if dot is installed.
+
+    top_n/min_degree prune the graph to its best connected functions.
+    """
+    keep = select_nodes(((function, call) for function, calls in call_graph.items() for call in calls),
+                        top_n, min_degree, nodes=call_graph)
+    with DotWriter(f"{output_filename}.dot", "Call Graph") as dot:
+        for function, calls in call_graph.items():
+            if function in keep:
+                dot.node(function)  # Drawn even if it makes no calls
+            for call in calls:
+                if function in keep and call in keep:
+                    dot.node(function)
+                    dot.node(call)
+                    dot.edge(function, call)
+    print(f"Call graph saved to {render(dot.path) or dot.path}")
+
+def _registry_edges(registry):
+    """Yields the (source, target) edges of the inter-module visualization one at a time."""
+    for module_name, symbols in registry.items():
+        for symbol, details in symbols.items():
+            yield module_name, symbol
+            if "imported_from" in details:
+                yield details["imported_from"], symbol
             if details["type"] == "lambda" and "free_vars" in details:
                 for free_var in details["free_vars"]:
-                    dot.edge(free_var, symbol, label="used in lambda", color="red")
+                    yield free_var, symbol
+
+def visualize_global_registry(global_registry, output_filename="inter_module_visualization",
+                              top_n=None, min_degree=0):
+    """
+    Writes the registry's modules, symbols, imports and lambda free variables
+    to <output_filename>.dot, one cluster per module, and renders it if dot
+    is installed.
+    """
+    registry = global_registry.registry
+    keep = select_nodes(_registry_edges(registry), top_n, min_degree, nodes=registry)
+
+    with DotWriter(f"{output_filename}.dot", "Inter-Module Visualization") as dot:
+        # Add module nodes and their symbols
+        for module_name, symbols in registry.items():
+            kept = [(symbol, details) for symbol, details in symbols.items() if symbol in keep]
+            if module_name not in keep and not kept:
+                continue  # Nothing of this module is drawn
+            dot.begin_cluster(module_name)
+            if module_name in keep:
+                dot.node(module_name, shape="box", style="filled", color="lightblue")
+            for symbol, details in kept:
+                dot.node(symbol, f"{symbol} ({details['type']})", shape="ellipse", style="filled",
+                         color="yellow")
+            dot.end_cluster()
+
+        for module_name, symbols in registry.items():
+            for symbol, details in symbols.items():
+                if symbol not in keep:
+                    continue
+                if module_name in keep:
+                    dot.edge(module_name, symbol)
+                # Handle connections for imported symbols
+                imported_module = details.get("imported_from")
+                if imported_module in keep:
+                    dot.node(imported_module, shape="box")
+                    dot.edge(imported_module, symbol, label="imported")
+                # Handle lambda free variables
+                if details["type"] == "lambda" and "free_vars" in details:
+                    for free_var in details["free_vars"]:
+                        if free_var in keep:
+                            dot.node(free_var)
+                            dot.edge(free_var, symbol, label="used in lambda", color="red")
 
-    # Render and visualize the graph
-    dot.render("inter_module_visualization", format="png", cleanup=True)
-    print("Inter-Module Visualization generated: inter_module_visualization.png")
+    print(f"Inter-Module Visualization generated: {render(dot.path) or dot.path}")
+
+# Files of the running parallel analysis; forked workers inherit them instead
+# of receiving pickled ASTs
+_shard_files = None
+
+def _analyze_registry_shard(files):
+    """
+    Worker for the parallel MultiFileAnalyzer: builds the CFGs of a contiguous
+    run of files, each against a private registry, and returns the shard as
+    (file_name, registry) pairs; registry is None for stored members.
+
+    files is either a list of (file_name, ast) pairs or a (start, stop) range
+    into the inherited _shard_files.
+    """
+    files, module_index, stored, per_function = files
+    if isinstance(files, tuple):
+        files = _shard_files[files[0]:files[1]]
+    shard = []
+    for file_name, ast_tree in files:
+        if file_name in stored:
+            shard.append((file_name, None))
+            continue
+        file_registry = GlobalRegistry()
+        cfg_builder = MultiModuleCFGBuilder(file_registry, per_function=per_function,
+                                            module_index=module_index, file_name=file_name)
+        cfg_builder.visit(ast_tree)
+        cfg_builder.dataflow_analysis()
+        shard.append((file_name, file_registry.registry))
+    return shard
 
 class MultiFileAnalyzer:
-    def __init__(self, global_registry):
+    def __init__(self, global_registry, workers=1, module_index=None, stored=frozenset(), per_function=False,
+                 dataflow_workers=1):
         self.global_registry = global_registry
+        self.workers = workers
+        self.module_index = module_index
+        # Members whose definitions the registry already holds; their CFGs are not built
+        self.stored = stored
+        # Build one CFG per function body; with dataflow_workers > 1 (and files
+        # analyzed serially) the function CFGs are solved on a process pool
+        self.per_function = per_function
+        self.dataflow_workers = dataflow_workers
 
     def analyze_files(self, python_files_ast):
+        if self.workers > 1 and len(python_files_ast) > 1:
+            self.analyze_files_parallel(python_files_ast)
+            return
+        if self.per_function and self.dataflow_workers > 1:
+            # One pool for the whole archive rather than one per file
+            with ProcessPoolExecutor(max_workers=self.dataflow_workers) as executor:
+                self._analyze_files_serial(python_files_ast, executor)
+        else:
+            self._analyze_files_serial(python_files_ast)
+
+    def _analyze_files_serial(self, python_files_ast, executor=None):
         for file_name, ast_tree in python_files_ast.items():
+            if file_name in self.stored:
+                self.global_registry.reuse_member(file_name)
+                continue
             print(f"Analyzing {file_name}...")
-            cfg_builder = MultiModuleCFGBuilder(self.global_registry)
+            self.global_registry.begin_member(file_name)
+            cfg_builder = MultiModuleCFGBuilder(self.global_registry, per_function=self.per_function,
+                                                module_index=self.module_index, file_name=file_name)
             cfg_builder.visit(ast_tree)
-            cfg_builder.dataflow_analysis()
+            if executor is not None:
+                cfg_builder.dataflow_analysis(workers=self.dataflow_workers, executor=executor)
+            else:
+                cfg_builder.dataflow_analysis()
 
             '''
             # Print the CFG
@@ -104,39 +263,290 @@ class MultiFileAnalyzer:
                 print(var, details)
                 '''
 
+    def analyze_files_parallel(self, python_files_ast):
+        """
+        Analyzes the files on a process pool, one registry shard per chunk.
+
+        Registry writes never depend on registry reads, so each file can be
+        analyzed against a registry of its own. Chunks are contiguous runs of files in
+        input order, and merge_shards folds them back in that order, so the
+        merged registry is identical to the serial one.
+        """
+        global _shard_files
+        files = list(python_files_ast.items())
+        for file_name, _ in files:
+            if file_name not in self.stored:
+                print(f"Analyzing {file_name}...")
+        # A few chunks per worker balances uneven file sizes
+        chunk_size = -(-len(files) // (self.workers * 4))
+        bounds = [(i, min(i + chunk_size, len(files))) for i in range(0, len(files), chunk_size)]
+        if "fork" in multiprocessing.get_all_start_methods():
+            # Forked workers see the ASTs already in memory; only ranges are sent
+            _shard_files = files
+            context = multiprocessing.get_context("fork")
+            chunks = bounds
+        else:
+            context = None
+            chunks = [files[start:stop] for start, stop in bounds]
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as executor:
+                jobs = [(chunk, self.module_index, self.stored, self.per_function) for chunk in chunks]
+                self.global_registry.merge_shards(executor.map(_analyze_registry_shard, jobs))
+        finally:
+            _shard_files = None
+
     def visualize_analysis(self):
         visualize_global_registry(self.global_registry)
 
+def analyze_file_summary(file_name, ast_tree, fused=False, module_index=None, rules=None, build_cfg=True):
+    """
+    Runs the CFG, call graph and taint stages on a single AST.
+
+    The CFG builder gets a registry of its own, so the returned summary holds
+    exactly the definitions this file contributes. The builder does read the
+    registry (get_definition decides the scope recorded in a node's use_map),
+    but no context it registers depends on what it reads, so merging the
+    summaries in archive order gives the same registry as the shared serial
+    run. Only the use_map of this file's CFG differs, since it cannot see
+    other files' definitions; the CFG itself is not part of the summary.
+
+    With fused=True all stages are collected in a single FusedTraversal walk
+    instead of one walk per analyzer; the results are the same. rules is the
+    taint RuleSet (the default pack if None). With build_cfg=False (members
+    whose definitions are already stored) the CFG stage is skipped and
+    "registry" is None.
+
+    Returns:
+        dict: Compact, picklable per-file results: "call_graph",
+        "tainted_vars", "issues" and "registry". The module name is left out,
+        since it depends on the archive layout rather than the file contents;
+        merge_file_summary derives it from the ModuleIndex.
+    """
+    file_registry = GlobalRegistry()
+    cfg_builder = MultiModuleCFGBuilder(file_registry, module_index=module_index, file_name=file_name)
+    call_graph_builder = CallGraphBuilder(module_index, file_name)
+    taint_analyzer = TaintAnalyzer(rules)
+
+    if fused:
+        analyses = [CFGBuildPass(cfg_builder)] if build_cfg else []
+        FusedTraversal(analyses + [call_graph_builder, taint_analyzer]).run(ast_tree)
+        issues = taint_analyzer.issues
+    else:
+        if build_cfg:
+            cfg_builder.visit(ast_tree)
+        call_graph_builder.visit(ast_tree)
+        issues = taint_analyzer.analyze(ast_tree)
+    if build_cfg:
+        cfg_builder.dataflow_analysis()
+
+    return {
+        "call_graph": call_graph_builder.call_graph,
+        "tainted_vars": taint_analyzer.tainted_vars,
+        "issues": issues,
+        "registry": file_registry.registry if build_cfg else None,
+    }
+
+def merge_file_summary(file_name, summary, global_registry, call_graph_builder, taint_analyzer, module_index=None):
+    """
+    Merges a per-file summary into the multi-file results.
+    """
+    if summary["registry"] is None:
+        global_registry.reuse_member(file_name)
+    else:
+        global_registry.begin_member(file_name)
+        global_registry.merge(summary["registry"])
+    call_graph_builder.add_file_call_graph(file_name, summary["call_graph"],
+                                           module_name_for(file_name, module_index))
+    taint_analyzer.add_file_result(file_name, summary["tainted_vars"], summary["issues"])
+
+def analyze_archive_streaming(zip_file_path, global_registry, call_graph_builder, taint_analyzer, fused=False,
+                              stored=frozenset()):
+    """
+    Analyzes every Python file in the zip archive without materializing all ASTs.
+
+    Each tree goes through all per-file stages and is dropped before the next
+    member is parsed; only the compact per-file summaries are kept for the
+    cross-file merge, so peak memory is bounded by the largest single file.
+    Members in stored reuse the registry's definitions instead of building CFGs.
+    """
+    module_index = ModuleIndex.from_archive(zip_file_path)
+    for file_name, ast_tree in iter_python_files(zip_file_path):
+        print(f"Analyzing {file_name}...")
+        summary = analyze_file_summary(file_name, ast_tree, fused, module_index, taint_analyzer.rules,
+                                       build_cfg=file_name not in stored)
+        # Release the tree before parsing the next member
+        del ast_tree
+        merge_file_summary(file_name, summary, global_registry, call_graph_builder, taint_analyzer, module_index)
+
+def analyze_archive_cached(zip_file_path, cache, global_registry, call_graph_builder, taint_analyzer, fused=False,
+                           stored=frozenset()):
+    """
+    Analyzes every Python file in the zip archive, reusing cached summaries.
+
+    Members whose path, CRC32 and size match a cache entry made for the same
+    set of archive modules are neither decoded nor parsed; only changed
+    members go through the analyzers. Members in stored reuse the registry's
+    definitions instead of merging the summary's.
+    """
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_file:
+        module_index = ModuleIndex(zip_file.namelist())
+        for zip_info in zip_file.infolist():
+            file_name = zip_info.filename
+            if not file_name.endswith('.py'):
+                continue
+            summary = cache.get(zip_info, module_index)
+            if summary is None:
+                with zip_file.open(zip_info) as file:
+                    try:
+                        file_content = TextIOWrapper(file, encoding='utf-8').read()
+                        ast_tree = ast.parse(file_content, filename=file_name)
+                    except Exception as e:
+                        print(f"Error parsing {file_name}: {e}")
+                        continue
+                print(f"Analyzing {file_name}...")
+                summary = analyze_file_summary(file_name, ast_tree, fused, module_index, taint_analyzer.rules)
+                cache.put(zip_info, summary, module_index)
+            if file_name in stored:
+                summary = dict(summary, registry=None)
+            merge_file_summary(file_name, summary, global_registry, call_graph_builder, taint_analyzer, module_index)
+
+def vendored_members(zip_file_path, prefixes):
+    """Returns the ZipInfo of every Python member under one of the vendored path prefixes."""
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_file:
+        return [info for info in zip_file.infolist()
+                if info.filename.endswith('.py') and info.filename.startswith(tuple(prefixes))]
+
 def main():
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Build a Control Flow Graph (CFG) for a Python program.")
     parser.add_argument("filename", help="The Python source file to analyze")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="Number of processes used to parse and analyze the archive (default: 1)")
+    parser.add_argument("--per-function", action="store_true",
+                        help="Build and solve one CFG per function body instead of one per file "
+                             "(not with --fused, --stream or --cache-dir)")
+    parser.add_argument("--dataflow-workers", type=int, default=1,
+                        help="With --per-function, number of processes solving the function CFGs "
+                             "(not with -j/--workers; default: 1)")
+    parser.add_argument("--fused", action="store_true",
+                        help="Run all per-file analyses in a single traversal of each AST")
+    parser.add_argument("--stream", action="store_true",
+                        help="Analyze files one at a time instead of parsing the whole archive up front")
+    parser.add_argument("--cache-dir",
+                        help="Directory of the persistent per-file analysis cache (disabled by default)")
+    parser.add_argument("--cache-size", type=int, default=256,
+                        help="Cache size cap in MB; least recently used entries are evicted (default: 256)")
+    parser.add_argument("--registry-db",
+                        help="SQLite file that keeps the global registry across scans")
+    parser.add_argument("--vendored", action="append", default=[],
+                        help="Path prefix of vendored code; with --registry-db, the CFGs of members "
+                             "already stored are not built again (repeatable)")
+    parser.add_argument("--rules", action="append", default=[],
+                        help="Taint rule pack (.json or .toml) replacing the default pack (repeatable)")
+    parser.add_argument("--flow-sensitive", action="store_true",
+                        help="Solve taint as a dataflow problem over each file's CFG "
+                             "(not with --fused, --stream or --cache-dir)")
+    parser.add_argument("--interprocedural", action="store_true",
+                        help="Follow taint across functions and files using per-function summaries "
+                             "(needs the parsed archive, so not with --stream or --cache-dir)")
+    parser.add_argument("--summary-cache",
+                        help="Pickle file that keeps --interprocedural function summaries across scans")
+    parser.add_argument("--summary-cache-size", type=int, default=100000,
+                        help="Most function summaries kept in --summary-cache; least recently used "
+                             "ones are dropped (default: 100000)")
     args = parser.parse_args()
+    if args.cache_dir and args.workers > 1:
+        parser.error("--cache-dir analyzes members one at a time; it cannot be combined with -j/--workers")
+    if args.stream and args.workers > 1:
+        parser.error("--stream analyzes members one at a time; it cannot be combined with -j/--workers")
+    if args.flow_sensitive and (args.fused or args.stream or args.cache_dir):
+        parser.error("--flow-sensitive solves each file's CFG separately; it cannot be combined with "
+                     "--fused, --stream or --cache-dir")
+    if args.per_function and (args.fused or args.stream or args.cache_dir):
+        parser.error("--per-function applies to the multi-pass analysis; it cannot be combined with "
+                     "--fused, --stream or --cache-dir")
+    if args.dataflow_workers > 1 and not args.per_function:
+        parser.error("--dataflow-workers solves function CFGs in parallel; it needs --per-function")
+    if args.dataflow_workers > 1 and args.workers > 1:
+        parser.error("-j/--workers already analyzes files on a process pool; it cannot be combined "
+                     "with --dataflow-workers")
+    if args.interprocedural and (args.stream or args.cache_dir):
+        parser.error("--interprocedural needs the parsed archive; it cannot be combined with --stream or --cache-dir")
 
     # Initialize the global registry and process both modules
-    global_registry = GlobalRegistry()
-    # Parse Python files from the zip archive
-    parsed_files = parse_all_python_files(args.filename)
+    stored = frozenset()
+    if args.registry_db:
+        global_registry = SQLiteGlobalRegistry(args.registry_db)
+        vendored = vendored_members(args.filename, args.vendored) if args.vendored else []
+        stored = frozenset(info.filename for info in vendored if global_registry.is_analyzed(info))
+        if stored:
+            # Their definitions are already in the registry; only the call graph and taint stages run
+            print(f"Reusing {len(stored)} vendored files from {args.registry_db}")
+    else:
+        global_registry = GlobalRegistry()
+    multi_file_builder = MultiFileCallGraphBuilder()
+    # Compiled rule packs are kept next to the analysis cache when there is one
+    try:
+        rules = compile_rules(args.rules or None, args.cache_dir)
+    except (OSError, ValueError) as e:
+        # Unreadable packs, malformed JSON/TOML, or TOML without tomllib (Python < 3.11)
+        parser.error(f"cannot load the rule packs: {e}")
+    multi_file_analyzer = MultiFileTaintAnalyzer(args.flow_sensitive, rules)
 
-    # Perform multi-file analysis
-    analyzer = MultiFileAnalyzer(global_registry)
-    analyzer.analyze_files(parsed_files)
+    if args.cache_dir:
+        # Unchanged archive members are served from the cache
+        cache = AnalysisCache(args.cache_dir, args.cache_size * 1024 * 1024, rules.fingerprint[:16])
+        analyze_archive_cached(args.filename, cache, global_registry,
+                               multi_file_builder, multi_file_analyzer, args.fused, stored)
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+    elif args.stream:
+        # One AST in memory at a time
+        analyze_archive_streaming(args.filename, global_registry,
+                                  multi_file_builder, multi_file_analyzer, args.fused, stored)
+    else:
+        # Parse Python files from the zip archive
+        if args.workers > 1:
+            parsed_files = parse_all_python_files_parallel(args.filename, args.workers)
+        else:
+            parsed_files = parse_all_python_files(args.filename)
+        # Built once per archive; resolves imports to the members defining them
+        module_index = ModuleIndex.from_archive(args.filename)
 
-    # Visualize the inter-module relationships and contexts
-    #analyzer.visualize_analysis()
+        if args.fused:
+            # Single-pass alternative to the per-analyzer passes below
+            for file_name, ast_tree in parsed_files.items():
+                print(f"Analyzing {file_name}...")
+                summary = analyze_file_summary(file_name, ast_tree, fused=True, module_index=module_index,
+                                               rules=multi_file_analyzer.rules, build_cfg=file_name not in stored)
+                merge_file_summary(file_name, summary, global_registry,
+                                   multi_file_builder, multi_file_analyzer, module_index)
+        else:
+            # Perform multi-file analysis
+            analyzer = MultiFileAnalyzer(global_registry, args.workers, module_index, stored,
+                                         args.per_function, args.dataflow_workers)
+            analyzer.analyze_files(parsed_files)
 
-    # Build and visualize multi-file call graph
-    multi_file_builder = MultiFileCallGraphBuilder()
-    multi_file_builder.build_call_graph(parsed_files)
+            # Visualize the inter-module relationships and contexts
+            #analyzer.visualize_analysis()
+
+            # Build multi-file call graph
+            multi_file_builder.build_call_graph(parsed_files, module_index)
+
+            # Perform multi-file taint analysis
+            multi_file_analyzer.analyze_files(parsed_files)
+
+        if args.interprocedural:
+            summary_cache = SummaryCache(args.summary_cache, args.summary_cache_size)
+            multi_file_analyzer.analyze_interprocedural(parsed_files, module_index, summary_cache)
+            summary_cache.save()
+            print(f"Function summaries: {summary_cache.hits} reused, {summary_cache.misses} computed")
+
+    # Print the multi-file call graph
     print("call graph")
     for file, callnodes in multi_file_builder.global_call_graph.items():
         print(file,callnodes)
     #multi_file_builder.visualize_global_call_graph(output_filename="multi_file_call_graph")
 
-    # Perform multi-file taint analysis
-    multi_file_analyzer = MultiFileTaintAnalyzer()
-    multi_file_analyzer.analyze_files(parsed_files)
-
     # Print the taint analysis report
     print(multi_file_analyzer.get_report())
 
@@ -145,5 +555,10 @@ def main():
     for module, symbols in global_registry.registry.items():
         print(module, symbols)
 
+    if args.registry_db:
+        if args.vendored:
+            global_registry.mark_analyzed(vendored)
+        global_registry.close()
+
 if __name__ == "__main__":
     main()
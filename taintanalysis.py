@@ -2,17 +2,11 @@ import os
 import zipfile
 from io import TextIOWrapper
 import ast
-
-
-def get_name(node, name):
-    # Resolve the base object (value) of the attribute
-    if isinstance(node, ast.Name):
-        name.append(node.id)
-        return name
-    # Handle chained attributes recursively (e.g., obj.attr.subattr)
-    elif isinstance(node, ast.Attribute):
-        name.append(node.attr)
-        return get_name(node.value, name)
+from cfgbuilder import (DefinitionDomain, GlobalRegistry, MultiModuleCFGBuilder,
+                        solve_forward_dataflow)
+from qualnames import QualifiedNames, qualified_names
+from rulepack import default_rules
+from taintsummary import InterproceduralTaint
 
 
 class TaintAnalyzer(ast.NodeVisitor):
@@ -21,28 +15,36 @@ class TaintAnalyzer(ast.NodeVisitor):
     Identifies flows of untrusted data (tainted sources) to sensitive operations (sinks).
     """
 
-    def __init__(self):
+    def __init__(self, rules=None):
         # Track variables that are tainted (untrusted)
         self.tainted_vars = set()
         self.tainted_collections = {}  # Track tainted elements in lists/dicts
         self.tainted_functions = {}  # Track functions that propagate taint
+        self._function_returns = []  # Return nodes of each function being visited, innermost last
 
         # List of issues found (tainted data flowing to sensitive sinks)
         self.issues = []
 
-        # Define sources of tainted data (e.g., user input functions)
-        self.taint_sources = {"input", "os.environ.get"}
-        # Define sensitive sinks (e.g., functions or operations that must not accept tainted data)
-        self.sensitive_sinks = {"eval", "exec", "os.system", "subprocess.run"}
+        # Sources of tainted data (e.g., user input functions), sensitive sinks (functions
+        # that must not accept tainted data) and sanitizers, compiled from rule packs
+        self.rules = rules if rules is not None else default_rules()
+        # Dotted spellings of callees (e.g. "os.system", "a.b().c"), shared per tree
+        self.names = QualifiedNames()
+
+    def enter_Module(self, node):
+        self.names = qualified_names(node)
 
     def visit_Call(self, node):
         """
         Visits function calls to detect sources, sinks, and propagation.
         """
-        name = get_name(node.func, [])
-        callname = ".".join(name[::-1])
+        self.enter_Call(node)
+        self.generic_visit(node)
+
+    def enter_Call(self, node):
+        callname = self.names.name(node.func)
         # Detect taint sources
-        if callname in self.taint_sources:
+        if self.rules.source(callname):
             if isinstance(node.parent, ast.Assign):
                 for target in node.parent.targets:
                     if isinstance(target, ast.Name):
@@ -50,8 +52,9 @@ class TaintAnalyzer(ast.NodeVisitor):
                         print(f"Taint Source: {target.id} is tainted by {callname}")
 
         # Detect taint reaching sensitive sinks
-        if callname in self.sensitive_sinks:
-            for arg in node.args:
+        sink = self.rules.sink(callname)
+        if sink is not None:
+            for arg in sink.arguments(node):
                 if self._is_tainted(arg):
                     self.issues.append(
                         f"Tainted data passed to sensitive function '{callname}' at line {node.lineno}"
@@ -65,18 +68,34 @@ class TaintAnalyzer(ast.NodeVisitor):
                         self.tainted_vars.add(target.id)
                         print(f"Propagation: {target.id} is tainted by function '{callname}'")
 
-        self.generic_visit(node)
-
     def visit_Assign(self, node):
         """
         Visits assignments to propagate taint, including list and dictionaries
         """
+        self.enter_Assign(node)
+        self.generic_visit(node)
+
+    def enter_Assign(self, node):
         # Propagate taint between variables
-        if isinstance(node.value, ast.Name) and node.value.id in self.tainted_vars:
+        if isinstance(node.value, ast.Name):
+            if node.value.id in self.tainted_vars:
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        self.tainted_vars.add(target.id)
+                        print(f"Propagation: {target.id} is tainted by {node.value.id}")
+        elif not self._taints_on_call(node.value) and self._is_tainted(node.value):
+            # Sources read through attributes or subscripts (request.GET, request.args["q"]),
+            # and taint passed through expressions and unsanitized calls
+            source = self._reads_source(node.value)
             for target in node.targets:
                 if isinstance(target, ast.Name):
                     self.tainted_vars.add(target.id)
-                    print(f"Propagation: {target.id} is tainted by {node.value.id}")
+                    if source is not None:
+                        print(f"Taint Source: {target.id} is tainted by {source}")
+                    elif isinstance(node.value, ast.Call):
+                        print(f"Propagation: {target.id} is tainted by {self.names.name(node.value.func)}()")
+                    else:
+                        print(f"Propagation: {target.id} is tainted by the expression at line {node.lineno}")
 
         # Track tainted lists or dictionaries
         if isinstance(node.value, (ast.List, ast.Dict)):
@@ -84,29 +103,62 @@ class TaintAnalyzer(ast.NodeVisitor):
                 if isinstance(target, ast.Name):
                     self.tainted_collections[target.id] = self._extract_tainted_elements(node.value)
 
-        self.generic_visit(node)
-
     def visit_FunctionDef(self, node):
         """
         Tracks functions that propagate taint from arguments to return values.
         """
-        # Check if the function returns tainted data
-        for child in ast.walk(node):
-            if isinstance(child, ast.Return):
-                if self._is_tainted(child.value):
-                    self.tainted_functions[node.name] = True
-                    print(f"Function '{node.name}' propagates taint through its return value")
-
+        self.enter_FunctionDef(node)
         self.generic_visit(node)
+        self.leave_FunctionDef(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def enter_FunctionDef(self, node):
+        # Returns are gathered while the body is visited
+        self._function_returns.append([])
+
+    def leave_FunctionDef(self, node):
+        # Check if the function returns tainted data, now that its body has been visited;
+        # returns of nested functions were gathered by those functions
+        for child in self._function_returns.pop():
+            if self._is_tainted(child.value):
+                self.tainted_functions[node.name] = True
+                print(f"Function '{node.name}' propagates taint through its return value")
+
+    enter_AsyncFunctionDef = enter_FunctionDef
+    leave_AsyncFunctionDef = leave_FunctionDef
 
     def visit_Return(self, node):
         """
         Checks whether a return statement propagates taint.
         """
+        self.enter_Return(node)
+        self.generic_visit(node)
+
+    def enter_Return(self, node):
+        if self._function_returns:
+            self._function_returns[-1].append(node)
         if self._is_tainted(node.value):
             print(f"Return statement at line {node.lineno} propagates taint")
 
-        self.generic_visit(node)
+    def _taints_on_call(self, node):
+        """Returns True for calls whose result enter_Call already taints (sources and tainted functions)."""
+        if not isinstance(node, ast.Call):
+            return False
+        callname = self.names.name(node.func)
+        return bool(self.rules.source(callname)) or callname in self.tainted_functions
+
+    def _reads_source(self, node):
+        """
+        Returns the dotted name of the source an attribute or subscript
+        expression reads (request.GET, request.args["q"]), or None.
+        """
+        while isinstance(node, (ast.Attribute, ast.Subscript)):
+            parts = self.names.dotted(node)
+            if parts is not None and self.rules.source(parts):
+                return ".".join(parts)
+            node = node.value
+        return None
 
     def _is_tainted(self, node):
         """
@@ -116,12 +168,22 @@ class TaintAnalyzer(ast.NodeVisitor):
             return node.id in self.tainted_vars
         if isinstance(node, ast.Subscript):  # Handles list/dictionary elements
             collection_name = node.value.id if isinstance(node.value, ast.Name) else None
-            if collection_name in self.tainted_collections:
+            if self.tainted_collections.get(collection_name):
                 return True
+            return self._reads_source(node) is not None
+        if isinstance(node, ast.Attribute):  # e.g. request.GET
+            return self._reads_source(node) is not None
         if isinstance(node, ast.Call):  # Function call
-            name = get_name(node.func, [])
-            callname = ".".join(name[::-1])
-            return callname in self.tainted_functions
+            callname = self.names.name(node.func)
+            if self.rules.source(callname) or callname in self.tainted_functions:
+                return True
+            if self.rules.sanitizer(callname):
+                return False
+            # Other calls (str(x), x.strip(), ...) pass taint through
+            if isinstance(node.func, ast.Attribute) and self._is_tainted(node.func.value):
+                return True
+            return any(self._is_tainted(arg) for arg in node.args) or \
+                any(self._is_tainted(keyword.value) for keyword in node.keywords)
         if isinstance(node, ast.BinOp):  # Binary operation
             return self._is_tainted(node.left) or self._is_tainted(node.right)
 
@@ -133,13 +195,15 @@ class TaintAnalyzer(ast.NodeVisitor):
         """
         tainted_elements = set()
         if isinstance(node, ast.List):
-            for elt in node.elts:
-                if isinstance(elt, ast.Name) and elt.id in self.tainted_vars:
-                    tainted_elements.add(elt.id)
+            for index, elt in enumerate(node.elts):
+                if self._is_tainted(elt):
+                    tainted_elements.add(elt.id if isinstance(elt, ast.Name) else index)
         elif isinstance(node, ast.Dict):
             for key, value in zip(node.keys, node.values):
-                if isinstance(value, ast.Name) and value.id in self.tainted_vars:
-                    tainted_elements.add(key.s if isinstance(key, ast.Str) else key.id)
+                if self._is_tainted(value):
+                    # key is None for **mapping entries
+                    tainted_elements.add(key.value if isinstance(key, ast.Constant) else
+                                         ast.unparse(key) if key is not None else "**")
         return tainted_elements
 
     def analyze(self, tree):
@@ -153,6 +217,7 @@ class TaintAnalyzer(ast.NodeVisitor):
         for node in ast.walk(tree):
             for child in ast.iter_child_nodes(node):
                 child.parent = node
+        self.names = qualified_names(tree)
 
         # Visit all nodes in the AST
         self.visit(tree)
@@ -160,26 +225,345 @@ class TaintAnalyzer(ast.NodeVisitor):
         return self.issues
 
 
+class FlowSensitiveTaintAnalyzer:
+    """
+    Taint analysis solved as a forward dataflow problem over per-function CFGs.
+
+    The tainted variables of a function are interned to bits, and each CFG
+    node's transfer function runs the node's statements (and the header of the
+    compound statement it opens) over the incoming bit-vector: an assignment
+    sets or clears its target's bit depending on the taint of the value, so
+    `x = input(); x = "safe"` leaves x clean. solve_forward_dataflow iterates
+    the transfer functions to a fixpoint, which is bounded because bits are
+    only ever added along an edge. Sinks are checked against the solved state
+    in front of each statement, so the result no longer depends on AST visit
+    order.
+
+    Functions whose return value is tainted are found by re-solving the module
+    until tainted_functions stops growing. A function's entry state holds the
+    taint of the module-level globals and enclosing-function variables it
+    reads without binding them locally, as left by the enclosing CFG's solution
+    (at any point, since the call may come from anywhere in that code).
+    """
+
+    def __init__(self, rules=None):
+        self.tainted_vars = set()
+        self.tainted_functions = {}
+        self.issues = []
+        self.rules = rules if rules is not None else default_rules()
+        self._conditional = set()  # ids of statements that only run on some paths
+        self.names = QualifiedNames()
+
+    def _callname(self, node):
+        return self.names.name(node)
+
+    def _returns_taint(self, callname):
+        if callname in self.tainted_functions:
+            return True
+        # Methods called on self/cls are recorded under their bare name
+        base, _, attr = callname.partition(".")
+        return base in ("self", "cls") and attr in self.tainted_functions
+
+    def _is_tainted(self, node, state, domain):
+        """Returns True if the expression's value is tainted under the bit-vector state."""
+        if node is None or isinstance(node, (ast.Constant, ast.Lambda)):
+            return False
+        if isinstance(node, ast.Name):
+            bit = domain.bits.get(node.id)
+            return bit is not None and bool(state >> bit & 1)
+        if isinstance(node, ast.Call):
+            callname = self._callname(node.func)
+            if self.rules.source(callname) or self._returns_taint(callname):
+                return True
+            if self.rules.sanitizer(callname):
+                return False
+            # Other calls (str(x), x.strip(), ...) pass taint through
+            if isinstance(node.func, ast.Attribute) and self._is_tainted(node.func.value, state, domain):
+                return True
+            return any(self._is_tainted(arg, state, domain) for arg in node.args) or \
+                any(self._is_tainted(keyword.value, state, domain) for keyword in node.keywords)
+        if isinstance(node, ast.Attribute):
+            return bool(self.rules.source(self._callname(node))) or self._is_tainted(node.value, state, domain)
+        return any(self._is_tainted(child, state, domain)
+                   for child in ast.iter_child_nodes(node) if isinstance(child, ast.expr))
+
+    def _bind(self, target, tainted, state, domain, strong=True):
+        """Returns the state after assigning a (un)tainted value to target."""
+        if isinstance(target, ast.Name):
+            bit = domain.encode([target.id])
+            if tainted:
+                return state | bit
+            return state & ~bit if strong else state
+        if isinstance(target, (ast.Tuple, ast.List)):
+            # Elements of an unpacked value are not told apart
+            for element in target.elts:
+                state = self._bind(element, tainted, state, domain, strong)
+            return state
+        if isinstance(target, ast.Starred):
+            return self._bind(target.value, tainted, state, domain, strong)
+        if isinstance(target, (ast.Subscript, ast.Attribute)):
+            # x[i] = v and x.a = v taint x, but never clean it
+            return self._bind(target.value, tainted, state, domain, strong=False)
+        return state
+
+    def _transfer_statement(self, statement, state, domain):
+        strong = id(statement) not in self._conditional
+        if isinstance(statement, ast.Assign):
+            tainted = self._is_tainted(statement.value, state, domain)
+            for target in statement.targets:
+                state = self._bind(target, tainted, state, domain, strong)
+        elif isinstance(statement, ast.AnnAssign) and statement.value is not None:
+            tainted = self._is_tainted(statement.value, state, domain)
+            state = self._bind(statement.target, tainted, state, domain, strong)
+        elif isinstance(statement, ast.AugAssign):
+            if self._is_tainted(statement.value, state, domain):
+                state = self._bind(statement.target, True, state, domain)
+        elif isinstance(statement, (ast.For, ast.AsyncFor)):
+            tainted = self._is_tainted(statement.iter, state, domain)
+            state = self._bind(statement.target, tainted, state, domain, strong)
+        elif isinstance(statement, (ast.With, ast.AsyncWith)):
+            for item in statement.items:
+                if item.optional_vars is not None:
+                    tainted = self._is_tainted(item.context_expr, state, domain)
+                    state = self._bind(item.optional_vars, tainted, state, domain, strong)
+        return state
+
+    def _mark_conditional(self, statements, conditional):
+        """
+        Collects the statements that may be skipped on some path through their function.
+
+        The CFG links an if's else branch after its then branch and has no edge
+        around a branch or loop body, so assignments in those bodies must not
+        clean their targets.
+        """
+        for statement in statements:
+            if conditional:
+                self._conditional.add(id(statement))
+            if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self._mark_conditional(statement.body, False)  # A separate CFG
+            elif isinstance(statement, ast.ClassDef):
+                self._mark_conditional(statement.body, conditional)
+            elif isinstance(statement, (ast.With, ast.AsyncWith)):
+                self._mark_conditional(statement.body, conditional)
+            elif isinstance(statement, (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try)):
+                self._mark_conditional(statement.body + statement.orelse, True)
+                if isinstance(statement, ast.Try):
+                    for handler in statement.handlers:
+                        self._mark_conditional(handler.body, True)
+                    self._mark_conditional(statement.finalbody, conditional)
+
+    @staticmethod
+    def _evaluated(statement):
+        """Returns the expressions a statement (or a compound statement's header) evaluates."""
+        if isinstance(statement, (ast.If, ast.While)):
+            return [statement.test]
+        if isinstance(statement, (ast.For, ast.AsyncFor)):
+            return [statement.iter]
+        if isinstance(statement, (ast.With, ast.AsyncWith)):
+            return [item.context_expr for item in statement.items]
+        return [statement]
+
+    def _node_statements(self, builder, node):
+        statements = []
+        header = builder.headers.get(node.node_id)
+        if header is not None:
+            statements.append(header)
+        statements.extend(statement for statement in node.statements if statement is not None)
+        return statements
+
+    def _check_statement(self, statement, state, domain, function_name):
+        """Reports sinks reached by tainted arguments and records tainted return values."""
+        for expression in self._evaluated(statement):
+            stack = [expression]
+            while stack:
+                node = stack.pop()
+                if isinstance(node, (ast.Lambda, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    continue
+                if isinstance(node, ast.Call):
+                    callname = self._callname(node.func)
+                    sink = self.rules.sink(callname)
+                    if sink is not None:
+                        for arg in sink.arguments(node):
+                            if self._is_tainted(arg, state, domain):
+                                self.issues.append(
+                                    f"Tainted data passed to sensitive function '{callname}' at line {node.lineno}"
+                                )
+                stack.extend(ast.iter_child_nodes(node))
+        if isinstance(statement, ast.Return) and function_name is not None:
+            if self._is_tainted(statement.value, state, domain) and function_name not in self.tainted_functions:
+                self.tainted_functions[function_name] = True
+                print(f"Function '{function_name}' propagates taint through its return value")
+
+    @staticmethod
+    def _local_names(function):
+        """Returns the names a function binds locally (parameters, assignments, imports, nested definitions)."""
+        args = function.args
+        names = {arg.arg for arg in args.posonlyargs + args.args + args.kwonlyargs}
+        names.update(arg.arg for arg in (args.vararg, args.kwarg) if arg is not None)
+        declared = set()
+        stack = list(function.body)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (ast.Global, ast.Nonlocal)):
+                declared.update(node.names)
+            elif isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                names.add(node.id)
+            elif isinstance(node, ast.alias):
+                names.add((node.asname or node.name).split(".")[0])
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                names.add(node.name)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(node.name)
+                # The body is a scope of its own; decorators run in this one
+                stack.extend(node.decorator_list)
+                continue
+            if isinstance(node, ast.Lambda):
+                continue
+            stack.extend(ast.iter_child_nodes(node))
+        return names - declared
+
+    @staticmethod
+    def _functions_by_cfg_name(tree):
+        """
+        Returns {FunctionCFG name: [(FunctionDef, enclosing FunctionDef or None), ...]}
+        in definition order, using the dotted scope names the CFG builder gives.
+        """
+        functions = {}
+
+        def walk(node, path, enclosing):
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    name = ".".join(path + [child.name])
+                    functions.setdefault(name, []).append((child, enclosing))
+                    walk(child, path + [child.name], child)
+                elif isinstance(child, ast.ClassDef):
+                    # Methods read the names of the enclosing function, not the class body
+                    walk(child, path + [child.name], enclosing)
+                else:
+                    walk(child, path, enclosing)
+
+        walk(tree, [], None)
+        return functions
+
+    def _solve(self, builder, cfg, seed=()):
+        """
+        Solves one FunctionCFG; returns (nodes, domain, in_bits, out_bits).
+        seed holds the names already tainted on entry.
+        """
+        nodes = cfg.nodes
+        index = {id(node): i for i, node in enumerate(nodes)}
+        successors = [[index[id(succ)] for succ in node.successors if id(succ) in index] for node in nodes]
+        statements = [self._node_statements(builder, node) for node in nodes]
+        # The CFG has no loop back edges; every node of a loop body gets one to the loop's node
+        owner = {id(statement): i for i, node_statements in enumerate(statements)
+                 for statement in node_statements}
+        for i, node in enumerate(nodes):
+            loop = builder.headers.get(node.node_id)
+            if isinstance(loop, (ast.For, ast.AsyncFor, ast.While)):
+                for child in ast.walk(loop):
+                    j = owner.get(id(child))
+                    if j is not None and j != i and i not in successors[j]:
+                        successors[j].append(i)
+        if cfg.entry is not None and id(cfg.entry) in index:
+            entry = index[id(cfg.entry)]
+        else:
+            entry = 0
+        domain = DefinitionDomain()
+        seed_bits = domain.encode(seed)
+
+        def transfer(i, in_bits):
+            if i == entry:
+                in_bits |= seed_bits
+            for statement in statements[i]:
+                in_bits = self._transfer_statement(statement, in_bits, domain)
+            return in_bits
+
+        in_bits, out_bits = solve_forward_dataflow(successors, transfer, int, entry)
+        if nodes:
+            in_bits[entry] |= seed_bits
+        return statements, domain, in_bits, out_bits
+
+    def analyze(self, tree):
+        """
+        Perform flow-sensitive taint analysis on the given AST.
+        """
+        builder = MultiModuleCFGBuilder(GlobalRegistry(), basic_blocks=True, per_function=True)
+        builder.visit(tree)
+        self.names = qualified_names(tree)
+        self._conditional = set()
+        self._mark_conditional(tree.body, False)
+        while True:
+            known = len(self.tainted_functions)
+            self.issues = []
+            solutions = []
+            # Names tainted anywhere in each scope; builder.cfgs lists enclosing
+            # scopes before the functions defined in them
+            scope_taint = {}
+            functions = {name: list(definitions)
+                         for name, definitions in self._functions_by_cfg_name(tree).items()}
+            for cfg in builder.cfgs:
+                seed = ()
+                function = None
+                definitions = functions.get(cfg.name)
+                if cfg.name != "<module>" and definitions:
+                    function, enclosing = definitions.pop(0)
+                    outer = scope_taint.get(id(enclosing) if enclosing is not None else None, set())
+                    seed = outer - self._local_names(function)
+                statements, domain, in_bits, out_bits = self._solve(builder, cfg, seed)
+                if cfg.name == "<module>" or function is not None:
+                    tainted = set()
+                    for bits in out_bits:
+                        tainted |= domain.decode(bits)
+                    scope_taint[id(function) if function is not None else None] = tainted
+                function_name = None if cfg.name == "<module>" else cfg.name.rsplit(".", 1)[-1]
+                for node_statements, state in zip(statements, in_bits):
+                    for statement in node_statements:
+                        self._check_statement(statement, state, domain, function_name)
+                        state = self._transfer_statement(statement, state, domain)
+                solutions.append((domain, out_bits))
+            # A newly tainted function can taint its callers; solve again
+            if len(self.tainted_functions) == known:
+                break
+        for domain, out_bits in solutions:
+            for bits in out_bits:
+                self.tainted_vars |= domain.decode(bits)
+        return self.issues
+
+
 class MultiFileTaintAnalyzer:
     """
     Performs taint analysis across multiple Python files.
     """
-    def __init__(self):
+    def __init__(self, flow_sensitive=False, rules=None):
         self.tainted_vars = set()  # Global set of tainted variables
-        self.sensitive_sinks = {"eval", "exec", "os.system", "subprocess.run", "os.eval"}
-        self.taint_sources = {"input", "os.environ.get", "sys.argv"}
+        # RuleSet shared by every file's analyzer
+        self.rules = rules if rules is not None else default_rules()
         self.issues = []  # List of identified issues
         self.filewise_taint = {}  # File-specific taints and analysis
+        self.filewise_issues = {}  # File name -> issues found by that file's analysis
+        self.function_summaries = {}  # Qualified function name -> FunctionSummary
+        # Solve each file's taint over its CFG instead of in AST visit order
+        self.flow_sensitive = flow_sensitive
 
     def analyze_file(self, file_name, tree):
         """
         Analyze a single file's AST for taint sources and sinks.
         """
-        local_taint_analyzer = TaintAnalyzer()
+        if self.flow_sensitive:
+            local_taint_analyzer = FlowSensitiveTaintAnalyzer(self.rules)
+        else:
+            local_taint_analyzer = TaintAnalyzer(self.rules)
         local_issues = local_taint_analyzer.analyze(tree)
-        self.tainted_vars.update(local_taint_analyzer.tainted_vars)  # Propagate tainted vars globally
-        self.issues.extend(local_issues)  # Collect issues
-        self.filewise_taint[file_name] = local_taint_analyzer.tainted_vars
+        self.add_file_result(file_name, local_taint_analyzer.tainted_vars, local_issues)
+
+    def add_file_result(self, file_name, tainted_vars, issues):
+        """
+        Merges the taint results of a single file into the global results.
+        """
+        self.tainted_vars.update(tainted_vars)  # Propagate tainted vars globally
+        self.issues.extend(issues)  # Collect issues
+        self.filewise_taint[file_name] = tainted_vars
+        self.filewise_issues[file_name] = issues
 
     def analyze_files(self, python_files_ast):
         """
@@ -188,6 +572,21 @@ class MultiFileTaintAnalyzer:
         for file_name, tree in python_files_ast.items():
             self.analyze_file(file_name, tree)
 
+    def analyze_interprocedural(self, python_files_ast, module_index=None, cache=None):
+        """
+        Follows taint across function and file boundaries using per-function
+        summaries computed bottom-up over the call graph (see taintsummary).
+        cache is an optional SummaryCache shared between runs. Findings the
+        per-file analysis already reported are not added again.
+        """
+        analysis = InterproceduralTaint(self.rules, cache)
+        for file_name, line, message in analysis.analyze(python_files_ast, module_index):
+            if f"{message} at line {line}" in self.filewise_issues.get(file_name, ()):
+                continue
+            self.issues.append(f"{message} at line {line} in {file_name}")
+        self.function_summaries.update(analysis.summaries)
+        return analysis
+
     def get_report(self):
         """
         Generate a consolidated report of taint analysis findings.
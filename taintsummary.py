@@ -0,0 +1,401 @@
+import ast
+import hashlib
+import itertools
+import os
+import pickle
+import tempfile
+from callgraph import CalleeResolver, ReachabilityIndex, module_name_for
+
+SOURCE = "source"  # Label of data coming from a taint source; parameters are labelled by index
+
+# Definitions analyzed as functions of their own, never as part of their parent
+_NESTED = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+
+
+class FunctionSummary:
+    """
+    Taint behaviour of one function as seen from its call sites.
+
+    param_to_return: indices of the parameters whose taint reaches the return value.
+    param_to_sink: {parameter index: sink names the parameter reaches}.
+    source_to_return: True if data from a taint source is returned.
+    """
+    __slots__ = ("param_to_return", "param_to_sink", "source_to_return")
+
+    def __init__(self, param_to_return=(), param_to_sink=None, source_to_return=False):
+        self.param_to_return = frozenset(param_to_return)
+        self.param_to_sink = {index: frozenset(sinks) for index, sinks in (param_to_sink or {}).items()}
+        self.source_to_return = source_to_return
+
+    def key(self):
+        return (self.param_to_return, tuple(sorted(self.param_to_sink.items())), self.source_to_return)
+
+    def __eq__(self, other):
+        return isinstance(other, FunctionSummary) and self.key() == other.key()
+
+    def __repr__(self):
+        return (f"FunctionSummary(param_to_return={sorted(self.param_to_return)}, "
+                f"param_to_sink={ {i: sorted(s) for i, s in self.param_to_sink.items()} }, "
+                f"source_to_return={self.source_to_return})")
+
+EMPTY_SUMMARY = FunctionSummary()
+
+
+class SummaryCache:
+    """
+    Analysis results of single functions, keyed by a hash of the function body
+    and of everything its result depends on (resolved callees and their
+    summaries). With a path, the cache is loaded from and saved to a pickle
+    file so later scans reuse it. entries is kept in least recently used
+    first order, and the oldest entries are dropped once there are more than
+    max_entries.
+    """
+    def __init__(self, path=None, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    self.entries = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                self.entries = {}
+            self.evict()  # max_entries may be smaller than when the file was saved
+
+    def get(self, key):
+        value = self.entries.pop(key, None)
+        if value is None:
+            self.misses += 1
+        else:
+            self.entries[key] = value  # Reinserted as the most recently used
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        if len(self.entries) > self.max_entries:
+            self.evict()
+
+    def evict(self):
+        """Drops least recently used entries until at most max_entries are left."""
+        excess = len(self.entries) - self.max_entries
+        if excess > 0:
+            for key in list(itertools.islice(self.entries, excess)):
+                del self.entries[key]
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(self.entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+
+class _FunctionInfo:
+    """A function (or a module's top-level code) and the context needed to analyze it."""
+    def __init__(self, name, node, body, params, file_name, resolver, class_name, is_method, qualname=None):
+        self.name = name  # Module-qualified name, the naming used for resolved callees
+        self.qualname = qualname  # __qualname__ within the module; None for top-level code
+        self.node = node
+        self.body = body  # Statements analyzed as this function
+        self.params = params  # Positional parameter names
+        self.file_name = file_name
+        self.resolver = resolver
+        self.class_name = class_name
+        self.is_method = is_method
+        self.nodes = _local_nodes(body)
+        self.callees = {}  # {id(Call node): resolved callee}
+
+def _local_nodes(body):
+    """Pre-order list of the nodes of body, not descending into nested definitions."""
+    nodes = []
+    stack = list(reversed(body))
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        if isinstance(node, _NESTED):
+            # Decorators and defaults run in the enclosing function
+            stack.extend(reversed(getattr(node, "decorator_list", [])))
+            continue
+        stack.extend(reversed(list(ast.iter_child_nodes(node))))
+    return nodes
+
+def _collect_functions(tree, file_name, module_index=None):
+    """Returns a _FunctionInfo for every function of the module and one for its top-level code."""
+    module_name = module_name_for(file_name, module_index)
+    resolver = CalleeResolver(tree, module_name, module_index, file_name)
+    prefix = f"{module_name}." if module_name else ""
+    functions = [_FunctionInfo(f"{prefix}<module>", tree, tree.body, [], file_name, resolver, None, False)]
+
+    def walk(node, qualname, in_function, class_name):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                name = f"{qualname}.<locals>.{child.name}" if in_function else (
+                    f"{qualname}.{child.name}" if qualname else child.name)
+                args = child.args
+                params = [arg.arg for arg in args.posonlyargs + args.args]
+                static = any(isinstance(d, ast.Name) and d.id == "staticmethod" for d in child.decorator_list)
+                is_method = class_name is not None and not in_function and not static and bool(params)
+                functions.append(_FunctionInfo(prefix + name, child, child.body, params, file_name,
+                                               resolver, class_name, is_method, name))
+                walk(child, name, True, class_name if is_method else None)
+            elif isinstance(child, ast.ClassDef):
+                name = f"{qualname}.<locals>.{child.name}" if in_function else (
+                    f"{qualname}.{child.name}" if qualname else child.name)
+                walk(child, name, False, child.name)
+            else:
+                walk(child, qualname, in_function, class_name)
+
+    walk(tree, "", False, None)
+    return functions
+
+
+class _FunctionTaint:
+    """Flow-insensitive taint of one function, given the summaries of its callees."""
+    def __init__(self, info, summaries, functions, rules):
+        self.info = info
+        self.summaries = summaries
+        self.functions = functions
+        self.rules = rules
+        # Parameter i starts out labelled with i
+        self.env = {name: {index} for index, name in enumerate(info.params)}
+
+    def callee(self, call):
+        return self.info.callees.get(id(call))
+
+    def labels(self, node):
+        """Returns the taint labels of an expression."""
+        if node is None:
+            return set()
+        if isinstance(node, ast.Name):
+            return set(self.env.get(node.id, ()))
+        if isinstance(node, ast.Call):
+            return self._call_labels(node)
+        if isinstance(node, ast.Attribute):
+            resolver = self.info.resolver
+            if resolver.names.dotted(node) is not None and self.rules.source(
+                    resolver.resolve(node, self.info.class_name, self.info.qualname)):
+                return {SOURCE}  # e.g. sys.argv
+            return self.labels(node.value)
+        if isinstance(node, _NESTED):
+            return set()
+        labels = set()
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.expr):
+                labels |= self.labels(child)
+        return labels
+
+    def _argument_labels(self, call, summary_name):
+        """Returns {parameter index: labels} for the arguments of a call."""
+        info = self.functions.get(summary_name)
+        offset = 0
+        if info is not None and info.is_method and isinstance(call.func, ast.Attribute):
+            # obj.method(a) passes a as parameter 1, unless called through the class
+            base = call.func.value
+            if not (isinstance(base, ast.Name) and base.id in info.resolver.classes):
+                offset = 1
+        arguments = {}
+        for index, arg in enumerate(call.args):
+            arguments[index + offset] = self.labels(arg.value if isinstance(arg, ast.Starred) else arg)
+        for keyword in call.keywords:
+            if info is not None and keyword.arg in info.params:
+                arguments[info.params.index(keyword.arg)] = self.labels(keyword.value)
+            else:
+                arguments.setdefault(-1, set()).update(self.labels(keyword.value))
+        return arguments
+
+    def _call_labels(self, call):
+        callee = self.callee(call)
+        if self.rules.source(callee):
+            return {SOURCE}
+        if self.rules.sanitizer(callee):
+            return set()
+        arguments = self._argument_labels(call, callee)
+        summary = self.summaries.get(callee)
+        if summary is not None:
+            labels = set()
+            for index in summary.param_to_return:
+                labels |= arguments.get(index, set())
+            if summary.source_to_return:
+                labels.add(SOURCE)
+            return labels
+        # Unknown callees pass taint through (str(x), x.strip(), "".join(x), ...)
+        labels = set().union(*arguments.values()) if arguments else set()
+        if isinstance(call.func, ast.Attribute):
+            labels |= self.labels(call.func.value)
+        return labels
+
+    def _bind(self, target, labels):
+        """Adds labels to every name bound by target; returns True if anything changed."""
+        changed = False
+        if isinstance(target, ast.Name):
+            current = self.env.setdefault(target.id, set())
+            if not labels <= current:
+                current |= labels
+                changed = True
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                changed |= self._bind(element, labels)
+        elif isinstance(target, ast.Starred):
+            changed |= self._bind(target.value, labels)
+        return changed
+
+    def _propagate(self):
+        """One pass over the bindings of the function; returns True if any label was added."""
+        changed = False
+        for node in self.info.nodes:
+            if isinstance(node, ast.Assign):
+                labels = self.labels(node.value)
+                for target in node.targets:
+                    changed |= self._bind(target, labels)
+            elif isinstance(node, (ast.AugAssign, ast.AnnAssign)) and node.value is not None:
+                changed |= self._bind(node.target, self.labels(node.value))
+            elif isinstance(node, (ast.For, ast.AsyncFor, ast.comprehension)):
+                changed |= self._bind(node.target, self.labels(node.iter))
+            elif isinstance(node, ast.withitem) and node.optional_vars is not None:
+                changed |= self._bind(node.optional_vars, self.labels(node.context_expr))
+            elif isinstance(node, ast.NamedExpr):
+                changed |= self._bind(node.target, self.labels(node.value))
+        return changed
+
+    def run(self):
+        """
+        Returns (summary, issues); issues are (line offset from the function, message)
+        pairs for source data reaching a sink.
+        """
+        # Bindings only ever add labels, so this settles in at most one pass per label
+        while self._propagate():
+            pass
+        param_to_return = set()
+        param_to_sink = {}
+        source_to_return = False
+        issues = []
+        base_line = getattr(self.info.node, "lineno", 1)
+        for node in self.info.nodes:
+            if isinstance(node, ast.Return):
+                labels = self.labels(node.value)
+                source_to_return |= SOURCE in labels
+                param_to_return.update(label for label in labels if label != SOURCE)
+            elif isinstance(node, ast.Call):
+                callee = self.callee(node)
+                reached = []  # (labels, sink, via)
+                sink = self.rules.sink(callee)
+                if sink is not None:
+                    for arg in sink.arguments(node):
+                        reached.append((self.labels(arg), callee, None))
+                else:
+                    summary = self.summaries.get(callee)
+                    if summary is not None and summary.param_to_sink:
+                        arguments = self._argument_labels(node, callee)
+                        for index, sinks in summary.param_to_sink.items():
+                            for sink in sorted(sinks):
+                                reached.append((arguments.get(index, set()), sink, callee))
+                for labels, sink, via in reached:
+                    for label in labels:
+                        if label == SOURCE:
+                            through = f" through '{via}'" if via else ""
+                            issues.append((node.lineno - base_line,
+                                           f"Tainted data passed to sensitive function '{sink}'{through}"))
+                        elif label != -1:
+                            param_to_sink.setdefault(label, set()).add(sink)
+        summary = FunctionSummary(param_to_return, param_to_sink, source_to_return)
+        return summary, sorted(set(issues))
+
+
+class InterproceduralTaint:
+    """
+    Bottom-up interprocedural taint analysis over call-graph SCCs.
+
+    Every function is summarized once. Callees are summarized before their
+    callers by walking the SCCs of the call graph sinks first, so call sites
+    apply the callee's FunctionSummary instead of re-analyzing it; the
+    functions of a recursive SCC are re-analyzed together until their
+    summaries stop changing. Non-recursive functions are looked up in a
+    SummaryCache keyed by their body hash, resolved callees and callee
+    summaries, so unchanged code is not analyzed again.
+    """
+    def __init__(self, rules, cache=None):
+        self.rules = rules  # rulepack.RuleSet
+        self.cache = cache if cache is not None else SummaryCache()
+        self.summaries = {}  # {qualified function name: FunctionSummary}
+        self.issues = []  # (file_name, line, message)
+
+    def analyze(self, python_files_ast, module_index=None):
+        functions = {}
+        for file_name, tree in python_files_ast.items():
+            for info in _collect_functions(tree, file_name, module_index):
+                functions.setdefault(info.name, info)
+        graph = {}
+        for info in functions.values():
+            graph[info.name] = self._resolve_calls(info, functions)
+
+        index = ReachabilityIndex(graph)
+        # ReachabilityIndex numbers SCCs sinks first, i.e. callees before callers
+        for members in index.members:
+            names = [index.nodes[node_id] for node_id in members if index.nodes[node_id] in functions]
+            if not names:
+                continue
+            recursive = len(names) > 1 or names[0] in graph[names[0]]
+            if recursive:
+                self._analyze_recursive([functions[name] for name in names], functions)
+            else:
+                self._analyze_single(functions[names[0]], functions)
+        return self.issues
+
+    def _resolve_calls(self, info, functions):
+        """Resolves the calls of a function once."""
+        callees = set()
+        for node in info.nodes:
+            if isinstance(node, ast.Call):
+                callee = info.resolver.resolve(node.func, info.class_name, info.qualname)
+                info.callees[id(node)] = callee
+                if callee in functions:
+                    callees.add(callee)
+        return callees
+
+    def _cache_key(self, info):
+        body = ast.dump(info.node) if not isinstance(info.node, ast.Module) else \
+            "".join(ast.dump(stmt) for stmt in info.body if not isinstance(stmt, _NESTED))
+        callees = sorted({callee for callee in info.callees.values() if callee})
+        dependencies = [(callee, self.summaries[callee].key() if callee in self.summaries else None)
+                        for callee in callees]
+        digest = hashlib.sha256()
+        digest.update(body.encode("utf-8"))
+        digest.update(repr((info.params, info.is_method, dependencies,
+                            self.rules.fingerprint)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _record(self, info, summary, issues):
+        self.summaries[info.name] = summary
+        base_line = getattr(info.node, "lineno", 1)
+        for offset, message in issues:
+            self.issues.append((info.file_name, base_line + offset, message))
+
+    def _analyze_single(self, info, functions):
+        key = self._cache_key(info)
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = _FunctionTaint(info, self.summaries, functions, self.rules).run()
+            self.cache.put(key, cached)
+        self._record(info, *cached)
+
+    def _analyze_recursive(self, members, functions):
+        for info in members:
+            self.summaries[info.name] = EMPTY_SUMMARY
+        # Summaries only grow, so this reaches a fixpoint
+        changed = True
+        while changed:
+            changed = False
+            results = {}
+            for info in members:
+                results[info.name] = _FunctionTaint(info, self.summaries, functions, self.rules).run()
+                if results[info.name][0] != self.summaries[info.name]:
+                    self.summaries[info.name] = results[info.name][0]
+                    changed = True
+        for info in members:
+            self._record(info, *results[info.name])
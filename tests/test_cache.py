@@ -0,0 +1,108 @@
+import os
+import zipfile
+
+import pytest
+
+from cache import AnalysisCache
+from callgraph import MultiFileCallGraphBuilder
+from cfgbuilder import GlobalRegistry
+from moduleindex import ModuleIndex
+from scan import analyze_archive_cached, analyze_archive_streaming
+from taintanalysis import MultiFileTaintAnalyzer
+
+PACKAGE = {
+    "__init__.py": "from . import helper\n\ndef run():\n    helper.go()\n",
+    "helper.py": "import os\n\ndef go():\n    os.system(input())\n",
+}
+
+# Two packages with byte-identical members: same CRC32 and size, different module names
+DUPLICATES = {f"proj/{package}/{member}": source
+              for package in ("pkga", "pkgb") for member, source in PACKAGE.items()}
+
+
+def make_archive(tmp_path, members, name="archive.zip"):
+    path = tmp_path / name
+    with zipfile.ZipFile(path, "w") as archive:
+        for member, source in members.items():
+            archive.writestr(member, source)
+    return str(path)
+
+
+def results(archive, cache=None):
+    registry = GlobalRegistry()
+    call_graph = MultiFileCallGraphBuilder()
+    taint = MultiFileTaintAnalyzer()
+    if cache is None:
+        analyze_archive_streaming(archive, registry, call_graph, taint)
+    else:
+        analyze_archive_cached(archive, cache, registry, call_graph, taint)
+    return {
+        "call_graph": call_graph.qualified_call_graph(),
+        "file_modules": call_graph.file_modules,
+        "issues": sorted(taint.issues),
+        "tainted_vars": taint.tainted_vars,
+        "registry": registry.registry,
+    }
+
+
+def test_duplicate_members_cached_match_uncached(tmp_path):
+    archive = make_archive(tmp_path, DUPLICATES)
+    expected = results(archive)
+    # proj has no __init__.py, so the packages are top-level modules
+    assert expected["call_graph"]["pkgb.run"] == {"pkgb.helper.go"}
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    assert results(archive, cache) == expected
+    assert (cache.hits, cache.misses) == (0, 4)
+    # Every member has an entry of its own, so the warm run hits them all
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    assert results(archive, cache) == expected
+    assert (cache.hits, cache.misses) == (4, 0)
+
+
+def test_summaries_do_not_store_the_module_name(tmp_path):
+    archive = make_archive(tmp_path, DUPLICATES)
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    results(archive, cache)
+    with zipfile.ZipFile(archive) as archive_file:
+        for zip_info in archive_file.infolist():
+            summary = cache.get(zip_info, ModuleIndex(archive_file.namelist()))
+            assert summary is not None and "module" not in summary
+
+
+def test_cached_call_graph_reaches_across_packages(tmp_path):
+    archive = make_archive(tmp_path, DUPLICATES)
+    results(archive, AnalysisCache(str(tmp_path / "cache")))
+    call_graph = MultiFileCallGraphBuilder()
+    analyze_archive_cached(archive, AnalysisCache(str(tmp_path / "cache")), GlobalRegistry(), call_graph,
+                           MultiFileTaintAnalyzer())
+    assert call_graph.can_reach("pkgb.run", "os.system")
+    assert sorted(call_graph.reachable_pairs(["pkga.run", "pkgb.run"], ["pkgb.helper.go"])) == \
+        [("pkgb.run", "pkgb.helper.go")]
+
+
+@pytest.mark.parametrize("added", ["proj/pkga/extra.py", "proj/pkgc/__init__.py"])
+def test_adding_a_module_invalidates_cached_summaries(tmp_path, added):
+    cache_dir = str(tmp_path / "cache")
+    results(make_archive(tmp_path, DUPLICATES, "before.zip"), AnalysisCache(cache_dir))
+    changed = make_archive(tmp_path, dict(DUPLICATES, **{added: "def extra():\n    pass\n"}), "after.zip")
+    cache = AnalysisCache(cache_dir)
+    assert results(changed, cache) == results(changed)
+    assert cache.hits == 0
+
+
+def test_eviction_drops_least_recently_used_entries(tmp_path):
+    members = [zipfile.ZipInfo(f"m{i}.py") for i in range(4)]
+    for i, zip_info in enumerate(members):
+        zip_info.CRC, zip_info.file_size = i, i
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    for zip_info in members[:3]:
+        cache.put(zip_info, {"payload": "x" * 100})
+    size = max(cache.entries.values())
+    assert cache.get(members[0]) is not None
+    cache.max_bytes = 3 * size
+    cache.put(members[3], {"payload": "x" * 100})
+    # m1 was used least recently; m0 was read after m2 was written
+    assert len(cache.entries) == 3 and cache.get(members[1]) is None
+    assert cache.get(members[0]) is not None and cache.get(members[2]) is not None
+    assert cache.total_bytes == sum(cache.entries.values())
+    assert sorted(os.listdir(tmp_path / "cache")) == sorted(cache.entries)
@@ -0,0 +1,98 @@
+import ast
+
+from callgraph import CallGraphBuilder, MultiFileCallGraphBuilder
+from moduleindex import ModuleIndex
+
+
+def call_graph(source):
+    builder = CallGraphBuilder()
+    builder.visit(ast.parse(source))
+    return builder.call_graph
+
+
+def test_calls_after_a_nested_def_stay_with_the_outer_function():
+    graph = call_graph(
+        "def outer():\n"
+        "    before()\n"
+        "    def inner():\n"
+        "        nested()\n"
+        "    after()\n"
+        "    return inner\n")
+    assert graph == {"outer": {"before", "after"}, "outer.<locals>.inner": {"nested"}}
+
+
+def test_methods_with_the_same_name_are_separate_nodes():
+    graph = call_graph(
+        "class A:\n"
+        "    def get(self):\n"
+        "        first()\n"
+        "class B:\n"
+        "    def get(self):\n"
+        "        second()\n"
+        "        def helper():\n"
+        "            third()\n")
+    assert graph == {"A.get": {"first"}, "B.get": {"second"}, "B.get.<locals>.helper": {"third"}}
+
+
+def test_async_and_deeply_nested_functions_are_qualified():
+    graph = call_graph(
+        "async def handler():\n"
+        "    def level_one():\n"
+        "        def level_two():\n"
+        "            deep()\n"
+        "        level_two()\n"
+        "    await level_one()\n")
+    assert graph == {"handler": {"handler.<locals>.level_one"},
+                     "handler.<locals>.level_one": {"handler.<locals>.level_one.<locals>.level_two"},
+                     "handler.<locals>.level_one.<locals>.level_two": {"deep"}}
+
+
+def test_nested_functions_resolve_innermost_first():
+    graph = call_graph(
+        "def helper():\n"
+        "    pass\n"
+        "def outer():\n"
+        "    def helper():\n"
+        "        pass\n"
+        "    def inner():\n"
+        "        helper()\n"
+        "    inner()\n"
+        "def other():\n"
+        "    helper()\n")
+    assert graph["outer.<locals>.inner"] == {"outer.<locals>.helper"}
+    assert graph["outer"] == {"outer.<locals>.inner"}
+    assert graph["other"] == {"helper"}
+
+
+def test_reachability_follows_closures():
+    builder = MultiFileCallGraphBuilder()
+    builder.build_call_graph({"app.py": ast.parse(
+        "import os\n"
+        "def run():\n"
+        "    def step():\n"
+        "        os.system('ls')\n"
+        "    step()\n")})
+    assert builder.qualified_call_graph()["app.run"] == {"app.run.<locals>.step"}
+    assert builder.can_reach("app.run", "os.system")
+
+
+def test_function_imports_do_not_leak_into_other_functions():
+    graph = call_graph(
+        "import os\n"
+        "def f():\n"
+        "    import subprocess as os\n"
+        "    os.run()\n"
+        "def g():\n"
+        "    os.system()\n")
+    assert graph == {"f": {"subprocess.run"}, "g": {"os.system"}}
+
+
+def test_dotted_imports_resolve_to_the_archive_module():
+    files = {
+        "pkg/__init__.py": "",
+        "pkg/mod.py": "def go():\n    pass\n",
+        "main.py": "import pkg.mod\nimport pkg.mod as m\n\ndef run():\n    pkg.mod.go()\n    m.go()\n",
+    }
+    builder = MultiFileCallGraphBuilder()
+    builder.build_call_graph({name: ast.parse(source) for name, source in files.items()}, ModuleIndex(list(files)))
+    assert builder.qualified_call_graph() == {"pkg.mod.go": set(), "main.run": {"pkg.mod.go"}}
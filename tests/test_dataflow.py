@@ -0,0 +1,326 @@
+import ast
+import os
+import random
+import zipfile
+
+import pytest
+
+from cfgbuilder import (BasicBlock, CFGBuilder, CFGBuildPass, CFGNode, CompactCFGNode, GlobalRegistry,
+                        MultiModuleCFGBuilder, solve_forward_dataflow)
+from traversal import FusedTraversal
+
+TAINTTEST_ZIP = os.path.join(os.path.dirname(__file__), "tainttest.zip")
+
+# Loops, branches, handlers, nested scopes and lambdas, so the CFG has joins and cycles
+SAMPLE = '''
+import os
+from sys import argv
+
+total = 0
+for i in range(10):
+    if i % 2:
+        total = total + i
+    else:
+        total -= 1
+    while total > 100:
+        total = total // 2
+else:
+    done = True
+
+def handler(request, retries=3):
+    data = request.args
+    try:
+        value = int(data["n"])
+    except ValueError as error:
+        value = 0
+    finally:
+        retries = retries - 1
+    with open(argv[1]) as stream:
+        lines = [line.strip() for line in stream]
+    key = lambda item: item[value]
+    return sorted(lines, key=key)
+
+class Store:
+    def __init__(self, path):
+        self.path = path
+
+    def save(self, rows):
+        for row in rows:
+            if not row:
+                continue
+            os.system(row)
+        return len(rows)
+'''
+
+
+def sources():
+    with zipfile.ZipFile(TAINTTEST_ZIP) as archive:
+        members = [archive.read(name).decode("utf-8") for name in archive.namelist()]
+    return [SAMPLE] + members
+
+
+def build(source, **options):
+    builder = MultiModuleCFGBuilder(GlobalRegistry(), **options)
+    builder.visit(ast.parse(source))
+    return builder
+
+
+def random_graph(seed, count=40):
+    """A builder holding random nodes with random edges (cycles included) and gen/kill sets."""
+    rng = random.Random(seed)
+    names = [f"v{i}" for i in range(12)]
+    builder = CFGBuilder()
+    for node_id in range(count):
+        node = CFGNode(f"node_{node_id}", "Assign", "global", node_id)
+        for name in rng.sample(names, rng.randint(0, 3)):
+            node.add_gen(name)
+        for name in rng.sample(names, rng.randint(0, 3)):
+            node.add_kill(name)
+        builder.node_list.append(node)
+        builder.nodes[node.name] = node
+    for node in builder.node_list:
+        for succ in rng.sample(builder.node_list, rng.randint(0, 3)):
+            node.add_successor(succ)
+    return builder
+
+
+def round_robin(nodes):
+    """The original solver: full sweeps with predecessors found by scanning every node."""
+    in_sets = {id(node): set() for node in nodes}
+    out_sets = {id(node): set(node.gen) for node in nodes}
+    changed = True
+    while changed:
+        changed = False
+        for node in nodes:
+            in_set = set()
+            for pred in nodes:
+                if node in pred.successors:
+                    in_set |= out_sets[id(pred)]
+            out_set = set(node.gen) | (in_set - set(node.kill))
+            if in_set != in_sets[id(node)] or out_set != out_sets[id(node)]:
+                in_sets[id(node)] = in_set
+                out_sets[id(node)] = out_set
+                changed = True
+    return [in_sets[id(node)] for node in nodes], [out_sets[id(node)] for node in nodes]
+
+
+@pytest.mark.parametrize("source", sources())
+def test_worklist_matches_round_robin(source):
+    builder = build(source)
+    builder.dataflow_analysis()
+    expected_in, expected_out = round_robin(builder.node_list)
+    assert [node.in_set for node in builder.node_list] == expected_in
+    assert [node.out_set for node in builder.node_list] == expected_out
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_worklist_matches_round_robin_on_cyclic_graphs(seed):
+    builder = random_graph(seed)
+    builder.dataflow_analysis()
+    expected_in, expected_out = round_robin(builder.node_list)
+    assert [node.in_set for node in builder.node_list] == expected_in
+    assert [node.out_set for node in builder.node_list] == expected_out
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_bitvectors_match_round_robin(seed):
+    builder = random_graph(seed)
+    builder.dataflow_analysis(bitvectors=True)
+    expected_in, expected_out = round_robin(builder.node_list)
+    assert all(isinstance(node.in_bits, int) for node in builder.node_list)
+    # in_set/out_set decode the bit-vectors on access
+    assert [node.in_set for node in builder.node_list] == expected_in
+    assert [node.out_set for node in builder.node_list] == expected_out
+
+
+@pytest.mark.parametrize("source", sources())
+def test_bitvectors_match_sets(source):
+    sets = build(source)
+    sets.dataflow_analysis()
+    bits = build(source)
+    bits.dataflow_analysis(bitvectors=True)
+    assert [node.in_set for node in bits.node_list] == [node.in_set for node in sets.node_list]
+    assert [node.out_set for node in bits.node_list] == [node.out_set for node in sets.node_list]
+
+
+def shape(builder):
+    """Everything the analyses read from a CFG, independent of the node class."""
+    return [(node.name, node.node_type, node.scope, [succ.node_id for succ in node.successors],
+             set(node.gen), set(node.kill), {scope: set(names) for scope, names in node.use_map.items()},
+             set(node.in_set), set(node.out_set))
+            for node in builder.node_list]
+
+
+@pytest.mark.parametrize("source", sources())
+@pytest.mark.parametrize("bitvectors", [False, True])
+def test_compact_nodes_match_cfg_nodes(source, bitvectors):
+    regular = build(source)
+    regular.dataflow_analysis(bitvectors)
+    compact = build(source, compact_nodes=True)
+    compact.dataflow_analysis(bitvectors)
+    assert all(isinstance(node, CompactCFGNode) for node in compact.node_list)
+    assert shape(compact) == shape(regular)
+
+
+def test_compact_node_allocates_on_first_write():
+    node = CompactCFGNode("name_0", "Name", "global", 0)
+    assert not hasattr(node, "__dict__")
+    assert (node._gen, node._kill, node._successors, node._use_map) == (None, None, None, None)
+    assert node.gen == set() and node.use_map == {}
+    node.add_gen("x")
+    node.add_use("global", "x")
+    assert node.gen == {"x"} and node.use_map == {"global": {"x"}}
+    assert node._kill is None and node._successors is None
+
+
+def csr_rows(offsets, targets):
+    return [list(targets[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
+
+
+@pytest.mark.parametrize("source", sources())
+def test_csr_export_matches_successors(source):
+    builder = build(source)
+    nodes = builder.node_list
+    assert [node.node_id for node in nodes] == list(range(len(nodes)))
+    successors = csr_rows(*builder.successor_csr())
+    assert successors == [[succ.node_id for succ in node.successors] for node in nodes]
+    predecessors = csr_rows(*builder.predecessor_csr())
+    assert predecessors == [sorted(node.node_id for node in nodes for succ in node.successors if succ is target)
+                            for target in nodes]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_solving_over_csr_matches_dataflow_analysis(seed):
+    builder = random_graph(seed)
+    builder.dataflow_analysis()
+    nodes = builder.node_list
+    successors = csr_rows(*builder.successor_csr())
+
+    def transfer(i, in_set):
+        return set(nodes[i].gen) | (in_set - set(nodes[i].kill))
+
+    in_sets, out_sets = solve_forward_dataflow(successors, transfer, set)
+    assert in_sets == [node.in_set for node in nodes]
+    assert out_sets == [node.out_set for node in nodes]
+
+
+def blocks(builder):
+    return [node for node in builder.node_list if isinstance(node, BasicBlock)]
+
+
+@pytest.mark.parametrize("source", sources())
+def test_return_and_raise_end_basic_blocks(source):
+    builder = build(source, basic_blocks=True)
+    for block in blocks(builder):
+        statements = [statement for statement in block.statements if statement is not None]
+        ends = [i for i, statement in enumerate(statements) if isinstance(statement, (ast.Return, ast.Raise))]
+        assert ends in ([], [len(statements) - 1])
+
+
+def test_statements_after_a_return_start_a_new_block():
+    source = "def f(a):\n    if a:\n        return 1\n    c = 2\n    return c\n"
+    builder = build(source, basic_blocks=True)
+    branch = next(node for node in builder.node_list if node.node_type == "IfThen")
+    returned, rest = branch.successors
+    assert [type(statement) for statement in returned.statements] == [ast.Return]
+    assert not returned.successors
+    assert [type(statement) for statement in rest.statements] == [ast.Assign, ast.Return]
+    # Node mode gives the branch the same two successors: the return and the rest
+    nodes = build(source)
+    branch = next(node for node in nodes.node_list if node.node_type == "IfThen")
+    assert [succ.node_type for succ in branch.successors] == ["Return", "Assign"]
+
+
+@pytest.mark.parametrize("source", sources())
+def test_block_statement_facts_end_at_the_block_out_set(source):
+    builder = build(source, basic_blocks=True)
+    builder.dataflow_analysis()
+    for block in blocks(builder):
+        if block.statements:
+            assert block.statement_facts()[-1][2] == block.out_set
+
+
+PER_FUNCTION = '''import app
+
+@app.route(path)
+def get():
+    def inner():
+        return 1
+    return inner()
+
+class Handler:
+    def get(self):
+        def inner():
+            return 2
+        def inner():
+            return 3
+        return inner()
+'''
+
+
+def test_per_function_cfgs_keep_every_node():
+    builder = build(PER_FUNCTION, per_function=True)
+    builder.dataflow_analysis()
+    names = [cfg.name for cfg in builder.cfgs]
+    assert names == ["<module>", "get", "get.inner", "Handler.get", "Handler.get.inner", "Handler.get.inner"]
+    # Every node belongs to exactly one graph, even where names repeat
+    nodes = [node for cfg in builder.cfgs for node in cfg.nodes]
+    assert sorted(node.node_id for node in nodes) == list(range(len(builder.node_list)))
+    for cfg in builder.cfgs:
+        assert cfg.entry is cfg.nodes[0]
+
+
+def test_decorators_belong_to_the_enclosing_cfg():
+    builder = build(PER_FUNCTION, per_function=True)
+    module, function = builder.cfgs[:2]
+    assert [(node.node_type, node.scope) for node in module.nodes] == [
+        ("Module", "global"), ("Import", "global"), ("Call", "global"), ("ClassDef", "Handler")]
+    assert module.nodes[2].use_map == {"global": {"app", "path"}}
+    assert [node.node_type for node in function.nodes] == ["FunctionDef", "Return"]
+
+
+def test_fused_build_matches_per_function_build():
+    recursive = build(PER_FUNCTION, per_function=True)
+    fused = MultiModuleCFGBuilder(GlobalRegistry(), per_function=True)
+    FusedTraversal([CFGBuildPass(fused)]).run(ast.parse(PER_FUNCTION))
+    assert [cfg.name for cfg in fused.cfgs] == [cfg.name for cfg in recursive.cfgs]
+    assert shape(fused) == shape(recursive)
+
+
+@pytest.mark.parametrize("bitvectors", [False, True])
+def test_parallel_per_function_dataflow_matches_serial(bitvectors):
+    source = "\n".join(sources())
+    serial = build(source, per_function=True)
+    serial.dataflow_analysis(bitvectors)
+    parallel = build(source, per_function=True)
+    parallel.dataflow_analysis(bitvectors, workers=2)
+    assert len(parallel.cfgs) > 1
+    assert [(node.in_set, node.out_set) for node in parallel.node_list] == \
+        [(node.in_set, node.out_set) for node in serial.node_list]
+    assert all((node.domain is None) != bitvectors for node in parallel.node_list)
+
+
+
+def test_definition_index_is_kept_per_scope():
+    source = ("x = 1\n"
+              "x += 2\n"
+              "def f():\n"
+              "    x = 3\n"
+              "    x = 4\n"
+              "def g():\n"
+              "    def f():\n"
+              "        x = 5\n"
+              "    x: int = 6\n")
+    for options in ({}, {"per_function": True}):
+        builder = build(source, **options)
+        assigns = [node for node in builder.node_list if node.node_type in ("Assign", "AugAssign", "AnnAssign")]
+        index = {scope_id: {name: [node.node_id for node in nodes] for name, nodes in names.items()}
+                 for scope_id, names in builder.definitions.items()}
+        ids = [node.node_id for node in assigns]
+        # Scopes in the order they are entered: the module, f, g and g's own f
+        module, f, g, inner_f = sorted(index)
+        assert index == {module: {"x": ids[0:2]}, f: {"x": ids[2:4]}, inner_f: {"x": [ids[4]]},
+                         g: {"x": [ids[5]]}}
+        assert builder.definitions_of("x", module) == assigns[0:2]
+        # Only definitions with an earlier one in the same scope kill the name
+        assert [bool(node.kill) for node in assigns] == [False, True, False, True, False, False]
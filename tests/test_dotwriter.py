@@ -0,0 +1,59 @@
+import ast
+
+from callgraph import MultiFileCallGraphBuilder
+from cfgbuilder import GlobalRegistry
+from dotwriter import DotWriter, select_nodes
+from scan import visualize_call_graph, visualize_global_registry
+
+
+def test_writer_declares_nodes_and_edges_once(tmp_path):
+    path = str(tmp_path / "graph.dot")
+    with DotWriter(path, "Graph") as dot:
+        dot.begin_cluster('file "a"')
+        dot.node("a", shape="box")
+        dot.end_cluster()
+        dot.node("a", shape="ellipse")
+        dot.edge("a", "b")
+        dot.edge("a", "b")
+        dot.edge("a", "b", label="again")
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == ('digraph "Graph" {\n'
+                            '  subgraph cluster_0 {\n  label="file \\"a\\"";\n'
+                            '  "a" [shape="box"];\n  }\n'
+                            '  "a" -> "b";\n'
+                            '  "a" -> "b" [label="again"];\n'
+                            '}\n')
+
+
+def test_select_nodes_keeps_isolated_nodes_and_prunes_by_degree():
+    edges = [("a", "b"), ("a", "c"), ("b", "c"), ("a", "d")]
+    assert select_nodes(iter(edges), nodes=["lonely"]) == {"a", "b", "c", "d", "lonely"}
+    assert select_nodes(iter(edges), min_degree=2, nodes=["lonely"]) == {"a", "b", "c"}
+    assert select_nodes(iter(edges), top_n=1) == {"a"}
+
+
+def test_call_graph_draws_functions_without_calls(tmp_path):
+    output = str(tmp_path / "call_graph")
+    visualize_call_graph({"main": {"helper"}, "unused": set()}, output)
+    with open(f"{output}.dot", encoding="utf-8") as f:
+        assert '"unused";' in f.read()
+
+    builder = MultiFileCallGraphBuilder()
+    builder.build_call_graph({"app.py": ast.parse("def main():\n    helper()\n\ndef helper():\n    pass\n\n"
+                                                  "def unused():\n    pass\n")})
+    builder.visualize_global_call_graph(str(tmp_path / "global"))
+    with open(str(tmp_path / "global.dot"), encoding="utf-8") as f:
+        assert '"app.unused"' in f.read()
+
+
+def test_registry_skips_clusters_left_empty(tmp_path):
+    registry = GlobalRegistry()
+    registry.register_definition("kept", "x", {"type": "variable"})
+    registry.register_definition("kept", "y", {"type": "variable"})
+    registry.register_definition("pruned", "z", {"type": "variable"})
+    output = str(tmp_path / "registry")
+    visualize_global_registry(registry, output, min_degree=2)
+    with open(f"{output}.dot", encoding="utf-8") as f:
+        content = f.read()
+    assert 'label="kept"' in content and "pruned" not in content
+    assert content.count("subgraph") == 1
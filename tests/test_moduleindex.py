@@ -0,0 +1,35 @@
+import zipfile
+
+from callgraph import MultiFileCallGraphBuilder
+from cfgbuilder import GlobalRegistry
+from moduleindex import ModuleIndex
+from scan import analyze_archive_streaming
+from taintanalysis import MultiFileTaintAnalyzer
+
+
+def test_package_crawl_names_modules():
+    index = ModuleIndex(["proj/pkg/__init__.py", "proj/pkg/sub/__init__.py", "proj/pkg/sub/mod.py",
+                         "proj/tool.py", "src/lib/__init__.py", "README.md"])
+    assert index.files == {"proj/pkg/__init__.py": "pkg", "proj/pkg/sub/__init__.py": "pkg.sub",
+                           "proj/pkg/sub/mod.py": "pkg.sub.mod", "proj/tool.py": "tool",
+                           "src/lib/__init__.py": "lib"}
+    # Full paths and paths below src/ are fallbacks
+    assert index.resolve("proj.pkg.sub.mod") == "proj/pkg/sub/mod.py"
+    assert index.canonical("src.lib") == "lib"
+
+
+def test_root_level_init_does_not_hang():
+    index = ModuleIndex(["__init__.py", "a.py", "pkg/__init__.py", "pkg/b.py"])
+    assert index.files == {"__init__.py": "", "a.py": "a", "pkg/__init__.py": "pkg", "pkg/b.py": "pkg.b"}
+    assert index.resolve_import("pkg/b.py", None, "a", level=2) == ("", "a.py")
+
+
+def test_archive_with_root_init_can_be_scanned(tmp_path):
+    path = tmp_path / "root.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("__init__.py", "")
+        archive.writestr("a.py", "from . import b\n\ndef run():\n    b.go()\n")
+        archive.writestr("b.py", "def go():\n    pass\n")
+    call_graph = MultiFileCallGraphBuilder()
+    analyze_archive_streaming(str(path), GlobalRegistry(), call_graph, MultiFileTaintAnalyzer())
+    assert call_graph.qualified_call_graph()["a.run"] == {"b.go"}
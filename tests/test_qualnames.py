@@ -0,0 +1,62 @@
+import ast
+
+import pytest
+
+from cfgbuilder import CFGNode, GlobalRegistry, MultiModuleCFGBuilder
+from qualnames import qualified_names
+
+ATTRIBUTES = ["a().b.c", "x[0].f", "a.b.c", "a.b().c", "x[0][1].f.g", "''.join", "(a + b).c",
+              "self.request.args", "f(x)(y).z", "(lambda: 0).x"]
+
+
+def old_process_attribute(builder, node, attr_node):
+    """The recursive _process_attribute that the qualified-name scan replaced."""
+    if isinstance(node.value, ast.Name):
+        base_scope = builder.scope_manager.resolve_scope(node.value.id)
+        attr_node.add_gen(node.value.id)
+        attr_node.add_use(base_scope, node.value.id)
+    elif isinstance(node.value, ast.Attribute):
+        old_process_attribute(builder, node.value, attr_node)
+    if hasattr(node, "attr") and isinstance(node.attr, str):
+        attr_node.add_gen(node.attr)
+
+
+def attribute_sets(expression, process):
+    tree = ast.parse(f"def f(self, x):\n    {expression}\n")
+    builder = MultiModuleCFGBuilder(GlobalRegistry())
+    builder._begin_module(tree)
+    builder.scope_manager.enter_scope("f")
+    for arg in ("self", "x"):
+        builder.scope_manager.add_local_var(arg)
+    node = tree.body[0].body[0].value
+    attr_node = CFGNode("attribute", "Attribute", "f", 0)
+    process(builder, node, attr_node)
+    return attr_node.gen, dict(attr_node.use_map)
+
+
+@pytest.mark.parametrize("expression", ATTRIBUTES)
+def test_process_attribute_matches_the_recursive_version(expression):
+    new = attribute_sets(expression, lambda builder, node, attr_node: builder._process_attribute(node, attr_node))
+    assert new == attribute_sets(expression, old_process_attribute)
+
+
+def test_process_attribute_sets():
+    def sets(expression):
+        return attribute_sets(expression, lambda builder, node, attr_node: builder._process_attribute(node, attr_node))
+
+    assert sets("a().b.c") == ({"b", "c"}, {})
+    assert sets("x[0].f") == ({"f"}, {})
+    assert sets("a.b.c") == ({"a", "b", "c"}, {"global": {"a"}})
+    assert sets("self.request.args") == ({"self", "request", "args"}, {"f": {"self"}})
+
+
+def test_qualified_names_are_memoized_per_node():
+    tree = ast.parse("a.b().c\nx[0].f\n''.join(y)\n")
+    names = qualified_names(tree)
+    assert qualified_names(tree) is names
+    first, second, third = (statement.value for statement in tree.body)
+    assert names.parts(first) == ("a", "b()", "c") and names.name(first) == "a.b().c"
+    assert names.parts(second) == ("x[]", "f") and names.dotted(second) is None
+    assert names.name(third.func) == "?.join"
+    assert names.parts(first) is names.parts(first)
+    assert names.dotted(first.value.func) == ("a", "b")
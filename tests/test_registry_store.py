@@ -0,0 +1,80 @@
+import zipfile
+
+from cfgbuilder import GlobalRegistry
+from registry_store import SQLiteGlobalRegistry
+from scan import MultiFileAnalyzer, parse_all_python_files, vendored_members
+
+APP = {
+    "vendor/lib.py": "import os\nfrom os import path\nshared = lambda value: path.join(value)\n",
+    "app/main.py": "import sys\nfrom vendor.lib import shared\nhandler = lambda request: shared(request)\n",
+    "vendor/broken.py": "def broken(:\n",
+}
+OTHER = {"other/tool.py": "import json\nfrom json import dumps\n"}
+
+
+def make_archive(tmp_path, members, name):
+    path = tmp_path / name
+    with zipfile.ZipFile(path, "w") as archive:
+        for member, source in members.items():
+            archive.writestr(member, source)
+    return str(path)
+
+
+def scan(archive, registry, vendored=()):
+    """Runs the registry stage as scan.py does with --registry-db and --vendored."""
+    members = vendored_members(archive, vendored) if vendored else []
+    stored = frozenset(info.filename for info in members if registry.is_analyzed(info))
+    MultiFileAnalyzer(registry, stored=stored).analyze_files(parse_all_python_files(archive))
+    registry.mark_analyzed(members)
+    return stored
+
+
+def in_memory(archive):
+    registry = GlobalRegistry()
+    MultiFileAnalyzer(registry).analyze_files(parse_all_python_files(archive))
+    return registry.registry
+
+
+def test_each_scan_sees_only_its_own_members(tmp_path):
+    app = make_archive(tmp_path, APP, "app.zip")
+    other = make_archive(tmp_path, OTHER, "other.zip")
+    path = str(tmp_path / "registry.db")
+    registry = SQLiteGlobalRegistry(path)
+    scan(app, registry)
+    assert registry.registry == in_memory(app)
+    registry.close()
+
+    registry = SQLiteGlobalRegistry(path)
+    scan(other, registry)
+    assert registry.registry == in_memory(other)
+    assert registry.get_definition("global", "shared") is None
+    assert registry.importers_of("os") == []
+    registry.close()
+
+
+def test_vendored_members_are_reused_from_the_database(tmp_path):
+    app = make_archive(tmp_path, APP, "app.zip")
+    path = str(tmp_path / "registry.db")
+    registry = SQLiteGlobalRegistry(path)
+    assert scan(app, registry, ["vendor/"]) == frozenset()
+    registry.close()
+
+    registry = SQLiteGlobalRegistry(path)
+    # The member that failed to parse was never analyzed, so it is not reused
+    assert scan(app, registry, ["vendor/"]) == {"vendor/lib.py"}
+    assert registry.registry == in_memory(app)
+    registry.close()
+
+
+def test_a_changed_member_replaces_its_old_definitions(tmp_path):
+    path = str(tmp_path / "registry.db")
+    registry = SQLiteGlobalRegistry(path)
+    scan(make_archive(tmp_path, APP, "app.zip"), registry, ["vendor/"])
+    registry.close()
+
+    changed = make_archive(tmp_path, dict(APP, **{"vendor/lib.py": "import re\n"}), "changed.zip")
+    registry = SQLiteGlobalRegistry(path)
+    assert scan(changed, registry, ["vendor/"]) == frozenset()
+    assert registry.registry == in_memory(changed)
+    assert registry.get_definition("global", "path") is None
+    registry.close()
@@ -0,0 +1,101 @@
+import ast
+import os
+import random
+
+import pytest
+
+from rulepack import DEFAULT_PACK, WILDCARD, _RULE, Rule, RuleTrie, compile_rules
+from taintanalysis import FlowSensitiveTaintAnalyzer, TaintAnalyzer
+
+FRAMEWORKS_PACK = os.path.join(os.path.dirname(DEFAULT_PACK), "frameworks.toml")
+
+
+def backtracking_match(node, parts, index, prefix):
+    """The original depth-first trie search, trying exact segments before the wildcard."""
+    if index == len(parts):
+        return node.get(_RULE)
+    if prefix and _RULE in node and index:
+        return node[_RULE]
+    child = node.get(parts[index])
+    if child is not None:
+        rule = backtracking_match(child, parts, index + 1, prefix)
+        if rule is not None:
+            return rule
+    child = node.get(WILDCARD)
+    if child is not None:
+        return backtracking_match(child, parts, index + 1, prefix)
+    return None
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_trie_matches_backtracking_search(seed):
+    rng = random.Random(seed)
+    segments = ["a", "b", "c", WILDCARD]
+    for _ in range(100):
+        trie = RuleTrie()
+        for _ in range(rng.randint(1, 8)):
+            trie.add(Rule("sinks", ".".join(rng.choice(segments) for _ in range(rng.randint(1, 4)))))
+        for _ in range(20):
+            name = [rng.choice(["a", "b", "c", "d"]) for _ in range(rng.randint(1, 5))]
+            for prefix in (False, True):
+                assert trie.match(name, prefix) is backtracking_match(trie.root, name, 0, prefix)
+
+
+def test_rule_set_matching():
+    rules = compile_rules([DEFAULT_PACK, FRAMEWORKS_PACK])
+    assert rules.source("input").pack == "default"
+    # A source covers every name it is a prefix of
+    assert rules.source("request.args.get").pattern == "request.args"
+    assert compile_rules().source("os.environ.get.x").pattern == "os.environ.get"
+    assert rules.source("request") is None
+    # Wildcards stand for exactly one segment
+    assert rules.sink("cursor.execute").pattern == "*.execute"
+    assert rules.sink("db.cursor.execute").pattern == "*.*.execute"
+    assert rules.sink("execute") is None
+    assert rules.sanitizer("shlex.quote").pack == "frameworks"
+    assert rules.sink("os.system.x") is None
+
+
+def test_argument_positions_and_keywords():
+    sink = Rule("sinks", "subprocess.call", args=[0], keywords=["args"])
+    call = ast.parse("subprocess.call(cmd, other, stdin=data, args=more)").body[0].value
+    assert [ast.unparse(arg) for arg in sink.arguments(call)] == ["cmd", "more"]
+    every = Rule("sinks", "os.system")
+    assert [ast.unparse(arg) for arg in every.arguments(call)] == ["cmd", "other", "data", "more"]
+
+
+CALLS = '''import subprocess, shlex
+from flask import request
+x = input()
+subprocess.call("ls", stdin=x)
+subprocess.call(x)
+subprocess.call(args=x)
+subprocess.call(shlex.quote(x))
+q = request.args["q"]
+subprocess.call(q.strip())
+'''
+
+
+@pytest.mark.parametrize("analyzer", [TaintAnalyzer, FlowSensitiveTaintAnalyzer])
+def test_sinks_check_only_their_arguments(analyzer):
+    rules = compile_rules([DEFAULT_PACK, FRAMEWORKS_PACK])
+    issues = analyzer(rules).analyze(ast.parse(CALLS))
+    # stdin is not checked, shlex.quote sanitizes, and str methods pass taint through
+    assert sorted(int(issue.rsplit(" ", 1)[1]) for issue in issues) == [5, 6, 9]
+
+
+def test_compiled_rules_are_cached(tmp_path):
+    cache_dir = str(tmp_path / "rules")
+    compiled = compile_rules([DEFAULT_PACK, FRAMEWORKS_PACK], cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+    cached = compile_rules([DEFAULT_PACK, FRAMEWORKS_PACK], cache_dir)
+    assert cached is not compiled and cached.fingerprint == compiled.fingerprint
+    assert cached.sink("cursor.execute").args == frozenset({0})
+    assert compile_rules([DEFAULT_PACK], cache_dir).fingerprint != compiled.fingerprint
+
+
+def test_invalid_pack_raises_value_error(tmp_path):
+    pack = tmp_path / "broken.toml"
+    pack.write_text("sources = [\n")
+    with pytest.raises(ValueError):
+        compile_rules([str(pack)])
@@ -0,0 +1,174 @@
+import ast
+import sys
+import zipfile
+
+import pytest
+
+import scan
+from callgraph import MultiFileCallGraphBuilder
+from cfgbuilder import GlobalRegistry
+from moduleindex import ModuleIndex
+from scan import (MultiFileAnalyzer, analyze_archive_streaming, analyze_file_summary, merge_file_summary,
+                  parse_all_python_files, parse_all_python_files_parallel)
+from taintanalysis import MultiFileTaintAnalyzer
+
+# Members that register the same symbols, so the merge order decides which definition wins
+MEMBERS = {
+    "app/__init__.py": "from .views import index\nfrom . import models\n",
+    "app/views.py": "import os\nfrom app.models import User\n\ndef index(request):\n"
+                    "    handler = lambda r: os.system(r)\n    return handler(request)\n",
+    "app/models.py": "class User:\n    def save(self):\n        return self\n",
+    "app/utils.py": "import os\nfrom os import path\nhelper = lambda value, base=path: path.join(base, value)\n",
+    "scripts/run.py": "import os\nfrom app.views import index\nindex(os.environ)\n",
+    "scripts/broken.py": "def broken(:\n",
+}
+
+
+def make_archive(tmp_path, members, name="archive.zip"):
+    path = tmp_path / name
+    with zipfile.ZipFile(path, "w") as archive:
+        for member, source in members.items():
+            archive.writestr(member, source)
+    return str(path)
+
+
+def registry_items(registry):
+    """The registry with its insertion order, which the merge has to preserve."""
+    return [(module, list(symbols.items())) for module, symbols in registry.registry.items()]
+
+
+def test_parallel_parse_matches_serial(tmp_path):
+    archive = make_archive(tmp_path, MEMBERS)
+    serial = parse_all_python_files(archive)
+    parallel = parse_all_python_files_parallel(archive, 2)
+    assert "scripts/broken.py" not in serial
+    assert list(parallel) == list(serial)
+    assert [ast.dump(tree) for tree in parallel.values()] == [ast.dump(tree) for tree in serial.values()]
+
+
+def test_registry_shards_merge_like_the_serial_run(tmp_path):
+    parsed = parse_all_python_files(make_archive(tmp_path, MEMBERS))
+    serial = GlobalRegistry()
+    MultiFileAnalyzer(serial).analyze_files(parsed)
+    for workers in (2, 3):
+        parallel = GlobalRegistry()
+        MultiFileAnalyzer(parallel, workers).analyze_files(parsed)
+        assert registry_items(parallel) == registry_items(serial)
+
+
+def test_merge_shards_keeps_shard_order():
+    first, second = GlobalRegistry(), GlobalRegistry()
+    first.register_definition("global", "x", {"type": "variable", "from": 1})
+    first.register_definition("global", "y", {"type": "variable", "from": 1})
+    second.register_definition("global", "x", {"type": "variable", "from": 2})
+    merged = GlobalRegistry()
+    # None stands for a member whose stored definitions are reused
+    merged.merge_shards([[("a.py", first.registry)], [("b.py", None), ("c.py", second.registry)]])
+    assert list(merged.registry["global"].items()) == [("x", {"type": "variable", "from": 2}),
+                                                      ("y", {"type": "variable", "from": 1})]
+
+
+def scan_output(monkeypatch, capsys, *options):
+    monkeypatch.setattr(sys, "argv", ["scan.py", *options])
+    scan.main()
+    return capsys.readouterr().out
+
+
+def test_per_function_dataflow_workers_match_the_serial_scan(tmp_path, monkeypatch, capsys):
+    # Without the broken member: -j parses in worker processes, whose errors capsys does not see
+    members = {name: source for name, source in MEMBERS.items() if name != "scripts/broken.py"}
+    archive = make_archive(tmp_path, members)
+    serial = scan_output(monkeypatch, capsys, archive, "--per-function")
+    assert scan_output(monkeypatch, capsys, archive, "--per-function", "--dataflow-workers", "2") == serial
+    assert scan_output(monkeypatch, capsys, archive, "--per-function", "-j", "2") == serial
+
+
+@pytest.mark.parametrize("options", [["--dataflow-workers", "2"],
+                                     ["--per-function", "--dataflow-workers", "2", "-j", "2"],
+                                     ["--per-function", "--fused"]])
+def test_per_function_rejects_unsupported_combinations(monkeypatch, options):
+    monkeypatch.setattr(sys, "argv", ["scan.py", "archive.zip", *options])
+    with pytest.raises(SystemExit) as exit_info:
+        scan.main()
+    assert exit_info.value.code == 2
+
+
+def test_parallel_scan_parses_like_the_serial_scan(tmp_path, monkeypatch, capsys):
+    # More members than workers, unevenly sliced, with members that fail to decode or parse
+    members = dict(MEMBERS, **{f"gen/mod{i}.py": f"value_{i} = {i}\n" * (i + 1) for i in range(5)})
+    members["README.md"] = "not python\n"
+    path = make_archive(tmp_path, members)
+    with zipfile.ZipFile(path, "a") as archive:
+        archive.writestr("latin1.py", "name = '\xe9'\n".encode("latin-1"))
+    serial = parse_all_python_files(path)
+    assert "latin1.py" not in serial and "scripts/broken.py" not in serial
+    for workers in (2, 3):
+        parallel = parse_all_python_files_parallel(path, workers)
+        assert set(parallel) == set(serial)
+        assert {name: ast.dump(tree) for name, tree in parallel.items()} == \
+            {name: ast.dump(tree) for name, tree in serial.items()}
+    # Parse errors of -j are printed by the worker processes, out of capsys' reach
+    expected = [line for line in scan_output(monkeypatch, capsys, path).splitlines()
+                if not line.startswith("Error parsing")]
+    assert scan_output(monkeypatch, capsys, path, "-j", "2").splitlines() == expected
+
+
+# Calls across modules, methods, a closure and taint through locals, attributes and lambdas
+PIPELINE = {
+    "svc/__init__.py": "",
+    "svc/io.py": "import os\n\ndef read():\n    return input()\n\ndef run(command):\n    os.system(command)\n\n"
+                 "path = os.environ.get('PATH')\nos.system(path)\n",
+    "svc/app.py": "import subprocess\nfrom svc import io\nfrom svc.io import run\n\n"
+                  "class Job:\n    def start(self, arg):\n        cmd = input()\n        run(cmd)\n"
+                  "        subprocess.run(cmd)\n\n"
+                  "def main():\n    data = io.read()\n    def step():\n        run(data)\n    step()\n"
+                  "    handler = lambda value: run(value)\n    handler(input())\n\n"
+                  "user = input()\nio.run(user)\nsubprocess.run(user)\n",
+}
+
+
+def multi_pass_results(path):
+    """The default scan: every stage walks the whole parsed archive in turn."""
+    parsed = parse_all_python_files(path)
+    module_index = ModuleIndex.from_archive(path)
+    registry = GlobalRegistry()
+    call_graph = MultiFileCallGraphBuilder()
+    taint = MultiFileTaintAnalyzer()
+    MultiFileAnalyzer(registry, module_index=module_index).analyze_files(parsed)
+    call_graph.build_call_graph(parsed, module_index)
+    taint.analyze_files(parsed)
+    return pipeline_results(registry, call_graph, taint)
+
+
+def pipeline_results(registry, call_graph, taint):
+    return {
+        "call_graph": call_graph.qualified_call_graph(),
+        "issues": taint.issues,
+        "tainted_vars": taint.tainted_vars,
+        "registry": registry.registry,
+    }
+
+
+def test_streaming_matches_the_multi_pass_scan(tmp_path):
+    path = make_archive(tmp_path, PIPELINE)
+    expected = multi_pass_results(path)
+    assert expected["issues"] and expected["call_graph"]["svc.app.main"]
+    registry, call_graph, taint = GlobalRegistry(), MultiFileCallGraphBuilder(), MultiFileTaintAnalyzer()
+    analyze_archive_streaming(path, registry, call_graph, taint)
+    assert pipeline_results(registry, call_graph, taint) == expected
+
+
+def test_fused_traversal_matches_the_multi_pass_scan(tmp_path):
+    path = make_archive(tmp_path, PIPELINE)
+    expected = multi_pass_results(path)
+    # The in-memory fused mode of scan.py
+    module_index = ModuleIndex.from_archive(path)
+    registry, call_graph, taint = GlobalRegistry(), MultiFileCallGraphBuilder(), MultiFileTaintAnalyzer()
+    for file_name, tree in parse_all_python_files(path).items():
+        summary = analyze_file_summary(file_name, tree, fused=True, module_index=module_index, rules=taint.rules)
+        merge_file_summary(file_name, summary, registry, call_graph, taint, module_index)
+    assert pipeline_results(registry, call_graph, taint) == expected
+    # --fused --stream
+    registry, call_graph, taint = GlobalRegistry(), MultiFileCallGraphBuilder(), MultiFileTaintAnalyzer()
+    analyze_archive_streaming(path, registry, call_graph, taint, fused=True)
+    assert pipeline_results(registry, call_graph, taint) == expected
@@ -0,0 +1,153 @@
+import ast
+import symtable
+
+import pytest
+
+from cfgbuilder import ContextRegistry, GlobalRegistry, MultiModuleCFGBuilder, ScopeManager, SymbolTableResolver
+
+# Forward references, comprehensions, class bodies, global/nonlocal and closures
+SOURCES = [
+    '''
+def use_before_bind():
+    print(value)
+    value = 1
+
+def reads_global():
+    return value
+
+value = 0
+''',
+    '''
+def outer(items):
+    factor = 2
+    def scale():
+        nonlocal factor
+        factor += 1
+        return [item * factor for item in items if item]
+    def reset():
+        global counter
+        counter = 0
+    return scale, {key: factor for key in items}, (x for x in items)
+''',
+    '''
+class Config:
+    name = "config"
+    names = [name for _ in range(3)]
+
+    def method(self):
+        return name
+
+    def closure(self):
+        local = self
+        class Inner:
+            attribute = local
+            def read(inner):
+                return local, Inner
+        return Inner
+''',
+    '''
+def walrus(rows):
+    if any((last := row) for row in rows):
+        return last
+    return [total := total + row for row in rows] if rows else lambda x, y=rows: x + y
+total = 0
+''',
+]
+
+
+def scope_nodes(tree):
+    """{(name, line): AST node} for the functions, lambdas and classes of a module."""
+    nodes = {}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            nodes[(node.name, node.lineno)] = node
+        elif isinstance(node, ast.Lambda):
+            nodes[("lambda", node.lineno)] = node
+    return nodes
+
+
+def expected_tables(table, nodes, enclosing):
+    """
+    Yields (AST node, {name: expected owner}) for every function and class
+    table below table, classifying names as the interpreter does.
+    """
+    for child in table.get_children():
+        node = nodes.get((child.get_name(), child.get_lineno()))
+        owners = enclosing
+        if node is not None:
+            expected = {}
+            for symbol in child.get_symbols():
+                name = symbol.get_name()
+                if not (symbol.is_referenced() or symbol.is_assigned() or symbol.is_parameter()
+                        or symbol.is_imported() or symbol.is_declared_global() or symbol.is_nonlocal()):
+                    continue  # Only passed through to a nested scope
+                if symbol.is_declared_global() or (symbol.is_global() and not symbol.is_local()):
+                    expected[name] = "global"
+                elif symbol.is_nonlocal():
+                    expected[name] = "nonlocal"
+                elif symbol.is_local() or symbol.is_parameter():
+                    expected[name] = node
+                elif symbol.is_free():
+                    expected[name] = next(owner for owner, names in reversed(enclosing) if name in names)
+            yield node, expected
+            if child.get_type() == "function":
+                local = {symbol.get_name() for symbol in child.get_symbols()
+                         if (symbol.is_local() or symbol.is_parameter()) and not symbol.is_global()}
+                owners = enclosing + [(node, local)]
+        yield from expected_tables(child, nodes, owners)
+
+
+@pytest.mark.parametrize("source", SOURCES)
+def test_resolver_matches_symtable(source):
+    tree = ast.parse(source)
+    resolver = SymbolTableResolver(tree)
+    tables = list(expected_tables(symtable.symtable(source, "<test>", "exec"), scope_nodes(tree), []))
+    assert tables
+    for node, expected in tables:
+        table = resolver.tables[id(node)]
+        for name, owner in expected.items():
+            assert table[name] == owner, (getattr(node, "name", "lambda"), name)
+
+
+def test_builder_resolves_forward_references():
+    builder = MultiModuleCFGBuilder(GlobalRegistry(), symbol_tables=True)
+    builder.visit(ast.parse(SOURCES[0]))
+    uses = [dict(node.use_map) for node in builder.node_list if node.use_map]
+    # value is bound later in the function, so print(value) reads the local
+    assert uses == [{"use_before_bind": {"value"}, "global": {"print"}}]
+
+
+def test_context_registry_keeps_one_slot_per_scope_and_symbol():
+    registry = ContextRegistry()
+    first = registry.new_scope("f")
+    second = registry.new_scope("g")
+    context = registry.define(first, "x", "f")
+    registry.define(second, "x", "g")
+    # Redefining updates the same context in place
+    assert registry.define(first, "x", "global") is context
+    assert registry.get(first, "x") == {"scope": "global", "usages": set()}
+    assert registry.get(second, "x") == {"scope": "g", "usages": set()}
+    assert registry.get(0, "x") is None and registry.get(first, "y") is None
+    assert registry.symbol_id("x") == 0 and len(registry) == 2
+    assert [key for key, _ in registry.items()] == [("f", "x"), ("g", "x")]
+
+
+def test_scopes_do_not_share_contexts():
+    builder = MultiModuleCFGBuilder(GlobalRegistry())
+    builder.visit(ast.parse("def f(x):\n    i = x\n\ndef g(x):\n    return x\n"))
+    contexts = dict(builder.scope_manager.context_registry.items())
+    assert contexts[("f", "x")] == {"scope": "f", "usages": set()}
+    assert contexts[("g", "x")] == {"scope": "g", "usages": set()}
+    assert contexts[("f", "x")] is not contexts[("g", "x")]
+
+
+def test_lookup_context_prefers_the_innermost_scope():
+    manager = ScopeManager()
+    manager.enter_scope("outer")
+    manager.add_local_var("x")
+    manager.enter_scope("inner")
+    assert manager.lookup_context("x")["scope"] == "outer"
+    manager.add_local_var("x")
+    assert manager.lookup_context("x")["scope"] == "inner"
+    manager.exit_scope()
+    assert manager.lookup_context("x")["scope"] == "outer"
@@ -0,0 +1,157 @@
+import ast
+import sys
+
+import pytest
+
+import scan
+from moduleindex import ModuleIndex
+from taintanalysis import FlowSensitiveTaintAnalyzer, MultiFileTaintAnalyzer, TaintAnalyzer
+from taintsummary import SummaryCache
+
+CLOSURES = '''import os
+x = input()
+y = "safe"
+
+def f():
+    os.system(x)
+
+def g():
+    x = "clean"
+    os.system(x)
+
+def h():
+    os.system(y)
+
+def outer():
+    z = input()
+    def inner():
+        os.system(z)
+    return inner
+
+class C:
+    def m(self):
+        os.system(x)
+
+async def a(items):
+    async for item in items:
+        os.system(item)
+    async with open(x) as fh:
+        os.system(fh)
+'''
+
+REASSIGNED = '''import os
+cmd = input()
+os.system(cmd)
+cmd = "ls"
+os.system(cmd)
+'''
+
+
+def lines(issues):
+    return sorted(int(issue.rsplit(" ", 1)[1]) for issue in issues)
+
+
+def test_flow_sensitive_kills_overwritten_taint():
+    assert lines(TaintAnalyzer().analyze(ast.parse(REASSIGNED))) == [3, 5]
+    assert lines(FlowSensitiveTaintAnalyzer().analyze(ast.parse(REASSIGNED))) == [3]
+
+
+def test_flow_sensitive_seeds_functions_from_enclosing_scopes():
+    # Module and closure taint reaches the functions; g's local x shadows the module's
+    assert lines(TaintAnalyzer().analyze(ast.parse(CLOSURES))) == [6, 10, 18, 23]
+    assert lines(FlowSensitiveTaintAnalyzer().analyze(ast.parse(CLOSURES))) == [6, 18, 23, 29]
+
+
+def test_multi_file_analyzer_selects_the_mode():
+    default = MultiFileTaintAnalyzer()
+    default.analyze_file("reassigned.py", ast.parse(REASSIGNED))
+    flow_sensitive = MultiFileTaintAnalyzer(flow_sensitive=True)
+    flow_sensitive.analyze_file("reassigned.py", ast.parse(REASSIGNED))
+    assert lines(default.issues) == [3, 5]
+    assert lines(flow_sensitive.issues) == [3]
+
+
+@pytest.mark.parametrize("option", ["--fused", "--stream", "--cache-dir=cache"])
+def test_flow_sensitive_rejects_modes_that_ignore_it(monkeypatch, option):
+    monkeypatch.setattr(sys, "argv", ["scan.py", "archive.zip", "--flow-sensitive", option])
+    with pytest.raises(SystemExit) as exit_info:
+        scan.main()
+    assert exit_info.value.code == 2
+
+
+def test_returns_taint_only_their_own_function():
+    analyzer = TaintAnalyzer()
+    analyzer.analyze(ast.parse(
+        "def outer():\n"
+        "    def inner():\n"
+        "        return input()\n"
+        "    return 'safe'\n"
+        "\n"
+        "def g():\n"
+        "    def h():\n"
+        "        return 'x'\n"
+        "    return input()\n"
+        "\n"
+        "class Handler:\n"
+        "    def read(self):\n"
+        "        value = input()\n"
+        "        return value\n"))
+    assert analyzer.tainted_functions == {"inner": True, "g": True, "read": True}
+
+
+CROSS_FILE = {
+    "util.py": "def read():\n    return input()\n",
+    "main.py": "import os\nfrom util import read\n\ndef run():\n    os.system(read())\n\nx = input()\nos.system(x)\n",
+}
+
+
+def test_interprocedural_reports_each_finding_once(tmp_path):
+    trees = {name: ast.parse(source) for name, source in CROSS_FILE.items()}
+    analyzer = MultiFileTaintAnalyzer()
+    analyzer.analyze_files(trees)
+    assert lines(analyzer.issues) == [8]
+    cache = SummaryCache(str(tmp_path / "summaries.pkl"))
+    analyzer.analyze_interprocedural(trees, ModuleIndex(list(trees)), cache)
+    cache.save()
+    # Line 8 is already reported by the per-file pass; only the call through read() is new
+    assert analyzer.issues == ["Tainted data passed to sensitive function 'os.system' at line 8",
+                               "Tainted data passed to sensitive function 'os.system' at line 5 in main.py"]
+    cache = SummaryCache(str(tmp_path / "summaries.pkl"))
+    rerun = MultiFileTaintAnalyzer()
+    rerun.analyze_files(trees)
+    rerun.analyze_interprocedural(trees, ModuleIndex(list(trees)), cache)
+    assert rerun.issues == analyzer.issues
+    assert cache.misses == 0
+
+
+def test_summary_cache_evicts_least_recently_used(tmp_path):
+    cache = SummaryCache(str(tmp_path / "summaries.pkl"), max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert list(cache.entries) == ["a", "c"]
+    cache.save()
+    assert list(SummaryCache(str(tmp_path / "summaries.pkl"), max_entries=1).entries) == ["c"]
+
+
+@pytest.mark.parametrize("option", ["--stream", "--cache-dir=cache"])
+def test_interprocedural_rejects_modes_without_the_parsed_archive(monkeypatch, option):
+    monkeypatch.setattr(sys, "argv", ["scan.py", "archive.zip", "--interprocedural", option])
+    with pytest.raises(SystemExit) as exit_info:
+        scan.main()
+    assert exit_info.value.code == 2
+
+
+def test_interprocedural_follows_calls_to_enclosing_closures():
+    trees = {"main.py": ast.parse(
+        "import os\n"
+        "def run():\n"
+        "    def read():\n"
+        "        return input()\n"
+        "    def step():\n"
+        "        os.system(read())\n"
+        "    step()\n")}
+    analyzer = MultiFileTaintAnalyzer()
+    analyzer.analyze_interprocedural(trees, ModuleIndex(list(trees)), SummaryCache())
+    assert analyzer.issues == ["Tainted data passed to sensitive function 'os.system' at line 6 in main.py"]
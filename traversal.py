@@ -0,0 +1,80 @@
+import ast
+
+# Returned by an enter_* handler to stop receiving the node's descendants
+SKIP_CHILDREN = "skip_children"
+
+
+class FusedTraversal:
+    """
+    Walks an AST once and dispatches every node to all registered analyses.
+
+    An analysis implements enter_<NodeType>(node) and/or leave_<NodeType>(node)
+    methods, called before and after the node's children are walked, or generic
+    enter(node)/leave(node) methods used for node types without a specific
+    handler. Each analysis keeps its own state; node types it has no handler
+    for are simply walked through. An enter handler may return SKIP_CHILDREN to
+    stop receiving that node's descendants (and its leave call) while the other
+    analyses still see them, and no handler is dispatched in a subtree once no
+    analysis wants it.
+
+    Every node of the tree gets a `parent` attribute, including the nodes of
+    skipped subtrees, which replaces the separate parent-attaching pass some
+    analyses rely on.
+    """
+    def __init__(self, analyses=()):
+        self.analyses = list(analyses)
+        self._handlers = {}  # {(analysis index, node type): (enter, leave)}
+
+    def register(self, analysis):
+        self.analyses.append(analysis)
+        return analysis
+
+    def _get_handlers(self, index, node_type):
+        key = (index, node_type)
+        handlers = self._handlers.get(key)
+        if handlers is None:
+            analysis = self.analyses[index]
+            name = node_type.__name__
+            handlers = (getattr(analysis, "enter_" + name, None) or getattr(analysis, "enter", None),
+                        getattr(analysis, "leave_" + name, None) or getattr(analysis, "leave", None))
+            self._handlers[key] = handlers
+        return handlers
+
+    def run(self, tree):
+        """
+        Dispatches every node of the tree to the registered analyses in a single
+        depth-first walk.
+        """
+        all_analyses = tuple(range(len(self.analyses)))
+        # Each entry is (node, indexes of the analyses receiving it, leaving)
+        stack = [(tree, all_analyses, False)]
+        while stack:
+            node, active, leaving = stack.pop()
+            node_type = type(node)
+            if leaving:
+                for index in active:
+                    leave = self._get_handlers(index, node_type)[1]
+                    if leave is not None:
+                        leave(node)
+                continue
+
+            descending = []
+            for index in active:
+                enter = self._get_handlers(index, node_type)[0]
+                if enter is None or enter(node) is not SKIP_CHILDREN:
+                    descending.append(index)
+            if not descending:
+                # No handlers below, but parent links are still expected there
+                for parent in ast.walk(node):
+                    for child in ast.iter_child_nodes(parent):
+                        child.parent = parent
+                continue
+
+            descending = tuple(descending)
+            stack.append((node, descending, True))
+            children = []
+            for child in ast.iter_child_nodes(node):
+                child.parent = node
+                children.append(child)
+            for child in reversed(children):
+                stack.append((child, descending, False))